@@ -74,7 +74,13 @@ export default function TaskDetail({ params }: TaskDetailProps) {
   });
 
   const startCollectionMutation = trpc.collector.startCollection.useMutation({
-    onSuccess: () => {
+    onSuccess: (result) => {
+      if (result.offlinePlatforms.length > 0) {
+        // 任务已排队但没有worker领取，提示停留几秒再刷新
+        toast.warning(`没有在线的采集worker（${result.offlinePlatforms.join("、")}），任务将保持排队`);
+        setTimeout(() => window.location.reload(), 3000);
+        return;
+      }
       toast.success("数据采集已启动");
       window.location.reload();
     },
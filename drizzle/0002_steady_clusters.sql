@@ -0,0 +1,23 @@
+ALTER TABLE `comments` ADD `clusterId` varchar(16);
+--> statement-breakpoint
+CREATE INDEX `userId_idx` ON `monitoring_tasks` (`userId`);
+--> statement-breakpoint
+CREATE INDEX `taskId_idx` ON `comments` (`taskId`);
+--> statement-breakpoint
+CREATE INDEX `platform_idx` ON `comments` (`platform`);
+--> statement-breakpoint
+CREATE INDEX `publishedAt_idx` ON `comments` (`publishedAt`);
+--> statement-breakpoint
+CREATE INDEX `task_cluster_idx` ON `comments` (`taskId`,`clusterId`);
+--> statement-breakpoint
+CREATE INDEX `commentId_idx` ON `sentiment_analysis` (`commentId`);
+--> statement-breakpoint
+CREATE INDEX `sentiment_idx` ON `sentiment_analysis` (`sentiment`);
+--> statement-breakpoint
+CREATE INDEX `taskId_idx` ON `sentiment_stats` (`taskId`);
+--> statement-breakpoint
+CREATE INDEX `date_idx` ON `sentiment_stats` (`date`);
+--> statement-breakpoint
+CREATE INDEX `taskId_idx` ON `crawl_jobs` (`taskId`);
+--> statement-breakpoint
+CREATE INDEX `status_idx` ON `crawl_jobs` (`status`);
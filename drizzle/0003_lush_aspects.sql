@@ -0,0 +1 @@
+ALTER TABLE `sentiment_analysis` ADD `aspectScores` text;
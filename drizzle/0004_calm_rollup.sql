@@ -0,0 +1,20 @@
+CREATE TABLE `rollup_state` (
+	`name` varchar(64) NOT NULL,
+	`lastId` int NOT NULL DEFAULT 0,
+	`updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT `rollup_state_name` PRIMARY KEY(`name`)
+);
+--> statement-breakpoint
+-- sentiment_stats is derived data: drop the old daily rows so the rollup rebuilds
+-- every bucket from sentiment_analysis (rollup_state starts at lastId 0)
+DELETE FROM `sentiment_stats`;
+--> statement-breakpoint
+ALTER TABLE `sentiment_stats` ADD `platform` varchar(50) NOT NULL DEFAULT 'all';
+--> statement-breakpoint
+ALTER TABLE `sentiment_stats` ADD `granularity` enum('day','hour') NOT NULL DEFAULT 'day';
+--> statement-breakpoint
+ALTER TABLE `sentiment_stats` ADD `scoreSum` decimal(14,4) DEFAULT '0';
+--> statement-breakpoint
+ALTER TABLE `sentiment_stats` ADD `updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP;
+--> statement-breakpoint
+CREATE UNIQUE INDEX `bucket_idx` ON `sentiment_stats` (`taskId`,`platform`,`granularity`,`date`);
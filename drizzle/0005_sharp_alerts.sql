@@ -0,0 +1,16 @@
+CREATE TABLE `sentiment_alerts` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`taskId` int NOT NULL,
+	`metric` enum('volume_spike','negative_spike') NOT NULL,
+	`severity` enum('warning','critical') NOT NULL,
+	`bucketStart` timestamp NOT NULL,
+	`value` decimal(14,4) NOT NULL,
+	`baseline` decimal(14,4) NOT NULL,
+	`zScore` decimal(8,3) NOT NULL,
+	`acknowledged` boolean NOT NULL DEFAULT false,
+	`createdAt` timestamp NOT NULL DEFAULT (now()),
+	`updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP,
+	CONSTRAINT `sentiment_alerts_id` PRIMARY KEY(`id`)
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX `alert_bucket_idx` ON `sentiment_alerts` (`taskId`,`metric`,`bucketStart`);
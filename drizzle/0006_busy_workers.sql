@@ -0,0 +1,15 @@
+ALTER TABLE `crawl_jobs` ADD `keyword` varchar(255);
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `maxResults` int NOT NULL DEFAULT 50;
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `workerId` varchar(128);
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `attempts` int NOT NULL DEFAULT 0;
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `heartbeatAt` timestamp;
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `leaseExpiresAt` timestamp;
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `updatedAt` timestamp NOT NULL DEFAULT (now()) ON UPDATE CURRENT_TIMESTAMP;
+--> statement-breakpoint
+CREATE INDEX `lease_idx` ON `crawl_jobs` (`status`,`leaseExpiresAt`);
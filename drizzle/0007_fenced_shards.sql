@@ -0,0 +1,10 @@
+CREATE TABLE `crawl_workers` (
+	`workerId` varchar(128) NOT NULL,
+	`platforms` varchar(255),
+	`slots` int NOT NULL DEFAULT 1,
+	`heartbeatAt` timestamp NOT NULL DEFAULT (now()),
+	`startedAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `crawl_workers_workerId` PRIMARY KEY(`workerId`)
+);
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `leaseToken` int NOT NULL DEFAULT 0;
@@ -0,0 +1 @@
+ALTER TABLE `monitoring_tasks` ADD `priority` enum('low','normal','high') NOT NULL DEFAULT 'normal';
@@ -0,0 +1,5 @@
+UPDATE `crawl_jobs` AS `j` JOIN `crawl_jobs` AS `newer` ON `newer`.`taskId` = `j`.`taskId` AND `newer`.`platform` = `j`.`platform` AND `newer`.`id` > `j`.`id` AND `newer`.`status` IN ('pending','running') SET `j`.`status` = 'failed', `j`.`errorMessage` = 'Superseded by a newer job' WHERE `j`.`status` IN ('pending','running');
+--> statement-breakpoint
+ALTER TABLE `crawl_jobs` ADD `active` tinyint GENERATED ALWAYS AS (case when `status` in ('pending','running') then 1 end) STORED;
+--> statement-breakpoint
+CREATE UNIQUE INDEX `active_job_idx` ON `crawl_jobs` (`taskId`,`platform`,`active`);
@@ -1,5 +1,5 @@
-import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, decimal, boolean, index } from "drizzle-orm/mysql-core";
-import { relations } from "drizzle-orm";
+import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, decimal, boolean, tinyint, index, uniqueIndex } from "drizzle-orm/mysql-core";
+import { relations, sql } from "drizzle-orm";
 
 /**
  * Core user table backing auth flow.
@@ -41,11 +41,12 @@ export const monitoringTasks = mysqlTable("monitoring_tasks", {
   description: text("description"),
   platforms: varchar("platforms", { length: 255 }).notNull(), // JSON: ["twitter", "weibo", "zhihu"]
   status: mysqlEnum("status", ["active", "paused", "completed"]).default("active").notNull(),
+  priority: mysqlEnum("priority", ["low", "normal", "high"]).default("normal").notNull(), // weights the crawl budget share
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-}, (table) => [{
-  userIdIdx: index("userId_idx").on(table.userId),
-}]);
+}, (table) => [
+  index("userId_idx").on(table.userId),
+]);
 
 export type MonitoringTask = typeof monitoringTasks.$inferSelect;
 export type InsertMonitoringTask = typeof monitoringTasks.$inferInsert;
@@ -66,13 +67,15 @@ export const comments = mysqlTable("comments", {
   shares: int("shares").default(0),
   url: varchar("url", { length: 1024 }),
   publishedAt: timestamp("publishedAt"),
+  clusterId: varchar("clusterId", { length: 16 }), // near-duplicate cluster (canonical SimHash, hex)
   collectedAt: timestamp("collectedAt").defaultNow().notNull(),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
-}, (table) => [{
-  taskIdIdx: index("taskId_idx").on(table.taskId),
-  platformIdx: index("platform_idx").on(table.platform),
-  publishedAtIdx: index("publishedAt_idx").on(table.publishedAt),
-}]);
+}, (table) => [
+  index("taskId_idx").on(table.taskId),
+  index("platform_idx").on(table.platform),
+  index("publishedAt_idx").on(table.publishedAt),
+  index("task_cluster_idx").on(table.taskId, table.clusterId),
+]);
 
 export type Comment = typeof comments.$inferSelect;
 export type InsertComment = typeof comments.$inferInsert;
@@ -88,60 +91,126 @@ export const sentimentAnalysis = mysqlTable("sentiment_analysis", {
   confidence: decimal("confidence", { precision: 5, scale: 4 }).notNull(),
   keywords: text("keywords"), // JSON array of extracted keywords
   tfidfScores: text("tfidfScores"), // JSON object of keyword -> TF-IDF score
+  aspectScores: text("aspectScores"), // JSON object of aspect word -> sentiment contribution
   analyzedAt: timestamp("analyzedAt").defaultNow().notNull(),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
-}, (table) => [{
-  commentIdIdx: index("commentId_idx").on(table.commentId),
-  sentimentIdx: index("sentiment_idx").on(table.sentiment),
-}]);
+}, (table) => [
+  index("commentId_idx").on(table.commentId),
+  index("sentiment_idx").on(table.sentiment),
+]);
 
 export type SentimentAnalysis = typeof sentimentAnalysis.$inferSelect;
 export type InsertSentimentAnalysis = typeof sentimentAnalysis.$inferInsert;
 
 /**
- * Daily sentiment statistics for trend analysis
+ * Sentiment statistics rollup for trend analysis
+ * One row per task / platform ("all" for every platform) / granularity / bucket start,
+ * maintained incrementally by server/analytics/rollup.py
  */
 export const sentimentStats = mysqlTable("sentiment_stats", {
   id: int("id").autoincrement().primaryKey(),
   taskId: int("taskId").notNull(),
-  date: timestamp("date").notNull(), // UTC date
+  platform: varchar("platform", { length: 50 }).default("all").notNull(),
+  granularity: mysqlEnum("granularity", ["day", "hour"]).default("day").notNull(),
+  date: timestamp("date").notNull(), // UTC bucket start
   totalComments: int("totalComments").default(0),
   positiveCount: int("positiveCount").default(0),
   negativeCount: int("negativeCount").default(0),
   neutralCount: int("neutralCount").default(0),
+  scoreSum: decimal("scoreSum", { precision: 14, scale: 4 }).default("0"),
   averageSentimentScore: decimal("averageSentimentScore", { precision: 5, scale: 4 }),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
-}, (table) => [{
-  taskIdIdx: index("taskId_idx").on(table.taskId),
-  dateIdx: index("date_idx").on(table.date),
-}]);
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => [
+  index("taskId_idx").on(table.taskId),
+  index("date_idx").on(table.date),
+  uniqueIndex("bucket_idx").on(table.taskId, table.platform, table.granularity, table.date),
+]);
 
 export type SentimentStats = typeof sentimentStats.$inferSelect;
 export type InsertSentimentStats = typeof sentimentStats.$inferInsert;
 
+/**
+ * Watermarks of incremental background jobs (e.g. the sentiment_stats rollup)
+ */
+export const rollupState = mysqlTable("rollup_state", {
+  name: varchar("name", { length: 64 }).primaryKey(),
+  lastId: int("lastId").default(0).notNull(),
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+});
+
+/**
+ * Volume / negative-share bursts raised by the anomaly detector (server/analytics/anomaly.py)
+ * One row per task / metric / bucket; a later, stronger reading of the same bucket updates it
+ */
+export const sentimentAlerts = mysqlTable("sentiment_alerts", {
+  id: int("id").autoincrement().primaryKey(),
+  taskId: int("taskId").notNull(),
+  metric: mysqlEnum("metric", ["volume_spike", "negative_spike"]).notNull(),
+  severity: mysqlEnum("severity", ["warning", "critical"]).notNull(),
+  bucketStart: timestamp("bucketStart").notNull(), // UTC
+  value: decimal("value", { precision: 14, scale: 4 }).notNull(),
+  baseline: decimal("baseline", { precision: 14, scale: 4 }).notNull(),
+  zScore: decimal("zScore", { precision: 8, scale: 3 }).notNull(),
+  acknowledged: boolean("acknowledged").default(false).notNull(),
+  createdAt: timestamp("createdAt").defaultNow().notNull(),
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => [
+  uniqueIndex("alert_bucket_idx").on(table.taskId, table.metric, table.bucketStart),
+]);
+
+export type SentimentAlert = typeof sentimentAlerts.$inferSelect;
+export type InsertSentimentAlert = typeof sentimentAlerts.$inferInsert;
+
 /**
  * Crawling jobs and their status
+ * Also the collector work queue: the app enqueues pending rows and workers
+ * (server/collectors/worker.py) claim them under a lease renewed by heartbeats
  */
 export const crawlJobs = mysqlTable("crawl_jobs", {
   id: int("id").autoincrement().primaryKey(),
   taskId: int("taskId").notNull(),
   platform: varchar("platform", { length: 50 }).notNull(),
+  keyword: varchar("keyword", { length: 255 }),
+  maxResults: int("maxResults").default(50).notNull(),
   status: mysqlEnum("status", ["pending", "running", "completed", "failed"]).default("pending").notNull(),
+  // 1 while pending/running, NULL afterwards; unique with taskId/platform so a task/platform has at most one active job
+  active: tinyint("active").generatedAlwaysAs(sql`(case when \`status\` in ('pending','running') then 1 end)`, { mode: "stored" }),
   totalCollected: int("totalCollected").default(0),
   newComments: int("newComments").default(0),
   duplicates: int("duplicates").default(0),
   errorMessage: text("errorMessage"),
+  workerId: varchar("workerId", { length: 128 }), // worker holding the lease
+  attempts: int("attempts").default(0).notNull(), // claims so far; expired leases are retried
+  leaseToken: int("leaseToken").default(0).notNull(), // fencing token, incremented by every claim
+  heartbeatAt: timestamp("heartbeatAt"),
+  leaseExpiresAt: timestamp("leaseExpiresAt"),
   startedAt: timestamp("startedAt"),
   completedAt: timestamp("completedAt"),
   createdAt: timestamp("createdAt").defaultNow().notNull(),
-}, (table) => [{
-  taskIdIdx: index("taskId_idx").on(table.taskId),
-  statusIdx: index("status_idx").on(table.status),
-}]);
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => [
+  index("taskId_idx").on(table.taskId),
+  index("status_idx").on(table.status),
+  index("lease_idx").on(table.status, table.leaseExpiresAt),
+  uniqueIndex("active_job_idx").on(table.taskId, table.platform, table.active),
+]);
 
 export type CrawlJob = typeof crawlJobs.$inferSelect;
 export type InsertCrawlJob = typeof crawlJobs.$inferInsert;
 
+/**
+ * Live collector workers; tasks are sharded over them with a consistent hash ring
+ * (server/collectors/job_queue.py). A worker drops off when its heartbeat goes stale
+ */
+export const crawlWorkers = mysqlTable("crawl_workers", {
+  workerId: varchar("workerId", { length: 128 }).primaryKey(),
+  platforms: varchar("platforms", { length: 255 }), // comma-separated, NULL = all
+  slots: int("slots").default(1).notNull(),
+  heartbeatAt: timestamp("heartbeatAt").defaultNow().notNull(),
+  startedAt: timestamp("startedAt").defaultNow().notNull(),
+});
+
 /**
  * Relations for type safety
  */
@@ -3,9 +3,10 @@
 使用 BERT 进行情感分析，Jieba 进行关键词提取
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+import hmac
 import json
 import os
 from pathlib import Path
@@ -16,9 +17,12 @@ sys.path.insert(0, str(Path(__file__).parent / "server" / "nlp"))
 
 try:
     from sentiment_analyzer import SentimentAnalyzer
+    from backends import MicroBatcher
 except ImportError:
     print("Warning: Could not import SentimentAnalyzer")
 
+from text_normalizer import normalize_text
+
 app = FastAPI(title="舆情分析 NLP 服务", version="1.0.0")
 
 # 初始化分析器
@@ -28,11 +32,21 @@ except Exception as e:
     print(f"Warning: Failed to initialize SentimentAnalyzer: {e}")
     analyzer = None
 
+# 模型后端把并发的单条请求合并成批次推理；词典规则足够快，直接同步计算
+batcher = None
+if analyzer and analyzer.backend.name != "lexicon":
+    batcher = MicroBatcher(
+        analyzer,
+        max_batch_size=int(os.getenv("NLP_MAX_BATCH_SIZE", "32")),
+        max_wait=float(os.getenv("NLP_BATCH_WAIT_MS", "10")) / 1000
+    )
+
 
 class TextInput(BaseModel):
     """文本输入模型"""
     text: str
     language: str = "zh"
+    normalized: bool = False  # 采集端已规范化的文本不再重复处理
 
 
 class SentimentResult(BaseModel):
@@ -40,6 +54,9 @@ class SentimentResult(BaseModel):
     sentiment: str  # positive, negative, neutral
     score: float
     confidence: float
+    lexicon_version: Optional[str] = None
+    backend: Optional[str] = None
+    aspects: Optional[Dict[str, float]] = None  # 方面词 -> 情感贡献
 
 
 class KeywordResult(BaseModel):
@@ -53,6 +70,7 @@ class BatchAnalysisInput(BaseModel):
     """批量分析输入"""
     texts: List[str]
     language: str = "zh"
+    normalized: bool = False
 
 
 class BatchAnalysisResult(BaseModel):
@@ -67,7 +85,10 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "NLP Analysis Service",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "lexicon_version": analyzer.lexicon_version if analyzer else None,
+        "backend": analyzer.backend.name if analyzer else None,
+        "backend_stats": analyzer.backend.stats() if analyzer else None
     }
 
 
@@ -89,18 +110,26 @@ async def analyze_sentiment(input_data: TextInput):
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
     try:
-        result = analyzer.analyze_sentiment(input_data.text)
+        text = input_data.text if input_data.normalized else normalize_text(input_data.text)
+        if batcher:
+            result = await batcher.analyze(text)
+        else:
+            result = analyzer.analyze_sentiment(text)
         return SentimentResult(
             sentiment=result["sentiment"],
             score=result["score"],
-            confidence=result["confidence"]
+            confidence=result["confidence"],
+            lexicon_version=result.get("lexicon_version"),
+            backend=result.get("backend"),
+            aspects=result.get("aspects")
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+# CPU密集的同步处理函数定义为普通def，由FastAPI放到线程池执行，不阻塞事件循环
 @app.post("/keywords", response_model=List[KeywordResult])
-async def extract_keywords(input_data: TextInput, top_k: int = 20):
+def extract_keywords(input_data: TextInput, top_k: int = 20):
     """
     提取文本中的关键词
     
@@ -118,7 +147,8 @@ async def extract_keywords(input_data: TextInput, top_k: int = 20):
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
     try:
-        keywords = analyzer.extract_keywords(input_data.text, top_k=top_k)
+        text = input_data.text if input_data.normalized else normalize_text(input_data.text)
+        keywords = analyzer.extract_keywords(text, top_k=top_k)
         return [
             KeywordResult(
                 word=kw["word"],
@@ -132,7 +162,7 @@ async def extract_keywords(input_data: TextInput, top_k: int = 20):
 
 
 @app.post("/batch-analyze", response_model=BatchAnalysisResult)
-async def batch_analyze(input_data: BatchAnalysisInput):
+def batch_analyze(input_data: BatchAnalysisInput):
     """
     批量分析文本的情感和关键词
     
@@ -151,16 +181,21 @@ async def batch_analyze(input_data: BatchAnalysisInput):
     try:
         # 分析情感
         sentiment_results = []
-        all_texts = " ".join(input_data.texts)
+        texts = input_data.texts
+        if not input_data.normalized:
+            texts = [normalize_text(text) for text in texts]
+        all_texts = " ".join(texts)
         
-        for text in input_data.texts:
-            if text.strip():
-                result = analyzer.analyze_sentiment(text)
-                sentiment_results.append(SentimentResult(
-                    sentiment=result["sentiment"],
-                    score=result["score"],
-                    confidence=result["confidence"]
-                ))
+        non_empty = [text for text in texts if text.strip()]
+        for result in analyzer.analyze_batch(non_empty):
+            sentiment_results.append(SentimentResult(
+                sentiment=result["sentiment"],
+                score=result["score"],
+                confidence=result["confidence"],
+                lexicon_version=result.get("lexicon_version"),
+                backend=result.get("backend"),
+                aspects=result.get("aspects")
+            ))
         
         # 提取关键词
         keywords_data = analyzer.extract_keywords(all_texts, top_k=30)
@@ -181,6 +216,35 @@ async def batch_analyze(input_data: BatchAnalysisInput):
         raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
 
 
+@app.post("/admin/reload-lexicons")
+async def reload_lexicons(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    重新加载词典和停用词
+    
+    本进程立即切换到新版本；其他worker进程通过共享的重载标记在数秒内跟进。
+    需在X-Admin-Token请求头中提供NLP_ADMIN_TOKEN；未配置令牌时接口关闭。
+    """
+    admin_token = os.getenv("NLP_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: NLP_ADMIN_TOKEN is not set")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="NLP service not initialized")
+    
+    previous = analyzer.lexicon_version
+    try:
+        bundle = analyzer.lexicon_manager.reload(broadcast=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lexicon reload failed: {str(e)}")
+    
+    return {
+        "previous_version": previous,
+        **bundle.info()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
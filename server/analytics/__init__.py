@@ -0,0 +1,16 @@
+"""
+Analytics jobs over collected and analyzed comments
+
+The columnar exporter (analytics.export) is imported on its own so ingest does not load pyarrow.
+"""
+
+from .anomaly import AlertStore, AnomalyDetector, open_task_detector
+from .rollup import SentimentRollup, refresh_sentiment_stats
+
+__all__ = [
+    "AlertStore",
+    "AnomalyDetector",
+    "open_task_detector",
+    "SentimentRollup",
+    "refresh_sentiment_stats",
+]
@@ -0,0 +1,554 @@
+"""
+Streaming burst / anomaly detection on per-task sentiment time series
+Comment volume and negative share per bucket are compared against EWMA baselines
+(optionally per hour of day); bursts raise warning/critical alerts. The same model
+replays historical rollup buckets with vectorized NumPy.
+"""
+
+import argparse
+import calendar
+import logging
+import math
+import numbers
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    from .rollup import connect
+except ImportError:
+    from rollup import connect
+
+logger = logging.getLogger(__name__)
+
+VOLUME_SPIKE = "volume_spike"
+NEGATIVE_SPIKE = "negative_spike"
+
+SEVERITIES = ("warning", "critical")
+
+# 回放时按块计算EWMA，块内用累加和向量化，块间传递状态（块长受衰减因子的数值范围限制）
+EWMA_BLOCK = 64
+
+GRANULARITY_SECONDS = {"hour": 3600, "day": 86400}
+
+
+def to_epoch(value) -> Optional[float]:
+    """
+    Epoch seconds of a timestamp
+
+    Accepts datetimes (naive values are taken as UTC), ISO strings and numbers.
+    Returns None for values that cannot be parsed.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, numbers.Real):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return value.timestamp()
+        return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+    return None
+
+
+class Ewma:
+    """指数加权均值和方差（O(1)更新）"""
+
+    __slots__ = ("mean", "square", "count")
+
+    def __init__(self, mean: float = 0.0, square: float = 0.0, count: int = 0):
+        self.mean = mean
+        self.square = square
+        self.count = count
+
+    def update(self, value: float, alpha: float):
+        if self.count == 0:
+            self.mean = value
+            self.square = value * value
+        else:
+            self.mean += alpha * (value - self.mean)
+            self.square += alpha * (value * value - self.square)
+        self.count += 1
+
+    @property
+    def variance(self) -> float:
+        return max(self.square - self.mean * self.mean, 0.0)
+
+
+def volume_z(value: float, mean: float, variance: float) -> float:
+    """z-score of a bucket count; a Poisson floor keeps sparse series from alerting on noise"""
+    return (value - mean) / math.sqrt(variance + max(mean, 1.0))
+
+
+def share_z(share: float, total: float, mean: float, variance: float) -> float:
+    """z-score of a negative share, widened by the sampling error of a bucket of `total` comments"""
+    p = min(max(mean, 0.02), 0.98)
+    return (share - mean) / math.sqrt(variance + p * (1.0 - p) / total)
+
+
+class TaskSeries:
+    """单个任务的流式状态：未关闭的桶计数和各项基线"""
+
+    __slots__ = ("open", "next_close", "latest", "volume", "seasonal", "negative", "late")
+
+    def __init__(self, period: int):
+        self.open: Dict[int, List[int]] = {}
+        self.next_close: Optional[int] = None
+        self.latest: Optional[int] = None
+        self.volume = Ewma()
+        self.seasonal = [Ewma() for _ in range(period)] if period > 1 else []
+        self.negative = Ewma()
+        self.late = 0
+
+
+class AnomalyDetector:
+    """按任务的情感突发检测器"""
+
+    def __init__(
+        self,
+        bucket_seconds: int = 3600,
+        alpha: float = 0.1,
+        seasonal: bool = True,
+        z_warning: float = 3.0,
+        z_critical: float = 5.0,
+        min_periods: int = 6,
+        min_count: int = 10,
+        lateness: int = 2,
+        sink: Optional[Callable[[Dict], None]] = None,
+    ):
+        """
+        Initialize detector
+
+        Args:
+            bucket_seconds: Bucket width (3600 matches the hourly rollup)
+            alpha: EWMA smoothing factor of the baselines
+            seasonal: Keep a separate volume baseline per time of day
+            z_warning: z-score that raises a warning
+            z_critical: z-score that raises a critical alert
+            min_periods: Buckets a baseline must have seen before it can alert
+            min_count: Minimum comments in a bucket to judge it (and to learn the negative share)
+            lateness: Buckets kept open for out-of-order comments after a newer bucket arrived
+            sink: Called with each alert dict
+        """
+        self.bucket_seconds = bucket_seconds
+        self.alpha = alpha
+        self.period = 86400 // bucket_seconds if seasonal and 86400 % bucket_seconds == 0 else 1
+        self.z_warning = z_warning
+        self.z_critical = z_critical
+        self.min_periods = min_periods
+        self.min_count = min_count
+        self.lateness = lateness
+        self.sink = sink
+        self.tasks: Dict[int, TaskSeries] = {}
+
+    # ---- 流式接口 ----
+
+    def observe(self, task_id: int, timestamp, sentiment: Optional[str]) -> List[Dict]:
+        """
+        Account one analyzed comment
+
+        A bucket is judged once, when it closes (`lateness` buckets after a newer one
+        arrived), so streaming raises the same alerts as replay. Until the first bucket
+        of a task closes, older comments extend the series backwards: search results
+        arrive newest first.
+
+        Args:
+            task_id: Monitoring task
+            timestamp: Publish time (datetime, ISO string or epoch); unparsable values use now
+            sentiment: positive / negative / neutral
+
+        Returns:
+            Alerts raised by this comment (also passed to the sink)
+        """
+        epoch = to_epoch(timestamp)
+        if epoch is None:
+            epoch = datetime.now(timezone.utc).timestamp()
+        bucket = int(epoch // self.bucket_seconds)
+
+        series = self.tasks.get(task_id)
+        if series is None:
+            series = self.tasks[task_id] = TaskSeries(self.period)
+        if series.next_close is None:
+            series.next_close = bucket - self.lateness
+            series.latest = bucket
+        elif bucket < series.next_close:
+            if series.volume.count:
+                series.late += 1
+                return []
+            # 尚未关闭过任何桶：从最早的评论开始建立序列
+            series.next_close = bucket
+
+        counts = series.open.get(bucket)
+        if counts is None:
+            counts = series.open[bucket] = [0, 0]
+        counts[0] += 1
+        if sentiment == "negative":
+            counts[1] += 1
+
+        alerts: List[Dict] = []
+        if bucket > series.latest:
+            series.latest = bucket
+            while series.next_close < bucket - self.lateness:
+                self._close(task_id, series, series.next_close, alerts)
+                series.next_close += 1
+        return alerts
+
+    def _baseline(self, series: TaskSeries, bucket: int) -> Ewma:
+        if series.seasonal:
+            slot = series.seasonal[bucket % self.period]
+            if slot.count >= self.min_periods:
+                return slot
+        return series.volume
+
+    def _severity(self, z: float) -> int:
+        if z >= self.z_critical:
+            return 2
+        if z >= self.z_warning:
+            return 1
+        return 0
+
+    def _check(self, task_id: int, series: TaskSeries, bucket: int, total: int, negative: int,
+               alerts: List[Dict]):
+        if total < self.min_count:
+            return
+        baseline = self._baseline(series, bucket)
+        if baseline.count >= self.min_periods:
+            z = volume_z(total, baseline.mean, baseline.variance)
+            if z >= self.z_warning:
+                self._emit(task_id, bucket, VOLUME_SPIKE, z, total, baseline.mean, alerts)
+        share = series.negative
+        if share.count >= self.min_periods:
+            z = share_z(negative / total, total, share.mean, share.variance)
+            if z >= self.z_warning:
+                self._emit(task_id, bucket, NEGATIVE_SPIKE, z, negative / total, share.mean, alerts)
+
+    def _emit(self, task_id: int, bucket: int, metric: str, z: float,
+              value: float, baseline: float, alerts: List[Dict]):
+        level = self._severity(z)
+        alert = self.make_alert(task_id, bucket, metric, level, value, baseline, z)
+        alerts.append(alert)
+        logger.warning(
+            f"Task {task_id}: {metric} ({alert['severity']}) at {alert['bucket_start']}, "
+            f"value={value:.3f} baseline={baseline:.3f} z={z:.1f}"
+        )
+        if self.sink:
+            try:
+                self.sink(alert)
+            except Exception as e:
+                logger.error(f"Alert sink failed: {e}")
+
+    def make_alert(self, task_id: int, bucket: int, metric: str, level: int,
+                   value: float, baseline: float, z: float) -> Dict:
+        return {
+            "task_id": task_id,
+            "metric": metric,
+            "severity": SEVERITIES[level - 1],
+            "bucket_start": datetime(1970, 1, 1) + timedelta(seconds=bucket * self.bucket_seconds),
+            "value": round(float(value), 4),
+            "baseline": round(float(baseline), 4),
+            "z_score": round(float(z), 3),
+        }
+
+    def _close(self, task_id: int, series: TaskSeries, bucket: int, alerts: List[Dict]):
+        """Judge a finished bucket, then fold it into the baselines"""
+        total, negative = series.open.pop(bucket, (0, 0))
+        # 序列从第一个非空桶开始，之前的空桶不计入基线
+        if series.volume.count == 0 and total == 0:
+            return
+
+        self._check(task_id, series, bucket, total, negative, alerts)
+
+        series.volume.update(total, self.alpha)
+        if series.seasonal:
+            series.seasonal[bucket % self.period].update(total, self.alpha)
+        if total >= self.min_count:
+            series.negative.update(negative / total, self.alpha)
+
+    # ---- 历史回放 ----
+
+    def replay(self, task_id: int, buckets: np.ndarray, totals: np.ndarray, negatives: np.ndarray,
+               open_buckets: int = 0) -> List[Dict]:
+        """
+        Replay bucketed history with vectorized NumPy
+
+        Produces the same alerts the streaming path would have raised at bucket close
+        and leaves the task's streaming state as if every bucket had been observed.
+
+        Args:
+            task_id: Monitoring task
+            buckets: Bucket indices (epoch // bucket_seconds), any order, unique
+            totals: Comments per bucket
+            negatives: Negative comments per bucket
+            open_buckets: Most recent buckets to keep open instead of judging them
+                (set to lateness + 1 when resuming live detection)
+
+        Returns:
+            Alerts for the judged buckets (not passed to the sink)
+        """
+        series = self.tasks[task_id] = TaskSeries(self.period)
+        buckets = np.asarray(buckets, dtype=np.int64)
+        if buckets.size == 0:
+            return []
+        order = np.argsort(buckets)
+        buckets = buckets[order]
+        totals = np.asarray(totals, dtype=np.float64)[order]
+        negatives = np.asarray(negatives, dtype=np.float64)[order]
+
+        nonempty = np.nonzero(totals > 0)[0]
+        if nonempty.size == 0:
+            return []
+        first, latest = int(buckets[nonempty[0]]), int(buckets[-1])
+        end = latest - open_buckets  # 最后一个参与判定的桶
+
+        series.latest = latest
+        series.next_close = end + 1
+        for b, t, n in zip(buckets, totals, negatives):
+            if b > end:
+                series.open[int(b)] = [int(t), int(n)]
+        if end < first:
+            return []
+
+        # 稠密化：缺失的桶计为0条
+        length = end - first + 1
+        dense_total = np.zeros(length)
+        dense_negative = np.zeros(length)
+        mask = (buckets >= first) & (buckets <= end)
+        dense_total[buckets[mask] - first] = totals[mask]
+        dense_negative[buckets[mask] - first] = negatives[mask]
+        index = np.arange(first, end + 1)
+
+        # 各桶判定时使用的基线为其之前的状态
+        mean, square, count = self._prior_ewma(dense_total, series.volume)
+        if series.seasonal:
+            for slot in range(self.period):
+                positions = np.nonzero(index % self.period == slot)[0]
+                if positions.size == 0:
+                    continue
+                s_mean, s_square, s_count = self._prior_ewma(dense_total[positions], series.seasonal[slot])
+                use = s_count >= self.min_periods
+                mean[positions[use]] = s_mean[use]
+                square[positions[use]] = s_square[use]
+                count[positions[use]] = s_count[use]
+
+        judged = dense_total >= self.min_count
+        z = np.full(length, -np.inf)
+        ready = judged & (count >= self.min_periods)
+        variance = np.maximum(square - mean * mean, 0.0)
+        z[ready] = (dense_total[ready] - mean[ready]) / np.sqrt(variance[ready] + np.maximum(mean[ready], 1.0))
+        alerts = self._collect(task_id, index, VOLUME_SPIKE, z, dense_total, mean)
+
+        positions = np.nonzero(judged)[0]
+        if positions.size:
+            share = dense_negative[positions] / dense_total[positions]
+            s_mean, s_square, s_count = self._prior_ewma(share, series.negative)
+            ready = s_count >= self.min_periods
+            p = np.clip(s_mean, 0.02, 0.98)
+            s_var = np.maximum(s_square - s_mean * s_mean, 0.0)
+            z = np.full(positions.size, -np.inf)
+            z[ready] = (share[ready] - s_mean[ready]) / np.sqrt(
+                s_var[ready] + p[ready] * (1.0 - p[ready]) / dense_total[positions][ready])
+            alerts += self._collect(task_id, index[positions], NEGATIVE_SPIKE, z, share, s_mean)
+
+        alerts.sort(key=lambda a: a["bucket_start"])
+        return alerts
+
+    def _prior_ewma(self, values: np.ndarray, state: Ewma) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Baselines in effect before each value, and the final state stored into `state`
+        """
+        n = values.size
+        mean_after = ewma(values, self.alpha)
+        square_after = ewma(values * values, self.alpha)
+        mean = np.empty(n)
+        square = np.empty(n)
+        mean[0], square[0] = 0.0, 0.0
+        mean[1:], square[1:] = mean_after[:-1], square_after[:-1]
+        state.mean, state.square, state.count = float(mean_after[-1]), float(square_after[-1]), int(n)
+        return mean, square, np.arange(n)
+
+    def _collect(self, task_id: int, index: np.ndarray, metric: str, z: np.ndarray,
+                 values: np.ndarray, baselines: np.ndarray) -> List[Dict]:
+        hits = np.nonzero(z >= self.z_warning)[0]
+        return [
+            self.make_alert(task_id, int(index[i]), metric, self._severity(z[i]), values[i], baselines[i], z[i])
+            for i in hits
+        ]
+
+    def warm_start(self, connection, task_id: int) -> List[Dict]:
+        """
+        Seed a task's streaming state from the sentiment_stats rollup
+
+        The newest `lateness + 1` buckets stay open so comments ingested now add to them.
+        Buckets that were still open when an earlier ingest run ended are only judged
+        here, so alerts of the last day of judged buckets also go to the sink (the alert
+        store upserts, repeats are harmless).
+        """
+        buckets, totals, negatives = load_buckets(connection, task_id, self.bucket_seconds)
+        alerts = self.replay(task_id, buckets, totals, negatives, open_buckets=self.lateness + 1)
+        if self.sink and alerts:
+            series = self.tasks[task_id]
+            since = datetime(1970, 1, 1) + timedelta(
+                seconds=(series.next_close - max(86400 // self.bucket_seconds, 1)) * self.bucket_seconds)
+            for alert in alerts:
+                if alert["bucket_start"] >= since:
+                    try:
+                        self.sink(alert)
+                    except Exception as e:
+                        logger.error(f"Alert sink failed: {e}")
+        logger.info(f"Anomaly baselines for task {task_id} warmed from {len(buckets)} buckets")
+        return alerts
+
+    def stats(self) -> Dict:
+        return {
+            "tasks": len(self.tasks),
+            "late": sum(series.late for series in self.tasks.values()),
+        }
+
+
+def ewma(values: np.ndarray, alpha: float, block: int = EWMA_BLOCK) -> np.ndarray:
+    """
+    EWMA after each value, starting from the first value
+
+    m[k] = d^(k+1) * m0 + alpha * sum_j d^(k-j) x[j] with d = 1 - alpha is evaluated
+    per block as a scaled cumulative sum, so only one Python step runs per block.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(values.size)
+    if values.size == 0:
+        return out
+    powers = (1.0 - alpha) ** np.arange(1, block + 1)
+    state = values[0]
+    for start in range(0, values.size, block):
+        chunk = values[start:start + block]
+        p = powers[:chunk.size]
+        out[start:start + chunk.size] = p * (state + alpha * np.cumsum(chunk / p))
+        state = out[start + chunk.size - 1]
+    return out
+
+
+def load_buckets(connection, task_id: int, bucket_seconds: int = 3600,
+                 since: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read a task's cross-platform rollup buckets as arrays
+
+    Returns:
+        (bucket indices, totals, negative counts)
+    """
+    granularity = next((g for g, s in GRANULARITY_SECONDS.items() if s == bucket_seconds), None)
+    if granularity is None:
+        raise ValueError(f"No rollup granularity for {bucket_seconds}s buckets")
+
+    sql = """
+    SELECT date, totalComments, negativeCount FROM sentiment_stats
+    WHERE taskId = %s AND platform = 'all' AND granularity = %s
+    """
+    params: list = [task_id, granularity]
+    if since is not None:
+        sql += " AND date >= %s"
+        params.append(since)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if rows and isinstance(rows[0], dict):
+        rows = [(r["date"], r["totalComments"], r["negativeCount"]) for r in rows]
+
+    buckets = np.fromiter((to_epoch(r[0]) // bucket_seconds for r in rows), dtype=np.int64, count=len(rows))
+    totals = np.fromiter((r[1] or 0 for r in rows), dtype=np.float64, count=len(rows))
+    negatives = np.fromiter((r[2] or 0 for r in rows), dtype=np.float64, count=len(rows))
+    return buckets, totals, negatives
+
+
+class AlertStore:
+    """sentiment_alerts表的写入（同一任务/指标/桶只保留一行）"""
+
+    SQL = """
+    INSERT INTO sentiment_alerts (taskId, metric, severity, bucketStart, value, baseline, zScore)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        severity = VALUES(severity), value = VALUES(value),
+        baseline = VALUES(baseline), zScore = VALUES(zScore)
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @staticmethod
+    def _params(alert: Dict) -> Tuple:
+        return (alert["task_id"], alert["metric"], alert["severity"], alert["bucket_start"],
+                alert["value"], alert["baseline"], alert["z_score"])
+
+    def save(self, alert: Dict):
+        self.save_many([alert])
+
+    def save_many(self, alerts: Iterable[Dict]) -> int:
+        params = [self._params(alert) for alert in alerts]
+        if not params:
+            return 0
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.executemany(self.SQL, params)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return len(params)
+
+
+def open_task_detector(connection, task_id: int, sink: Optional[Callable[[Dict], None]] = None,
+                       **kwargs) -> AnomalyDetector:
+    """
+    Detector for an ingest run: alerts go to sentiment_alerts (or `sink`) and baselines
+    are warmed from the rollup (a failed warm start only costs the warm-up period)
+    """
+    detector = AnomalyDetector(sink=sink or AlertStore(connection).save, **kwargs)
+    try:
+        detector.warm_start(connection, task_id)
+    except Exception as e:
+        logger.warning(f"Could not warm anomaly baselines for task {task_id}: {e}")
+    return detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay rollup buckets through the anomaly detector")
+    parser.add_argument("--task-id", type=int, required=True)
+    parser.add_argument("--days", type=int, default=30, help="History to replay")
+    parser.add_argument("--granularity", choices=sorted(GRANULARITY_SECONDS), default="hour")
+    parser.add_argument("--dry-run", action="store_true", help="Print alerts without storing them")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("DATABASE_URL not set")
+        return
+
+    connection = connect(db_url)
+    try:
+        detector = AnomalyDetector(bucket_seconds=GRANULARITY_SECONDS[args.granularity])
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=args.days)
+        buckets, totals, negatives = load_buckets(connection, args.task_id, detector.bucket_seconds, since)
+        alerts = detector.replay(args.task_id, buckets, totals, negatives)
+        if args.dry_run:
+            for alert in alerts:
+                print(alert)
+        else:
+            stored = AlertStore(connection).save_many(alerts)
+            logger.info(f"Stored {stored} alerts for task {args.task_id} from {len(buckets)} buckets")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
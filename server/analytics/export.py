@@ -0,0 +1,276 @@
+"""
+Columnar export of comments and their sentiment analysis
+Streams rows from MySQL through a server-side cursor and writes them in chunks to
+Parquet or Arrow IPC, so memory stays flat however large the task is
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pymysql
+from dotenv import load_dotenv
+
+try:
+    from .rollup import connect
+except ImportError:
+    from rollup import connect
+
+logger = logging.getLogger(__name__)
+
+SENTIMENTS = pa.array(["positive", "negative", "neutral"], pa.string())
+
+# 列名, 查询表达式, Arrow类型（字典列在写入前编码）
+COLUMNS: Tuple[Tuple[str, str, pa.DataType], ...] = (
+    ("id", "c.id", pa.int64()),
+    ("taskId", "c.taskId", pa.int32()),
+    ("platform", "c.platform", pa.dictionary(pa.int32(), pa.string())),
+    ("platformId", "c.platformId", pa.string()),
+    ("author", "c.author", pa.string()),
+    ("authorId", "c.authorId", pa.string()),
+    ("content", "c.content", pa.string()),
+    ("likes", "c.likes", pa.int32()),
+    ("replies", "c.replies", pa.int32()),
+    ("shares", "c.shares", pa.int32()),
+    ("url", "c.url", pa.string()),
+    ("clusterId", "c.clusterId", pa.string()),
+    ("publishedAt", "c.publishedAt", pa.timestamp("s")),
+    ("collectedAt", "c.collectedAt", pa.timestamp("s")),
+    ("sentiment", "sa.sentiment", pa.dictionary(pa.int8(), pa.string())),
+    ("score", "sa.score", pa.float64()),
+    ("confidence", "sa.confidence", pa.float64()),
+    ("keywords", "sa.keywords", pa.string()),
+    ("aspectScores", "sa.aspectScores", pa.string()),
+    ("analyzedAt", "sa.analyzedAt", pa.timestamp("s")),
+)
+
+SCHEMA = pa.schema([pa.field(name, dtype) for name, _, dtype in COLUMNS])
+
+FORMATS = ("parquet", "arrow")
+
+
+def build_query(
+    task_id: int,
+    platforms: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    analyzed_only: bool = False,
+) -> Tuple[str, List]:
+    """
+    Export query and its parameters
+
+    The time filter applies to COALESCE(publishedAt, collectedAt), like the rollup buckets.
+    """
+    join = "JOIN" if analyzed_only else "LEFT JOIN"
+    conditions = ["c.taskId = %s"]
+    params: List = [task_id]
+    if platforms:
+        conditions.append(f"c.platform IN ({', '.join(['%s'] * len(platforms))})")
+        params.extend(platforms)
+    if since is not None:
+        conditions.append("COALESCE(c.publishedAt, c.collectedAt) >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("COALESCE(c.publishedAt, c.collectedAt) < %s")
+        params.append(until)
+
+    sql = (
+        f"SELECT {', '.join(expr for _, expr, _ in COLUMNS)} "
+        f"FROM comments c {join} sentiment_analysis sa ON sa.commentId = c.id "
+        f"WHERE {' AND '.join(conditions)} ORDER BY c.id"
+    )
+    return sql, params
+
+
+def encode_dictionary(values: List, dictionary: pa.Array, index_type: pa.DataType) -> pa.DictionaryArray:
+    """
+    Encode values against a fixed dictionary
+
+    Every batch shares the same dictionary, which the Arrow IPC file format requires
+    and which keeps Parquet row-group dictionaries identical.
+    """
+    indices = pc.index_in(pa.array(values, pa.string()), value_set=dictionary).cast(index_type)
+    return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def rows_to_batch(rows: Sequence[Tuple], platforms: pa.Array) -> pa.RecordBatch:
+    """Transpose a chunk of result tuples into a record batch of the export schema"""
+    arrays = []
+    for (name, _, dtype), values in zip(COLUMNS, zip(*rows)):
+        if name == "platform":
+            arrays.append(encode_dictionary(values, platforms, pa.int32()))
+        elif name == "sentiment":
+            arrays.append(encode_dictionary(values, SENTIMENTS, pa.int8()))
+        elif dtype == pa.float64():
+            # DECIMAL列由pymysql返回Decimal，先按decimal读入再整体转换
+            arrays.append(pa.array(values, pa.decimal128(5, 4)).cast(pa.float64()))
+        else:
+            arrays.append(pa.array(values, dtype))
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+
+def stream_rows(connection, sql: str, params: List, chunk_rows: int) -> Iterator[List[Tuple]]:
+    """Yield result chunks from an unbuffered server-side cursor"""
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+
+
+class _Writer:
+    """Parquet或Arrow IPC文件的统一写入接口"""
+
+    def __init__(self, path: str, fmt: str, compression: str):
+        self.fmt = fmt
+        self.closed = False
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, SCHEMA, compression=compression)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+            self._writer = pa.ipc.new_file(self._sink, SCHEMA, options=options)
+
+    def write(self, batch: pa.RecordBatch):
+        if self.fmt == "parquet":
+            # 每个批次一个row group，读取端可按批次流式读取
+            self._writer.write_batch(batch, row_group_size=batch.num_rows)
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.close()
+        if self.fmt != "parquet":
+            self._sink.close()
+
+
+def export_task(
+    connection,
+    path: str,
+    task_id: int,
+    platforms: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fmt: Optional[str] = None,
+    chunk_rows: int = 50000,
+    compression: str = "zstd",
+    analyzed_only: bool = False,
+) -> Dict:
+    """
+    Export a task's comments and sentiment results
+
+    Args:
+        connection: pymysql connection
+        path: Output file; written to a temporary name and moved into place when complete
+        task_id: Monitoring task
+        platforms: Only these platforms (default: all)
+        since: Inclusive lower bound on publish time
+        until: Exclusive upper bound on publish time
+        fmt: "parquet" or "arrow" (default: from the file extension, else parquet)
+        chunk_rows: Rows fetched and written per batch; bounds memory use
+        compression: Codec for Parquet pages or Arrow IPC buffers (zstd, lz4, none, ...)
+        analyzed_only: Skip comments without a sentiment result
+
+    Returns:
+        Export summary (rows, batches, bytes, seconds)
+    """
+    if fmt is None:
+        fmt = "arrow" if os.path.splitext(path)[1].lower() in (".arrow", ".feather", ".ipc") else "parquet"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    started = time.time()
+    sql, params = build_query(task_id, platforms, since, until, analyzed_only)
+
+    # 平台字典和数据流读自同一快照，导出过程中新写入的行不会出现在字典之外
+    with connection.cursor() as cursor:
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        cursor.execute("SELECT DISTINCT platform FROM comments WHERE taskId = %s", (task_id,))
+        rows = cursor.fetchall()
+    platform_values = sorted(r["platform"] if isinstance(r, dict) else r[0] for r in rows)
+    platform_dictionary = pa.array(platform_values, pa.string())
+
+    tmp_path = f"{path}.tmp"
+    writer = _Writer(tmp_path, fmt, compression)
+    total_rows = batches = 0
+    try:
+        for chunk in stream_rows(connection, sql, params, chunk_rows):
+            writer.write(rows_to_batch(chunk, platform_dictionary))
+            total_rows += len(chunk)
+            batches += 1
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        connection.commit()
+
+    summary = {
+        "task_id": task_id,
+        "path": path,
+        "format": fmt,
+        "rows": total_rows,
+        "batches": batches,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.time() - started, 3),
+    }
+    logger.info(f"Exported {total_rows} rows of task {task_id} to {path} "
+                f"({summary['bytes']} bytes, {summary['seconds']}s)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export comments and sentiment results to Parquet/Arrow")
+    parser.add_argument("--task-id", type=int, required=True)
+    parser.add_argument("--output", help="Output file (default: task-<id>.parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="Output format (default: from extension)")
+    parser.add_argument("--platforms", help="Comma-separated platforms to include")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Publish time lower bound (ISO, inclusive)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Publish time upper bound (ISO, exclusive)")
+    parser.add_argument("--analyzed-only", action="store_true", help="Only comments with a sentiment result")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--compression", default="zstd")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("DATABASE_URL not set")
+        return
+
+    platforms = [p.strip() for p in args.platforms.split(",")] if args.platforms else None
+    output = args.output or f"task-{args.task_id}.{'arrow' if args.format == 'arrow' else 'parquet'}"
+
+    connection = connect(db_url)
+    try:
+        summary = export_task(
+            connection, output, args.task_id, platforms, args.since, args.until,
+            fmt=args.format, chunk_rows=args.chunk_rows, compression=args.compression,
+            analyzed_only=args.analyzed_only,
+        )
+        print(json.dumps(summary, ensure_ascii=False))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -0,0 +1,50 @@
+"""
+Sentiment rollup tests: bucket keys and deltas produced from analyzed comments
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rollup import ALL_PLATFORMS, SentimentRollup
+
+
+def test_aggregate_buckets_by_day_and_hour_per_platform_and_overall():
+    rows = [
+        (1, "weibo", datetime(2024, 5, 1, 9, 15), "positive", 0.9),
+        (1, "weibo", datetime(2024, 5, 1, 9, 45), "negative", 0.1),
+        (1, "zhihu", datetime(2024, 5, 1, 10, 5), "neutral", 0.5),
+    ]
+    buckets = SentimentRollup.aggregate(rows)
+
+    day = datetime(2024, 5, 1)
+    nine = datetime(2024, 5, 1, 9)
+    ten = datetime(2024, 5, 1, 10)
+    assert buckets[(1, "weibo", "hour", nine)] == [2, 1, 1, 0, 1.0]
+    assert buckets[(1, "zhihu", "hour", ten)] == [1, 0, 0, 1, 0.5]
+    assert buckets[(1, "weibo", "day", day)] == [2, 1, 1, 0, 1.0]
+    # 跨平台汇总桶同时累加
+    assert buckets[(1, ALL_PLATFORMS, "day", day)] == [3, 1, 1, 1, 1.5]
+    assert buckets[(1, ALL_PLATFORMS, "hour", nine)] == [2, 1, 1, 0, 1.0]
+    assert len(buckets) == 7
+
+
+def test_aggregate_keeps_tasks_apart_and_tolerates_missing_values():
+    rows = [
+        (1, "reddit", datetime(2024, 5, 1, 23, 59), "positive", 0.8),
+        (2, "reddit", datetime(2024, 5, 2, 0, 0), None, None),
+        (2, "reddit", None, "negative", 0.2),
+    ]
+    buckets = SentimentRollup.aggregate(rows)
+
+    assert buckets[(1, "reddit", "day", datetime(2024, 5, 1))] == [1, 1, 0, 0, 0.8]
+    # 未知情感计为中性，缺失分数计0，缺失时间的评论不入桶
+    assert buckets[(2, "reddit", "day", datetime(2024, 5, 2))] == [1, 0, 0, 1, 0.0]
+    assert all(key[0] in (1, 2) for key in buckets)
+    assert sum(delta[0] for key, delta in buckets.items() if key[:3] == (2, "reddit", "hour")) == 1
+
+
+def test_aggregate_of_nothing_is_empty():
+    assert SentimentRollup.aggregate([]) == {}
@@ -0,0 +1,286 @@
+"""
+Response cache for Data API calls
+Two-level (memory LRU + SQLite on disk) cache keyed by endpoint and query params,
+with per-endpoint TTLs, size-bounded eviction and stale-while-revalidate
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 各接口的缓存有效期（秒）
+DEFAULT_ENDPOINT_TTLS = {
+    "Reddit/AccessAPI": 300,
+    "Youtube/search": 900,
+    "Youtube/get_channel_videos": 1800,
+}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "yuqing", "api_cache.sqlite3"
+)
+
+
+class ResponseCache:
+    """内存LRU + 磁盘SQLite的两级响应缓存"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 300,
+        stale_factor: float = 1.0,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 5000,
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            path: SQLite file for the disk level (None keeps the cache in memory only)
+            ttls: Per-endpoint freshness in seconds, merged over DEFAULT_ENDPOINT_TTLS
+            default_ttl: Freshness for endpoints without an explicit TTL
+            stale_factor: Stale entries are served for up to ttl * stale_factor past expiry
+            max_memory_entries: LRU size of the memory level
+            max_disk_entries: Maximum rows kept on disk (least recently used are evicted)
+        """
+        self.path = path
+        self.ttls = {**DEFAULT_ENDPOINT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.stale_factor = stale_factor
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        # 内存层保存序列化后的响应，每次读取都得到独立的副本
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._transaction() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        endpoint TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        body TEXT NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_accessed_idx ON responses (accessed_at)"
+                )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # sqlite3连接的with只提交事务不关闭连接，需要显式关闭
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    @staticmethod
+    def make_key(endpoint: str, query: Optional[Dict]) -> str:
+        """Build a cache key from endpoint and query params"""
+        payload = json.dumps([endpoint, query or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Tuple[float, object]]:
+        """
+        Look up a cached response
+
+        Returns:
+            (fetched_at, response) or None on a miss; the response is a fresh copy
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+        if entry:
+            return entry[0], json.loads(entry[1])
+
+        if not self.path:
+            return None
+
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT fetched_at, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+
+        self._remember(key, (row[0], row[1]))
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, endpoint: str, response: object):
+        """Store a response in both levels"""
+        fetched_at = time.time()
+        body = json.dumps(response, ensure_ascii=False)
+        self._remember(key, (fetched_at, body))
+
+        if not self.path:
+            return
+
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, endpoint, fetched_at, accessed_at, body)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, endpoint, fetched_at, fetched_at, body),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_disk_entries:
+                conn.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                    )
+                    """,
+                    (count - self.max_disk_entries,),
+                )
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+
+class CachedApiClient:
+    """为ApiClient增加缓存、请求合并和速率控制的包装器"""
+
+    def __init__(
+        self,
+        client,
+        cache: Optional[ResponseCache] = None,
+        platform: Optional[str] = None,
+        rate_limiter=None,
+    ):
+        """
+        Initialize cached client
+
+        Args:
+            client: Wrapped object with call_api(endpoint, query=...)
+            cache: Response cache (None disables caching)
+            platform: Rate limiter platform charged for upstream calls
+            rate_limiter: RateLimiter used for upstream calls only (cache hits are free)
+        """
+        self.client = client
+        self.cache = cache
+        self.platform = platform
+        self.rate_limiter = rate_limiter
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        # key -> [锁, 正在使用的线程数]，最后一个使用者退出时删除
+        self._key_locks: Dict[str, list] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _upstream(self, endpoint: str, query: Optional[Dict]):
+        if self.rate_limiter and self.platform:
+            self.rate_limiter.acquire_sync(self.platform)
+        return self.client.call_api(endpoint, query=query)
+
+    def _fetch_and_store(self, key: str, endpoint: str, query: Optional[Dict]):
+        response = self._upstream(endpoint, query)
+        # 只缓存成功的响应
+        if response and (not isinstance(response, dict) or response.get("success", True)):
+            self.cache.put(key, endpoint, response)
+        return response
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[None]:
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._key_locks[key]
+
+    def _refresh_in_background(self, key: str, endpoint: str, query: Optional[Dict]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(key, endpoint, query)
+                self._count("refreshes")
+            except Exception as e:
+                logger.warning(f"Background refresh of {endpoint} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def call_api(self, endpoint: str, query: Optional[Dict] = None):
+        """Same signature as ApiClient.call_api, served from cache when possible"""
+        if not self.cache:
+            return self._upstream(endpoint, query)
+
+        key = self.cache.make_key(endpoint, query)
+        ttl = self.cache.ttl_for(endpoint)
+
+        entry = self.cache.get(key)
+        if entry:
+            age = time.time() - entry[0]
+            if age < ttl:
+                self._count("hits")
+                return entry[1]
+            if age < ttl * (1 + self.cache.stale_factor):
+                self._count("stale_hits")
+                self._refresh_in_background(key, endpoint, query)
+                return entry[1]
+
+        # 同一个key只发一次上游请求，其他线程等待结果
+        with self._key_lock(key):
+            entry = self.cache.get(key)
+            if entry and time.time() - entry[0] < ttl:
+                self._count("hits")
+                return entry[1]
+            self._count("misses")
+            return self._fetch_and_store(key, endpoint, query)
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache
+
+    The disk level lives at API_CACHE_PATH (default ~/.cache/yuqing/api_cache.sqlite3)
+    and is shared by every process on this host.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(path=os.getenv("API_CACHE_PATH", DEFAULT_CACHE_PATH))
+        return _response_cache
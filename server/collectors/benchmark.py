@@ -0,0 +1,405 @@
+"""
+End-to-end ingest benchmark
+Streams a synthetic corpus (SyntheticCorpus, or MockDataGenerator) through the
+production ingest path, run_collector.collect_from_platform, against the SQLite
+stand-in database and a local HTTP stand-in for the NLP service (one request per
+post, as in production). Reports throughput, per-stage latency percentiles and peak
+RSS as JSON, so every performance change can be measured before and after
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform as platform_module
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlp"))
+
+from analytics.anomaly import AnomalyDetector
+from backends import create_backend
+
+from dedupe_index import PlatformIdIndex
+from mock_data_generator import MockDataGenerator
+from near_duplicate import NearDuplicateRegistry
+from run_collector import collect_from_platform
+from segment_store import SegmentStore
+from stub_database import StubDatabaseManager
+from synthetic_corpus import SyntheticCorpus
+from text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+BENCH_TASK_ID = 1
+
+# job: collect_from_platform的整体耗时；nlp: 分析服务端耗时（不含HTTP往返）
+STAGES = ("collect", "job", "store_raw", "dedupe", "cluster", "nlp", "store")
+
+
+class StageStats:
+    """单个阶段的耗时统计，用蓄水池采样保留延迟分布"""
+
+    def __init__(self, name: str, reservoir: int = 100000, seed: int = 0):
+        """
+        Args:
+            name: Stage name
+            reservoir: Latency samples kept for the percentiles
+            seed: Seed of the sampling RNG
+        """
+        self.name = name
+        self.reservoir = reservoir
+        self.samples: List[float] = []
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, items: int = 1):
+        """Record one call that handled `items` items"""
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            self.seconds += seconds
+            if len(self.samples) < self.reservoir:
+                self.samples.append(seconds)
+            else:
+                slot = self._rng.randrange(self.calls)
+                if slot < self.reservoir:
+                    self.samples[slot] = seconds
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> Dict:
+        """Totals plus per-call latency percentiles in milliseconds"""
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "seconds": round(self.seconds, 4),
+            "us_per_item": round(self.seconds / self.items * 1e6, 2) if self.items else None,
+            "p50_ms": round(self.percentile(50) * 1000, 4),
+            "p90_ms": round(self.percentile(90) * 1000, 4),
+            "p99_ms": round(self.percentile(99) * 1000, 4),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 4),
+        }
+
+
+class Timed:
+    """代理对象：转发属性访问，并把指定方法的耗时记入阶段统计"""
+
+    def __init__(self, target, methods: Dict[str, StageStats], items: Optional[Dict[str, Callable]] = None):
+        """
+        Args:
+            target: Wrapped object
+            methods: Method name -> stage the calls are recorded into
+            items: Method name -> function of the call's result giving the items it handled
+                   (default: one item per call)
+        """
+        self._target = target
+        self._methods = methods
+        self._items = items or {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        stats = self._methods.get(name)
+        if stats is None:
+            return attr
+
+        count = self._items.get(name)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = attr(*args, **kwargs)
+            stats.record(time.perf_counter() - t0, count(result) if count else 1)
+            return result
+        return timed
+
+
+class TimedClusters:
+    """近似重复索引注册表的代理，记录assign耗时"""
+
+    def __init__(self, registry: NearDuplicateRegistry, stats: StageStats):
+        self.registry = registry
+        self.stats = stats
+
+    def index_for(self, task_id: int):
+        return Timed(self.registry.index_for(task_id), {"assign": self.stats})
+
+
+class StubNlpServer:
+    """本地NLP服务替身：与nlp_service的/sentiment接口一致，在进程内用后端分析"""
+
+    def __init__(self, analyzer, stats: StageStats):
+        """
+        Args:
+            analyzer: Sentiment backend answering the requests
+            stats: Stage recording the analysis time of each request
+        """
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                text = body["text"] if body.get("normalized") else normalize_text(body["text"])
+                t0 = time.perf_counter()
+                result = analyzer.analyze(text)
+                stats.record(time.perf_counter() - t0)
+                payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-nlp", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux报告KB，macOS报告字节
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(
+    count: int = 100000,
+    batch_size: int = 256,
+    platforms: List[str] = ("twitter", "weibo", "zhihu"),
+    duplicate_ratio: float = 0.1,
+    repost_ratio: float = 0.1,
+    length_mean: float = 60,
+    length_sigma: float = 0.6,
+    seed: int = 42,
+    keyword: str = "人工智能",
+    backend: Optional[str] = None,
+    store_raw: bool = True,
+    db_path: str = ":memory:",
+    commit_every: int = 1,
+    workdir: Optional[str] = None,
+    generator: str = "vectorized",
+) -> Dict:
+    """
+    Run the ingest pipeline over a synthetic corpus
+
+    Each batch is split by platform and handed to collect_from_platform as prefetched
+    posts, like a worker job whose crawl returned that batch. Stage timings come from
+    proxies around the injected dedupe index, cluster index, segment store and
+    database, plus the analysis time inside the NLP stand-in; per-item stages record
+    one sample per call, collect and job one sample per batch/job.
+
+    Args:
+        count: Posts in the corpus
+        batch_size: Posts per crawl batch (one job per platform in the batch)
+        platforms: Platforms the corpus is spread over
+        duplicate_ratio: Share of re-delivered posts (exact duplicates)
+        repost_ratio: Share of reposts (near-duplicates)
+        length_mean: Mean content length in characters
+        length_sigma: Log-normal spread of content lengths
+        seed: Corpus seed; equal seeds give identical corpora
+        keyword: Keyword of the synthetic task
+        backend: Sentiment backend of the NLP stand-in (default: NLP_BACKEND or lexicon)
+        store_raw: Append each batch to the segment store (fsynced), as the collectors do
+        db_path: SQLite file of the stand-in database
+        commit_every: Stand-in commits after this many writes
+        workdir: Directory for the segment store and dedupe index (default: a temp dir)
+        generator: "vectorized" (SyntheticCorpus) or "mock" (MockDataGenerator.iter_corpus)
+
+    Returns:
+        Benchmark report
+    """
+    config = {
+        "count": count, "batch_size": batch_size, "platforms": list(platforms),
+        "duplicate_ratio": duplicate_ratio, "repost_ratio": repost_ratio,
+        "length_mean": length_mean, "length_sigma": length_sigma, "seed": seed,
+        "store_raw": store_raw, "commit_every": commit_every, "generator": generator,
+    }
+    stats = {name: StageStats(name, seed=seed) for name in STAGES}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        stub_db = StubDatabaseManager(db_path, commit_every=commit_every)
+        db = Timed(stub_db, {"insert_comment": stats["store"], "insert_sentiment_analysis": stats["store"]})
+        dedupe = Timed(
+            PlatformIdIndex(path=os.path.join(tmp, "dedupe"),
+                            exact_check=lambda _, platform_id: stub_db.comment_exists(platform_id)),
+            {"is_duplicate": stats["dedupe"]},
+        )
+        clusters = TimedClusters(NearDuplicateRegistry(), stats["cluster"])
+        analyzer = create_backend(backend)
+        # 分词词典和模型在首次调用时加载，不计入测量
+        analyzer.analyze_batch([normalize_text(f"{keyword}预热")])
+        nlp = StubNlpServer(analyzer, stats["nlp"])
+        segment_store = None
+        if store_raw:
+            # append返回(first_seq, 条数)，按条计入，使us_per_item与其他阶段可比
+            segment_store = Timed(
+                SegmentStore(root=os.path.join(tmp, "segments")),
+                {"append": stats["store_raw"]}, items={"append": lambda result: result[1]},
+            )
+        if generator == "mock":
+            corpus = MockDataGenerator().iter_corpus(
+                keyword, count, platforms, duplicate_ratio, repost_ratio, length_mean, length_sigma, seed
+            )
+        else:
+            corpus = SyntheticCorpus(
+                keywords=[keyword], platforms=platforms, repost_rate=repost_ratio,
+                duplicate_rate=duplicate_ratio, length_mean=length_mean, length_sigma=length_sigma, seed=seed,
+            ).iter_posts(count, batch_size=max(batch_size, 10000))
+
+        counts = {"collected": 0, "new": 0, "duplicates": 0, "near_duplicates": 0, "failed_jobs": 0}
+        clock = time.perf_counter
+
+        async def ingest():
+            detector = AnomalyDetector()
+            while True:
+                t0 = clock()
+                batch = list(itertools.islice(corpus, batch_size))
+                if not batch:
+                    break
+                stats["collect"].record(clock() - t0, len(batch))
+                by_platform = defaultdict(list)
+                for post in batch:
+                    by_platform[post["platform"]].append(post)
+                for name, posts in by_platform.items():
+                    t0 = clock()
+                    result = await collect_from_platform(
+                        name, keyword, len(posts), BENCH_TASK_ID, db, nlp.url, dedupe, clusters,
+                        detector, segment_store, prefetched=posts
+                    )
+                    stats["job"].record(clock() - t0, len(posts))
+                    if not result["success"]:
+                        counts["failed_jobs"] += 1
+                        continue
+                    for key in ("collected", "new", "duplicates", "near_duplicates"):
+                        counts[key] += result[key]
+
+        started = clock()
+        try:
+            asyncio.run(ingest())
+        finally:
+            elapsed = clock() - started
+            nlp.close()
+            if segment_store:
+                segment_store.close()
+            stub_db.close()
+    counts["analyzed"] = stats["nlp"].calls
+
+    return {
+        "benchmark": "ingest",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "environment": {
+            "python": platform_module.python_version(),
+            "machine": platform_module.machine(),
+            "backend": analyzer.name,
+        },
+        "config": config,
+        "items": counts["collected"],
+        "seconds": round(elapsed, 3),
+        "items_per_sec": round(counts["collected"] / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "counts": counts,
+        "stages": {name: stage.summary() for name, stage in stats.items() if stage.calls},
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    """Throughput ratio and per-stage p50 change against an earlier report"""
+    result = {"items_per_sec_ratio": None, "stages": {}}
+    if baseline.get("items_per_sec"):
+        result["items_per_sec_ratio"] = round(report["items_per_sec"] / baseline["items_per_sec"], 3)
+    for name, stage in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before and before.get("us_per_item") and stage.get("us_per_item"):
+            result["stages"][name] = {"us_per_item_ratio": round(stage["us_per_item"] / before["us_per_item"], 3)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest pipeline on a synthetic corpus")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--platforms", default="twitter,weibo,zhihu")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--repost-ratio", type=float, default=0.1)
+    parser.add_argument("--length-mean", type=float, default=60, help="Mean content length (characters)")
+    parser.add_argument("--length-sigma", type=float, default=0.6, help="Log-normal spread of content length")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--generator", choices=("vectorized", "mock"), default="vectorized",
+                        help="Corpus source: NumPy SyntheticCorpus or the per-item MockDataGenerator")
+    parser.add_argument("--backend", help="Sentiment backend of the NLP stand-in (default: NLP_BACKEND or lexicon)")
+    parser.add_argument("--no-store", action="store_true", help="Skip the raw segment store stage")
+    parser.add_argument("--db", default=":memory:", help="SQLite file of the stand-in database")
+    parser.add_argument("--commit-every", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        count=args.count,
+        batch_size=args.batch_size,
+        platforms=[p.strip() for p in args.platforms.split(",")],
+        duplicate_ratio=args.duplicate_ratio,
+        repost_ratio=args.repost_ratio,
+        length_mean=args.length_mean,
+        length_sigma=args.length_sigma,
+        seed=args.seed,
+        backend=args.backend,
+        store_raw=not args.no_store,
+        db_path=args.db,
+        commit_every=args.commit_every,
+        generator=args.generator,
+    )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    # run_collector配置了INFO级别的根日志，基准测试只输出警告
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        force=True
+    )
+    main()
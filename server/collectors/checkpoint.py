@@ -0,0 +1,203 @@
+"""
+Durable progress checkpoints for collection jobs
+One small JSON file per job (crawl_jobs id, or task/platform/keyword for CLI runs)
+records the crawl cursor, the range of the job's posts in the segment store and how
+far the storing/analysis loop got, so `--resume` continues without re-fetching or
+re-analyzing
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yuqing", "checkpoints")
+
+
+def run_key(job_id: Optional[int] = None, keyword: Optional[str] = None) -> str:
+    """
+    Checkpoint key of one job: the crawl_jobs id for queued jobs, else the keyword
+
+    Jobs of the same task and platform with another id or keyword never see each
+    other's checkpoints.
+    """
+    if job_id is not None:
+        return f"job{job_id}"
+    digest = hashlib.blake2b((keyword or "").encode("utf-8"), digest_size=6).hexdigest()
+    return f"kw{digest}"
+
+
+class JobCheckpoint:
+    """单个采集任务的进度检查点"""
+
+    def __init__(self, task_id: int, platform: str, key: str, root: Optional[str] = None, every: int = 20):
+        """
+        Args:
+            task_id: Monitoring task
+            platform: Platform of the job
+            key: Job key from run_key()
+            root: Checkpoint directory (default: COLLECTOR_CHECKPOINT_DIR or ~/.cache/yuqing/checkpoints)
+            every: Processed posts between checkpoint writes in the storing loop
+        """
+        self.task_id = task_id
+        self.platform = platform
+        self.key = key
+        self.root = root or os.getenv("COLLECTOR_CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)
+        self.path = os.path.join(self.root, f"{task_id}-{platform}-{key}.json")
+        self.every = every
+        self._pending = 0
+        self._resumed_at: Optional[int] = None
+        self.reset()
+
+    def reset(self):
+        """Fresh in-memory state; begin() also persists it"""
+        self.state: Dict = {
+            "task_id": self.task_id,
+            "platform": self.platform,
+            "status": "crawling",
+            # 爬取游标（如Twitter各用户的分页令牌），由采集器定义
+            "cursor": {},
+            # 本次任务的原始数据在段文件中的序号范围[first_seq, end_seq)
+            "first_seq": None,
+            "end_seq": None,
+            # 此序号之前的条目已完成入库和分析
+            "processed_seq": None,
+            "last_comment_id": None,
+            "last_analyzed_id": None,
+            "counts": {"collected": 0, "new": 0, "duplicates": 0, "near_duplicates": 0},
+            "updated_at": None,
+        }
+
+    @classmethod
+    def begin(cls, task_id: int, platform: str, key: str, root: Optional[str] = None,
+              every: int = 20) -> "JobCheckpoint":
+        """
+        Start a new job and write its checkpoint right away
+
+        Until the first page is recorded the file says "crawling"; a crash in that
+        window resumes with a fresh crawl instead of an earlier run's finished state.
+        """
+        checkpoint = cls(task_id, platform, key, root, every)
+        checkpoint.save(sync=True)
+        return checkpoint
+
+    @classmethod
+    def load(cls, task_id: int, platform: str, key: str, root: Optional[str] = None,
+             every: int = 20) -> "JobCheckpoint":
+        """Load a job's checkpoint; a missing or unreadable file begins a fresh one"""
+        checkpoint = cls(task_id, platform, key, root, every)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                checkpoint.state.update(json.load(f))
+            checkpoint._resumed_at = checkpoint.state["processed_seq"]
+            logger.info(f"Resuming {platform} job {key} of task {task_id} ({checkpoint.status}, "
+                        f"processed up to seq {checkpoint.state['processed_seq']} of {checkpoint.state['end_seq']})")
+            return checkpoint
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint.path}: {e}")
+        return cls.begin(task_id, platform, key, root, every)
+
+    @property
+    def status(self) -> str:
+        return self.state["status"]
+
+    @property
+    def crawl_done(self) -> bool:
+        return self.state["status"] in ("processing", "completed")
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return self.state["counts"]
+
+    def save(self, sync: bool = False):
+        """
+        Atomically replace the checkpoint file
+
+        Without `sync` the write survives a process crash but not necessarily a
+        machine crash; stage transitions are synced.
+        """
+        self.state["updated_at"] = time.time()
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._pending = 0
+
+    def crawled(self, first_seq: int, end_seq: int, cursor: Optional[Dict] = None):
+        """Record a page/batch of crawled posts appended to the segment store"""
+        if self.state["first_seq"] is None:
+            self.state["first_seq"] = first_seq
+            self.state["processed_seq"] = first_seq
+        self.state["end_seq"] = end_seq
+        self.counts["collected"] = end_seq - self.state["first_seq"]
+        if cursor is not None:
+            self.state["cursor"] = cursor
+        self.save()
+
+    def crawl_finished(self):
+        self.state["status"] = "processing"
+        self.save(sync=True)
+
+    def page_recorder(self, writer) -> Callable[[str, List[Dict], Optional[str]], None]:
+        """
+        on_page callback for paginated crawls
+
+        Each page is appended to the segment stream before its cursor is checkpointed,
+        so a resumed crawl neither refetches nor loses a page.
+        """
+        def on_page(source: str, posts: List[Dict], next_token: Optional[str]):
+            first_seq = writer.next_seq
+            if posts:
+                writer.append_many(posts)
+            cursor = dict(self.state["cursor"])
+            cursor[source] = next_token
+            self.crawled(first_seq, writer.next_seq, cursor)
+        return on_page
+
+    def finish_crawl(self, writer, posts: Optional[Iterable[Dict]] = None):
+        """Append the posts of an unpaginated crawl (if given) and close the crawl stage"""
+        first_seq = writer.next_seq
+        if posts:
+            writer.append_many(posts)
+        if posts or self.state["first_seq"] is None:
+            self.crawled(first_seq, writer.next_seq)
+        self.crawl_finished()
+
+    def pending(self, store) -> Iterator[Tuple[int, Dict]]:
+        """Stored posts of this job not yet processed, as (seq, post)"""
+        if self.state["first_seq"] is None:
+            return iter(())
+        return store.read(self.task_id, self.platform, self.state["processed_seq"], self.state["end_seq"])
+
+    def may_be_partial(self, seq: int) -> bool:
+        """
+        Whether a post may have been stored but not analyzed before the interruption
+
+        Only posts within one checkpoint interval after the resume point qualify.
+        """
+        return self._resumed_at is not None and seq < self._resumed_at + self.every
+
+    def processed(self, seq: int, comment_id: Optional[int] = None, analyzed_id: Optional[int] = None):
+        """Record that every post before `seq + 1` is stored and analyzed; writes every `every` posts"""
+        self.state["processed_seq"] = seq + 1
+        if comment_id:
+            self.state["last_comment_id"] = comment_id
+        if analyzed_id:
+            self.state["last_analyzed_id"] = analyzed_id
+        self._pending += 1
+        if self._pending >= self.every:
+            self.save()
+
+    def finish(self):
+        self.state["status"] = "completed"
+        self.save(sync=True)
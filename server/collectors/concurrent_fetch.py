@@ -0,0 +1,63 @@
+"""
+Bounded thread-pool fan-out for blocking API collectors
+Fetches several sources in parallel and stops early once enough results are gathered
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_concurrently(
+    fetch: Callable[[str], List[Dict]],
+    sources: Sequence[str],
+    max_workers: int = 4,
+    max_results: Optional[int] = None,
+    select: Optional[Callable[[Dict], bool]] = None,
+) -> List[Dict]:
+    """
+    Fetch items from several sources in parallel
+
+    Args:
+        fetch: Blocking function returning the items of one source
+        sources: Sources to fetch (subreddits, channel IDs, ...)
+        max_workers: Maximum number of concurrent fetches
+        max_results: Stop once this many selected items are gathered (None: fetch all)
+        select: Optional filter applied to each item before counting
+
+    Returns:
+        Selected items, grouped in the order of `sources`, truncated to `max_results`
+    """
+    if not sources:
+        return []
+
+    results: List[Optional[List[Dict]]] = [None] * len(sources)
+    gathered = 0
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))))
+    try:
+        futures = {executor.submit(fetch, source): index for index, source in enumerate(sources)}
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                items = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to collect from {sources[index]}: {e}")
+                continue
+
+            selected = [item for item in items if select(item)] if select else items
+            results[index] = selected
+            gathered += len(selected)
+
+            if max_results is not None and gathered >= max_results:
+                logger.info(f"Gathered {gathered} items, skipping remaining sources")
+                break
+    finally:
+        # 已满足配额时取消尚未开始的请求，不等待正在进行的请求
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    merged = [item for items in results if items for item in items]
+    return merged[:max_results] if max_results is not None else merged
@@ -0,0 +1,270 @@
+"""
+Probabilistic duplicate filter for platformIds
+Per-platform scalable Bloom filters bootstrapped from the comments table, persisted to disk
+and consulted before any DB or NLP work, with an exact DB check on positives
+"""
+
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yuqing", "dedupe")
+
+_MAGIC = b"YQBF1"
+_HEADER = struct.Struct("<5sQIQ")  # magic, bit count, hash count, item count
+
+
+class BloomFilter:
+    """定长布隆过滤器（双重哈希）"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Initialize Bloom filter
+
+        Args:
+            capacity: Number of items the filter is sized for
+            error_rate: Target false positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """Add an item, returning True if it was (probably) not present before"""
+        added = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0, capacity: int = 0, error_rate: float = 0.001):
+        """Deserialize a filter, returning (filter, next offset)"""
+        magic, num_bits, num_hashes, count = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC:
+            raise ValueError("Not a Bloom filter file")
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        start = offset + _HEADER.size
+        end = start + (num_bits + 7) // 8
+        bloom.bits = bytearray(data[start:end])
+        return bloom, end
+
+
+class PlatformIdIndex:
+    """按平台维护已见platformId的可扩展布隆过滤器"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        initial_capacity: int = 100000,
+        error_rate: float = 0.001,
+        exact_check: Optional[Callable[[str, str], bool]] = None,
+    ):
+        """
+        Initialize platformId index
+
+        Args:
+            path: Directory for the persisted filters (default: DEDUPE_INDEX_DIR or ~/.cache/yuqing/dedupe)
+            initial_capacity: Capacity of the first filter per platform, later filters double it
+            error_rate: False positive rate of each filter
+            exact_check: Callable(platform, platform_id) -> bool used to confirm positives
+        """
+        self.path = path or os.getenv("DEDUPE_INDEX_DIR", DEFAULT_INDEX_DIR)
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.exact_check = exact_check
+        self.filters: Dict[str, List[BloomFilter]] = {}
+        self.last_comment_id = 0
+        self.stats = {"checks": 0, "negatives": 0, "confirmed": 0, "false_positives": 0}
+        self._write_lock = threading.Lock()
+
+    def _platform_filters(self, platform: str) -> List[BloomFilter]:
+        filters = self.filters.setdefault(platform, [])
+        if not filters or filters[-1].is_full:
+            capacity = self.initial_capacity * (2 ** len(filters))
+            filters.append(BloomFilter(capacity, self.error_rate))
+        return filters
+
+    def add(self, platform: str, platform_id: str):
+        """Record a stored platformId"""
+        if platform_id and not self.might_contain(platform, platform_id):
+            self._platform_filters(platform)[-1].add(platform_id)
+
+    def might_contain(self, platform: str, platform_id: str) -> bool:
+        """False means definitely new; True means probably seen"""
+        return any(platform_id in bloom for bloom in self.filters.get(platform, []))
+
+    def is_duplicate(self, platform: str, platform_id: str) -> bool:
+        """
+        Check whether a platformId was already stored
+
+        Negatives cost no I/O. Positives are confirmed with `exact_check` when one is
+        configured, so a false positive never drops a new item.
+        """
+        self.stats["checks"] += 1
+        if not self.might_contain(platform, platform_id):
+            self.stats["negatives"] += 1
+            return False
+        if self.exact_check is None:
+            self.stats["confirmed"] += 1
+            return True
+        if self.exact_check(platform, platform_id):
+            self.stats["confirmed"] += 1
+            return True
+        self.stats["false_positives"] += 1
+        return False
+
+    def sync_from_db(self, connection, batch_size: int = 10000) -> int:
+        """
+        Add comments inserted since the last sync, streaming with a server-side cursor
+
+        Args:
+            connection: pymysql connection
+            batch_size: Rows fetched per round trip
+
+        Returns:
+            Number of rows added
+        """
+        import pymysql
+
+        added = 0
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(
+                "SELECT id, platform, platformId FROM comments WHERE id > %s ORDER BY id",
+                (self.last_comment_id,),
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for comment_id, platform, platform_id in rows:
+                    self.add(platform, platform_id)
+                    self.last_comment_id = max(self.last_comment_id, comment_id)
+                    added += 1
+
+        logger.info(f"Dedupe index synced {added} comments (watermark id={self.last_comment_id})")
+        return added
+
+    def _file(self, platform: str) -> str:
+        return os.path.join(self.path, f"{platform}.bloom")
+
+    def save(self):
+        """Persist all filters and the sync watermark"""
+        self.write_snapshot(self.snapshot())
+
+    def snapshot(self) -> Dict:
+        """
+        Serialize the filters and watermark in memory
+
+        Taken on the thread that mutates the index, so write_snapshot can run in
+        another thread while the index keeps changing.
+        """
+        return {
+            "filters": {platform: b"".join(bloom.to_bytes() for bloom in filters)
+                        for platform, filters in self.filters.items()},
+            "watermark": self.last_comment_id,
+        }
+
+    def write_snapshot(self, snapshot: Dict):
+        """Atomically replace the persisted files with a snapshot"""
+        with self._write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            for platform, data in snapshot["filters"].items():
+                tmp_path = f"{self._file(platform)}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._file(platform))
+
+            tmp_path = os.path.join(self.path, "watermark.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(str(snapshot["watermark"]))
+            os.replace(tmp_path, os.path.join(self.path, "watermark"))
+
+    def load(self) -> bool:
+        """Load persisted filters, returning False if there is nothing on disk"""
+        watermark_file = os.path.join(self.path, "watermark")
+        if not os.path.exists(watermark_file):
+            return False
+
+        with open(watermark_file) as f:
+            self.last_comment_id = int(f.read().strip() or 0)
+
+        for name in os.listdir(self.path):
+            if not name.endswith(".bloom"):
+                continue
+            with open(os.path.join(self.path, name), "rb") as f:
+                data = f.read()
+            filters, offset = [], 0
+            while offset < len(data):
+                capacity = self.initial_capacity * (2 ** len(filters))
+                bloom, offset = BloomFilter.from_bytes(data, offset, capacity, self.error_rate)
+                filters.append(bloom)
+            self.filters[name[: -len(".bloom")]] = filters
+
+        return True
+
+
+def open_dedupe_index(connection, path: Optional[str] = None) -> PlatformIdIndex:
+    """
+    Load the persisted index (or bootstrap it) and catch up with the comments table
+
+    Positives are confirmed with an exact `SELECT` on comments.platformId.
+
+    Args:
+        connection: pymysql connection
+        path: Index directory (optional)
+    """
+    def exact_check(platform: str, platform_id: str) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM comments WHERE platformId = %s LIMIT 1", (platform_id,))
+            return cursor.fetchone() is not None
+
+    index = PlatformIdIndex(path=path, exact_check=exact_check)
+    try:
+        if not index.load():
+            logger.info("No persisted dedupe index, bootstrapping from comments table")
+    except Exception as e:
+        logger.warning(f"Discarding unreadable dedupe index: {e}")
+        index = PlatformIdIndex(path=path, exact_check=exact_check)
+
+    index.sync_from_db(connection)
+    return index
@@ -9,11 +9,20 @@ import logging
 import json
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlp"))
 
 import pymysql
 from dotenv import load_dotenv
 import requests
 
+from analytics.anomaly import open_task_detector
+from analytics.rollup import refresh_sentiment_stats
+
+from dedupe_index import open_dedupe_index
+from near_duplicate import NearDuplicateRegistry
+from segment_store import SegmentStore
+from text_normalizer import normalize_text
+from lexicon_engine import aspects_json
 from mock_data_generator import MockDataGenerator
 
 load_dotenv()
@@ -55,8 +64,8 @@ class DatabaseManager:
                 sql = """
                 INSERT INTO comments (
                     taskId, platform, platformId, author, authorId,
-                    content, url, publishedAt, likes, replies, shares, collectedAt
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    content, url, publishedAt, likes, replies, shares, clusterId, collectedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
                 """
                 cursor.execute(sql, (
                     task_id,
@@ -69,7 +78,8 @@ class DatabaseManager:
                     comment_data.get('publishedAt'),
                     comment_data.get('likes', 0),
                     comment_data.get('replies', 0),
-                    comment_data.get('shares', 0)
+                    comment_data.get('shares', 0),
+                    comment_data.get('clusterId')
                 ))
                 self.connection.commit()
                 return cursor.lastrowid
@@ -94,13 +104,14 @@ class DatabaseManager:
             with self.connection.cursor() as cursor:
                 sql = """
                 INSERT INTO sentiment_analysis (
-                    commentId, sentiment, score, confidence, keywords, analyzedAt
-                ) VALUES (%s, %s, %s, %s, %s, NOW())
+                    commentId, sentiment, score, confidence, keywords, aspectScores, analyzedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, NOW())
                 ON DUPLICATE KEY UPDATE
                     sentiment = VALUES(sentiment),
                     score = VALUES(score),
                     confidence = VALUES(confidence),
-                    keywords = VALUES(keywords)
+                    keywords = VALUES(keywords),
+                    aspectScores = VALUES(aspectScores)
                 """
                 keywords_json = json.dumps(sentiment_data.get('keywords', []), ensure_ascii=False)
                 cursor.execute(sql, (
@@ -108,7 +119,8 @@ class DatabaseManager:
                     sentiment_data.get('sentiment'),
                     sentiment_data.get('score'),
                     sentiment_data.get('confidence'),
-                    keywords_json
+                    keywords_json,
+                    aspects_json(sentiment_data.get('aspects'))
                 ))
                 self.connection.commit()
                 return True
@@ -146,6 +158,7 @@ def main():
     parser.add_argument("--keyword", type=str, required=True, help="Search keyword")
     parser.add_argument("--count", type=int, default=15, help="Number of posts per platform")
     parser.add_argument("--skip-nlp", action="store_true", help="Skip NLP analysis")
+    parser.add_argument("--no-store", action="store_true", help="Do not keep raw posts in the segment store")
     
     args = parser.parse_args()
     
@@ -156,6 +169,9 @@ def main():
         return
     
     db = DatabaseManager(db_url)
+    dedupe_index = open_dedupe_index(db.connection)
+    cluster_index = NearDuplicateRegistry(db.connection).index_for(args.task_id)
+    segment_store = None if args.no_store else SegmentStore()
     
     # 生成模拟数据
     generator = MockDataGenerator()
@@ -163,6 +179,8 @@ def main():
     
     # NLP服务URL
     nlp_url = None if args.skip_nlp else os.getenv("NLP_SERVICE_URL", "http://localhost:8000")
+    # 突发检测基线从汇总表预热，告警写入sentiment_alerts
+    detector = open_task_detector(db.connection, args.task_id) if nlp_url else None
     
     results = []
     
@@ -171,23 +189,53 @@ def main():
         
         collected_count = len(posts)
         new_comments = 0
+        duplicate_count = 0
+        near_duplicate_count = 0
+        
+        # 原始数据先写入段文件，入库从段文件读取
+        if segment_store:
+            first_seq, _ = segment_store.append(args.task_id, platform, posts)
+            posts = segment_store.posts(args.task_id, platform, first_seq)
         
         for post in posts:
+            # 已入库的内容不再插入和分析
+            if dedupe_index.is_duplicate(platform, post['platformId']):
+                duplicate_count += 1
+                continue
+            
+            # 规范化一次，聚类和情感分析共用
+            post['normalizedContent'] = normalize_text(post['content'])
+            
+            # 转发/模板内容归入同一聚类
+            post['clusterId'], is_canonical = cluster_index.assign(post['normalizedContent'])
+            if not is_canonical:
+                near_duplicate_count += 1
+            
             comment_id = db.insert_comment(args.task_id, post)
+            dedupe_index.add(platform, post['platformId'])
             if comment_id:
                 new_comments += 1
                 
-                # 情感分析
-                if nlp_url:
+                cached_sentiment = None if is_canonical else cluster_index.get_result(post['clusterId'])
+                
+                # 近似重复直接复用代表条目的情感分析结果
+                if cached_sentiment:
+                    db.insert_sentiment_analysis(comment_id, cached_sentiment)
+                    if detector:
+                        detector.observe(args.task_id, post.get('publishedAt'), cached_sentiment['sentiment'])
+                elif nlp_url:
                     try:
                         response = requests.post(
                             f"{nlp_url}/sentiment",
-                            json={"text": post['content']},
+                            json={"text": post['normalizedContent'], "normalized": True},
                             timeout=5
                         )
                         if response.status_code == 200:
                             sentiment_data = response.json()
                             db.insert_sentiment_analysis(comment_id, sentiment_data)
+                            if detector:
+                                detector.observe(args.task_id, post.get('publishedAt'), sentiment_data['sentiment'])
+                            cluster_index.set_result(post['clusterId'], sentiment_data)
                             logger.info(f"Analyzed: {sentiment_data['sentiment']} ({sentiment_data['score']:.2f})")
                     except Exception as e:
                         logger.warning(f"NLP analysis failed: {e}")
@@ -198,11 +246,21 @@ def main():
         results.append({
             "platform": platform,
             "collected": collected_count,
-            "new": new_comments
+            "new": new_comments,
+            "duplicates": duplicate_count,
+            "near_duplicates": near_duplicate_count
         })
         
         logger.info(f"Completed {platform}: {collected_count} collected, {new_comments} new")
     
+    dedupe_index.save()
+    if segment_store:
+        segment_store.close()
+    
+    # 把本次写入的情感结果汇总进sentiment_stats
+    if nlp_url:
+        refresh_sentiment_stats(db.connection)
+    
     # 输出结果
     print(json.dumps({
         "task_id": args.task_id,
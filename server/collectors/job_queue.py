@@ -0,0 +1,261 @@
+"""
+Durable crawl job queue on the crawl_jobs table
+The web app enqueues pending rows; collector workers claim them under a lease that
+they keep alive with heartbeats. A job whose lease runs out (worker crashed or hung)
+goes back to pending and is picked up again, resuming from its checkpoint.
+
+Every claim increments the row's leaseToken (a fencing token); job updates carry
+the token, so a worker that lost its lease cannot overwrite the new holder's
+results. Tasks are spread over the live workers with a consistent hash ring, which
+keeps a task on the same worker (warm sessions, indexes and detectors) and moves
+only the dead worker's share when membership changes.
+"""
+
+import bisect
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+# 有采集器的平台；调度和worker领取都以此为准（放在这里，调度器无需导入各采集器）
+PLATFORMS = ("twitter", "weibo", "zhihu", "reddit", "youtube")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环"""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 64):
+        """
+        Args:
+            nodes: Node (worker) ids
+            replicas: Virtual nodes per node; more gives a more even spread
+        """
+        points = sorted((_hash(f"{node}#{i}"), node) for node in set(nodes) for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def __len__(self) -> int:
+        return len(set(self._nodes))
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node owning `key`, or None for an empty ring"""
+        if not self._keys:
+            return None
+        position = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[position]
+
+
+class CrawlJobQueue:
+    """基于crawl_jobs表的采集任务队列（租约 + 心跳）"""
+
+    def __init__(
+        self,
+        connection,
+        lease_seconds: int = 120,
+        max_attempts: int = 3,
+        steal_after: int = 30,
+        membership_refresh: float = 5.0,
+    ):
+        """
+        Args:
+            connection: pymysql connection (DictCursor)
+            lease_seconds: Lease granted by a claim or heartbeat; also how long a silent
+                worker stays on the hash ring
+            max_attempts: Claims after which an expired job is failed instead of retried
+            steal_after: Seconds a pending job waits for its ring owner before any worker may take it
+            membership_refresh: Seconds the live worker list is cached between claims
+        """
+        self.connection = connection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.steal_after = steal_after
+        self.membership_refresh = membership_refresh
+        self._workers: List = []
+        self._rings: Dict[str, HashRing] = {}
+        self._rings_loaded: Optional[float] = None
+
+    def register(self, worker_id: str, platforms: Optional[Sequence[str]] = None, slots: int = 1):
+        """Announce (or refresh) a live worker; called from the heartbeat"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO crawl_workers (workerId, platforms, slots, heartbeatAt, startedAt)
+            VALUES (%s, %s, %s, NOW(), NOW())
+            ON DUPLICATE KEY UPDATE platforms = VALUES(platforms), slots = VALUES(slots), heartbeatAt = NOW()
+            """, (worker_id, ",".join(platforms) if platforms else None, slots))
+        self.connection.commit()
+
+    def unregister(self, worker_id: str):
+        """Leave the ring on shutdown so the worker's tasks move immediately"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("DELETE FROM crawl_workers WHERE workerId = %s", (worker_id,))
+        self.connection.commit()
+
+    def ring_for(self, platform: str) -> HashRing:
+        """Hash ring of the live workers serving `platform`"""
+        if self._rings_loaded is None or time.monotonic() - self._rings_loaded > self.membership_refresh:
+            with self.connection.cursor() as cursor:
+                cursor.execute("""
+                SELECT workerId, platforms FROM crawl_workers
+                WHERE heartbeatAt >= NOW() - INTERVAL %s SECOND
+                """, (self.lease_seconds,))
+                workers = cursor.fetchall()
+            self.connection.commit()
+            self._workers = [(w['workerId'], w['platforms'].split(",") if w['platforms'] else None)
+                             for w in workers]
+            self._rings = {}
+            self._rings_loaded = time.monotonic()
+        if platform not in self._rings:
+            self._rings[platform] = HashRing(
+                worker for worker, platforms in self._workers if platforms is None or platform in platforms
+            )
+        return self._rings[platform]
+
+    def owner(self, task_id: int, platform: str) -> Optional[str]:
+        # 按任务分配：同一任务的各次采集落在同一worker上
+        return self.ring_for(platform).owner(str(task_id))
+
+    def enqueue(self, task_id: int, platform: str, keyword: str, max_results: int = 50) -> int:
+        """
+        Add a pending job unless the task/platform already has one pending or running
+
+        The unique key on (taskId, platform, active) rejects a second active job, so
+        concurrent enqueues cannot both insert; the loser returns the winner's job.
+
+        Returns:
+            Id of the new or existing job
+        """
+        with self.connection.cursor() as cursor:
+            try:
+                cursor.execute("""
+                INSERT INTO crawl_jobs (taskId, platform, keyword, maxResults, status, createdAt)
+                VALUES (%s, %s, %s, %s, 'pending', NOW())
+                """, (task_id, platform, keyword, max_results))
+                self.connection.commit()
+                return cursor.lastrowid
+            except pymysql.IntegrityError:
+                self.connection.rollback()
+            cursor.execute("""
+            SELECT id FROM crawl_jobs
+            WHERE taskId = %s AND platform = %s AND active = 1
+            """, (task_id, platform))
+            row = cursor.fetchone()
+            self.connection.commit()
+            # 活动任务恰好在插入和查询之间结束时重试插入
+            return row['id'] if row else self.enqueue(task_id, platform, keyword, max_results)
+
+    def claim(self, worker_id: str, platforms: Optional[Sequence[str]] = None,
+              candidates: int = 50) -> Optional[Dict]:
+        """
+        Lease the oldest pending job this worker should run
+
+        A job belongs to the worker its task hashes to on the ring. Once it has waited
+        `steal_after` seconds any worker may take it, so a busy or unlucky owner does not
+        hold up the queue. The claim is a conditional UPDATE on status, so of several
+        workers racing for a row exactly one wins.
+
+        Args:
+            worker_id: Claiming worker
+            platforms: Only jobs of these platforms (default: any)
+            candidates: Oldest pending jobs considered per call
+
+        Returns:
+            The claimed job row including its leaseToken, or None
+        """
+        sql = ("SELECT id, taskId, platform, TIMESTAMPDIFF(SECOND, updatedAt, NOW()) AS waiting "
+               "FROM crawl_jobs WHERE status = 'pending'")
+        params: List = []
+        if platforms:
+            sql += f" AND platform IN ({', '.join(['%s'] * len(platforms))})"
+            params.extend(platforms)
+        sql += " ORDER BY id LIMIT %s"
+        params.append(candidates)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            pending = cursor.fetchall()
+        self.connection.commit()
+
+        for job in pending:
+            owner = self.owner(job['taskId'], job['platform'])
+            if owner not in (None, worker_id) and job['waiting'] < self.steal_after:
+                continue
+            claimed = self._claim(job['id'], worker_id)
+            if claimed is not None:
+                if owner not in (None, worker_id):
+                    logger.info(f"Took over job {job['id']} from {owner} after {job['waiting']}s")
+                return claimed
+        return None
+
+    def _claim(self, job_id: int, worker_id: str) -> Optional[Dict]:
+        try:
+            with self.connection.cursor() as cursor:
+                won = cursor.execute("""
+                UPDATE crawl_jobs
+                SET status = 'running', workerId = %s, attempts = attempts + 1,
+                    leaseToken = leaseToken + 1,
+                    startedAt = COALESCE(startedAt, NOW()), heartbeatAt = NOW(),
+                    leaseExpiresAt = NOW() + INTERVAL %s SECOND
+                WHERE id = %s AND status = 'pending'
+                """, (worker_id, self.lease_seconds, job_id))
+                job = None
+                if won:
+                    cursor.execute("""
+                    SELECT id, taskId, platform, keyword, maxResults, attempts, leaseToken
+                    FROM crawl_jobs WHERE id = %s
+                    """, (job_id,))
+                    job = cursor.fetchone()
+            self.connection.commit()
+            return job
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def renew(self, job_id: int, lease_token: int) -> bool:
+        """
+        Extend one job's lease
+
+        Returns:
+            False if the lease was lost (expired and requeued or claimed by another worker)
+        """
+        with self.connection.cursor() as cursor:
+            count = cursor.execute("""
+            UPDATE crawl_jobs
+            SET heartbeatAt = NOW(), leaseExpiresAt = NOW() + INTERVAL %s SECOND
+            WHERE id = %s AND leaseToken = %s AND status = 'running'
+            """, (self.lease_seconds, job_id, lease_token))
+        self.connection.commit()
+        return count > 0
+
+    def requeue_expired(self) -> int:
+        """
+        Return running jobs with an expired lease to the queue, or fail them after
+        max_attempts claims
+
+        Returns:
+            Number of jobs requeued or failed
+        """
+        with self.connection.cursor() as cursor:
+            failed = cursor.execute("""
+            UPDATE crawl_jobs
+            SET status = 'failed', errorMessage = 'Lease expired too many times', completedAt = NOW()
+            WHERE status = 'running' AND leaseExpiresAt < NOW() AND attempts >= %s
+            """, (self.max_attempts,))
+            requeued = cursor.execute("""
+            UPDATE crawl_jobs SET status = 'pending', workerId = NULL, leaseExpiresAt = NULL
+            WHERE status = 'running' AND leaseExpiresAt < NOW()
+            """)
+            # 长时间没有心跳的worker记录直接删除（环上早已不含它们）
+            cursor.execute("DELETE FROM crawl_workers WHERE heartbeatAt < NOW() - INTERVAL %s SECOND",
+                           (self.lease_seconds * 10,))
+        self.connection.commit()
+        if failed or requeued:
+            logger.warning(f"Expired leases: {requeued} jobs requeued, {failed} failed")
+        return failed + requeued
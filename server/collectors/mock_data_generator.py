@@ -3,9 +3,11 @@ Mock data generator for demonstration purposes
 Generates realistic-looking social media posts
 """
 
+import math
 import random
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Sequence
 
 class MockDataGenerator:
     """生成模拟社交媒体数据"""
@@ -23,6 +25,14 @@ class MockDataGenerator:
             "人工智能研究员", "算法工程师", "技术专家", "数据科学家", "AI从业者"
         ]
         
+        self.reddit_users = [
+            "ml_enthusiast", "curious_coder", "tech_lurker", "data_nerd", "gpu_hoarder"
+        ]
+        
+        self.youtube_channels = [
+            "科技评测", "AI Explained", "数码频道", "Tech Weekly", "程序员日常"
+        ]
+        
         self.positive_templates = [
             "{keyword}技术真的太棒了！未来可期。",
             "刚体验了{keyword}相关产品，效果非常好！",
@@ -46,6 +56,18 @@ class MockDataGenerator:
             "担心{keyword}可能带来的负面影响。",
             "{keyword}技术还不够成熟，需要改进。",
         ]
+        
+        # 拼接到模板后面以得到更长的文本
+        self.filler_sentences = [
+            "这是我的一些思考和观察，欢迎讨论。",
+            "身边不少朋友也在关注这件事。",
+            "具体情况还要看后续的发展。",
+            "希望相关方面能给出更详细的说明。",
+            "从业这么多年，第一次见到这样的变化。",
+            "大家怎么看？",
+            "数据来自公开报道，仅供参考。",
+            "先记录一下，过段时间再回来看看。",
+        ]
     
     def generate_twitter_posts(self, keyword: str, count: int = 10) -> List[Dict]:
         """生成Twitter模拟数据"""
@@ -158,6 +180,83 @@ class MockDataGenerator:
         
         return posts
     
+    def generate_reddit_posts(self, keyword: str, count: int = 10) -> List[Dict]:
+        """生成Reddit模拟数据"""
+        posts = []
+        
+        for i in range(count):
+            sentiment_type = random.choices(
+                ['positive', 'neutral', 'negative'],
+                weights=[0.5, 0.3, 0.2]
+            )[0]
+            
+            if sentiment_type == 'positive':
+                content = random.choice(self.positive_templates).format(keyword=keyword)
+            elif sentiment_type == 'neutral':
+                content = random.choice(self.neutral_templates).format(keyword=keyword)
+            else:
+                content = random.choice(self.negative_templates).format(keyword=keyword)
+            
+            author = random.choice(self.reddit_users)
+            published_at = datetime.now() - timedelta(hours=random.randint(1, 72))
+            post_id = f"reddit_mock_{i}_{random.randint(1000, 9999)}"
+            
+            post = {
+                "platformId": post_id,
+                "platform": "reddit",
+                "author": author,
+                "authorId": author,
+                "title": f"讨论：{keyword}",
+                "content": content,
+                "url": f"https://www.reddit.com/r/technology/comments/{post_id}",
+                "publishedAt": published_at.isoformat(),
+                "likes": random.randint(1, 3000),
+                "replies": random.randint(0, 300),
+                "shares": 0,
+            }
+            posts.append(post)
+        
+        return posts
+    
+    def generate_youtube_posts(self, keyword: str, count: int = 10) -> List[Dict]:
+        """生成YouTube模拟数据（视频简介作为内容）"""
+        posts = []
+        
+        for i in range(count):
+            sentiment_type = random.choices(
+                ['positive', 'neutral', 'negative'],
+                weights=[0.5, 0.3, 0.2]
+            )[0]
+            
+            if sentiment_type == 'positive':
+                content = random.choice(self.positive_templates).format(keyword=keyword)
+            elif sentiment_type == 'neutral':
+                content = random.choice(self.neutral_templates).format(keyword=keyword)
+            else:
+                content = random.choice(self.negative_templates).format(keyword=keyword)
+            
+            channel = random.choice(self.youtube_channels)
+            published_at = datetime.now() - timedelta(hours=random.randint(1, 72))
+            video_id = f"youtube_mock_{i}_{random.randint(1000, 9999)}"
+            
+            post = {
+                "platformId": video_id,
+                "platform": "youtube",
+                "author": channel,
+                "authorId": f"youtube_{hash(channel)}",
+                "title": f"{keyword}深度解读",
+                "content": content,
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "publishedAt": published_at.isoformat(),
+                # 视频以播放量作为likes，与YouTubeCollector一致
+                "likes": random.randint(100, 100000),
+                "replies": 0,
+                "shares": 0,
+            }
+            posts.append(post)
+        
+        return posts
+    
     def generate_all_platforms(self, keyword: str, count_per_platform: int = 10) -> Dict[str, List[Dict]]:
         """生成所有平台的模拟数据"""
         return {
@@ -166,6 +265,72 @@ class MockDataGenerator:
             "zhihu": self.generate_zhihu_posts(keyword, count_per_platform),
         }
 
+    
+    def iter_corpus(
+        self,
+        keyword: str,
+        count: int,
+        platforms: Sequence[str] = ("twitter", "weibo", "zhihu"),
+        duplicate_ratio: float = 0.1,
+        repost_ratio: float = 0.1,
+        length_mean: float = 60,
+        length_sigma: float = 0.6,
+        seed: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        Stream a large synthetic corpus for load tests
+        
+        Args:
+            keyword: Keyword inserted into the templates
+            count: Number of posts
+            platforms: Platforms posts are spread over
+            duplicate_ratio: Share of posts re-delivering an earlier post (same platformId)
+            repost_ratio: Share of reposts quoting an earlier post under a new id (near-duplicates)
+            length_mean: Mean content length in characters (log-normal)
+            length_sigma: Spread of the log-normal length distribution
+            seed: RNG seed for a reproducible corpus
+        """
+        rng = random.Random(seed)
+        users = {"twitter": self.twitter_users, "weibo": self.weibo_users, "zhihu": self.zhihu_users}
+        templates = (self.positive_templates, self.neutral_templates, self.negative_templates)
+        mu = math.log(length_mean) - length_sigma ** 2 / 2
+        now = datetime.now()
+        recent = deque(maxlen=10000)
+        
+        for i in range(count):
+            roll = rng.random()
+            if recent and roll < duplicate_ratio:
+                yield dict(rng.choice(recent))
+                continue
+            
+            platform = rng.choice(platforms)
+            author = rng.choice(users.get(platform, self.twitter_users))
+            if recent and roll < duplicate_ratio + repost_ratio:
+                original = rng.choice(recent)
+                content = f"转发 //@{original['author']}: {original['content']}"
+            else:
+                group = rng.choices(templates, weights=[0.5, 0.3, 0.2])[0]
+                content = rng.choice(group).format(keyword=keyword)
+                target = rng.lognormvariate(mu, length_sigma)
+                while len(content) < target:
+                    content += rng.choice(self.filler_sentences)
+            
+            post = {
+                "platformId": f"{platform}_bench_{seed}_{i}",
+                "platform": platform,
+                "author": author,
+                "authorId": f"{platform}_{author}",
+                "content": content,
+                "url": f"https://example.com/{platform}/{i}",
+                "publishedAt": (now - timedelta(seconds=rng.randint(0, 72 * 3600))).isoformat(),
+                "likes": rng.randint(0, 1000),
+                "replies": rng.randint(0, 200),
+                "shares": rng.randint(0, 100),
+            }
+            recent.append(post)
+            # 下游会往post里写规范化文本等字段，交出副本
+            yield dict(post)
+
 
 if __name__ == "__main__":
     generator = MockDataGenerator()
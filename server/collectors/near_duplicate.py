@@ -0,0 +1,273 @@
+"""
+Near-duplicate and repost detection with SimHash + LSH banding
+Clusters reposts and templated posts whose content is nearly identical so the pipeline
+can reuse the canonical item's sentiment result
+"""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+
+_NOISE_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# 开头的转发标记（"转发：" "RT" 等）不属于内容本身，不参与指纹计算
+_REPOST_PREFIX_RE = re.compile(
+    r"^(?:\s*(?:转发|轉發|转载|轉載|rt|repost)(?=[\s:：转轉]|$)[\s:：]*)+", re.IGNORECASE
+)
+
+# 位切片累加：每个比特占一个LANE_BITS宽的计数通道，一次大整数加法即可累加64个比特
+LANE_BITS = 24
+_LANE_MASK = (1 << LANE_BITS) - 1
+_BYTE_LANES = [
+    sum(((value >> bit) & 1) << (bit * LANE_BITS) for bit in range(8))
+    for value in range(256)
+]
+
+
+def _compact(text: str) -> str:
+    return _NOISE_RE.sub("", _REPOST_PREFIX_RE.sub("", text.lower()))
+
+
+def simhash(text: str, ngram: int = 3) -> int:
+    """
+    Compute a 64-bit SimHash over character n-grams
+
+    Character n-grams work for Chinese without word segmentation. Leading repost
+    markers are dropped first, so a repost fingerprints like its original.
+
+    Args:
+        text: Comment text (ideally already normalized)
+        ngram: Shingle length in characters
+
+    Returns:
+        64-bit fingerprint, 0 if nothing is left to fingerprint
+    """
+    compact = _compact(text)
+    if not compact:
+        return 0
+    if len(compact) <= ngram:
+        shingles = [compact]
+    else:
+        shingles = [compact[i:i + ngram] for i in range(len(compact) - ngram + 1)]
+
+    weights: Dict[str, int] = {}
+    for shingle in shingles:
+        weights[shingle] = weights.get(shingle, 0) + 1
+
+    # lanes累加每个比特为1的权重之和
+    lanes = 0
+    total = 0
+    for shingle, weight in weights.items():
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        spread = 0
+        for i, byte in enumerate(digest):
+            spread |= _BYTE_LANES[byte] << (i * 8 * LANE_BITS)
+        lanes += spread * weight
+        total += weight
+
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        if ((lanes >> (bit * LANE_BITS)) & _LANE_MASK) * 2 > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """基于SimHash分段索引（LSH banding）的近似重复聚类"""
+
+    def __init__(self, max_distance: int = 3, ngram: int = 3, max_results: int = 10000):
+        """
+        Initialize near-duplicate index
+
+        The fingerprint is split into max_distance + 1 bands, so by the pigeonhole
+        principle any two fingerprints within max_distance bits share at least one
+        band exactly. Lookups only compare against cluster canonicals in the same
+        band buckets, which keeps them sublinear in the number of items.
+
+        Args:
+            max_distance: Maximum Hamming distance for two texts to be near-duplicates
+            ngram: Shingle length used by simhash()
+            max_results: Cached analysis results kept (least recently used are dropped)
+        """
+        self.max_distance = max_distance
+        self.ngram = ngram
+        self.max_results = max_results
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.num_bands)]
+        self.canonicals: List[int] = []
+        self.cluster_sizes: List[int] = []
+        # 分析结果只是缓存：淘汰后聚类的下一条内容重新分析
+        self.results: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _bands(self, fingerprint: int):
+        for band in range(self.num_bands):
+            yield band, (fingerprint >> (band * self.band_bits)) & self.band_mask
+
+    @staticmethod
+    def cluster_id(fingerprint: int) -> str:
+        """Stable cluster ID derived from the canonical fingerprint"""
+        return format(fingerprint, "016x")
+
+    def lookup(self, fingerprint: int) -> Optional[int]:
+        """Return the index of the closest matching cluster, if any"""
+        best, best_distance = None, self.max_distance + 1
+        checked = set()
+        for band, value in self._bands(fingerprint):
+            for cluster in self.buckets[band].get(value, ()):
+                if cluster in checked:
+                    continue
+                checked.add(cluster)
+                distance = hamming_distance(fingerprint, self.canonicals[cluster])
+                if distance < best_distance:
+                    best, best_distance = cluster, distance
+        return best
+
+    def assign(self, text: str) -> Tuple[Optional[str], bool]:
+        """
+        Assign a text to a cluster
+
+        Args:
+            text: Comment text (ideally already normalized)
+
+        Returns:
+            (cluster_id, is_canonical) - is_canonical is True if the text started a new cluster;
+            texts without content (empty, whitespace or punctuation only) get (None, True)
+        """
+        # 空文本的指纹都是0，不能归为同一个聚类
+        if not _compact(text):
+            return None, True
+        fingerprint = simhash(text, self.ngram)
+        cluster = self.lookup(fingerprint)
+        if cluster is not None:
+            self.cluster_sizes[cluster] += 1
+            return self.cluster_id(self.canonicals[cluster]), False
+
+        cluster = len(self.canonicals)
+        self.canonicals.append(fingerprint)
+        self.cluster_sizes.append(1)
+        for band, value in self._bands(fingerprint):
+            self.buckets[band].setdefault(value, []).append(cluster)
+        return self.cluster_id(fingerprint), True
+
+    def add_cluster(self, cluster_id: str, size: int = 1):
+        """Register an existing cluster by its ID (the canonical fingerprint in hex)"""
+        fingerprint = int(cluster_id, 16)
+        if self.lookup(fingerprint) is not None:
+            return
+        cluster = len(self.canonicals)
+        self.canonicals.append(fingerprint)
+        self.cluster_sizes.append(size)
+        for band, value in self._bands(fingerprint):
+            self.buckets[band].setdefault(value, []).append(cluster)
+
+    def load_from_db(self, connection, task_id: int, batch_size: int = 10000) -> int:
+        """
+        Rebuild the index from clusters already stored for a task
+
+        Cluster IDs are canonical fingerprints, so only the distinct clusterIds need to
+        be read back, not the comment texts.
+
+        Args:
+            connection: pymysql connection
+            task_id: Monitoring task ID
+            batch_size: Rows fetched per round trip
+
+        Returns:
+            Number of clusters loaded
+        """
+        import pymysql
+
+        loaded = 0
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(
+                """
+                SELECT clusterId, COUNT(*) FROM comments
+                WHERE taskId = %s AND clusterId IS NOT NULL
+                GROUP BY clusterId
+                """,
+                (task_id,),
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for cluster_id, size in rows:
+                    self.add_cluster(cluster_id, size)
+                    loaded += 1
+
+        logger.info(f"Near-duplicate index for task {task_id} loaded {loaded} clusters")
+        return loaded
+
+    def set_result(self, cluster_id: Optional[str], result: Dict):
+        """Remember the canonical item's analysis result for a cluster (no-op without a cluster)"""
+        if cluster_id is not None:
+            self.results[cluster_id] = result
+            self.results.move_to_end(cluster_id)
+            if len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+
+    def get_result(self, cluster_id: str) -> Optional[Dict]:
+        """Analysis result of the cluster's canonical item, if already computed"""
+        result = self.results.get(cluster_id)
+        if result is not None:
+            self.results.move_to_end(cluster_id)
+        return result
+
+    def stats(self) -> Dict:
+        items = sum(self.cluster_sizes)
+        return {
+            "items": items,
+            "clusters": len(self.canonicals),
+            "near_duplicates": items - len(self.canonicals),
+            "largest_cluster": max(self.cluster_sizes, default=0),
+        }
+
+
+class NearDuplicateRegistry:
+    """按监控任务维护近似重复索引"""
+
+    def __init__(self, connection=None, max_distance: int = 3, ngram: int = 3, max_tasks: int = 32):
+        """
+        Initialize registry
+
+        Args:
+            connection: pymysql connection used to preload stored clusters (optional)
+            max_distance: Maximum Hamming distance for two texts to be near-duplicates
+            ngram: Shingle length used by simhash()
+            max_tasks: Task indexes kept in memory; the least recently used one is dropped
+                and rebuilt from the comments table the next time its task runs
+        """
+        self.connection = connection
+        self.max_distance = max_distance
+        self.ngram = ngram
+        self.max_tasks = max_tasks
+        self._indexes: "OrderedDict[int, NearDuplicateIndex]" = OrderedDict()
+
+    def index_for(self, task_id: int) -> NearDuplicateIndex:
+        if task_id in self._indexes:
+            self._indexes.move_to_end(task_id)
+            return self._indexes[task_id]
+
+        index = NearDuplicateIndex(self.max_distance, self.ngram)
+        if self.connection is not None:
+            try:
+                index.load_from_db(self.connection, task_id)
+            except Exception as e:
+                logger.warning(f"Could not preload clusters for task {task_id}: {e}")
+        self._indexes[task_id] = index
+        if len(self._indexes) > self.max_tasks:
+            evicted, _ = self._indexes.popitem(last=False)
+            logger.info(f"Dropped idle near-duplicate index of task {evicted}")
+        return index
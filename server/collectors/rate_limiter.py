@@ -0,0 +1,380 @@
+"""
+Per-platform adaptive rate limiter
+Token buckets per platform/account with backoff on 429/captcha signals, shared by all
+crawls in a process and optionally across processes through a local SQLite file
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每个平台的默认配额：rate为每秒补充的令牌数，capacity为突发上限
+DEFAULT_PLATFORM_LIMITS = {
+    "twitter": {"rate": 0.5, "capacity": 5},
+    "weibo": {"rate": 0.5, "capacity": 3},
+    "zhihu": {"rate": 1.0, "capacity": 3},
+    "reddit": {"rate": 1.0, "capacity": 5},
+    "youtube": {"rate": 1.0, "capacity": 5},
+}
+
+FALLBACK_LIMIT = {"rate": 1.0, "capacity": 3}
+
+# 页面跳转到这些地址通常意味着触发了验证码或风控
+CAPTCHA_URL_MARKERS = ("captcha", "unhuman", "passport.weibo.com/visitor", "security-check")
+
+
+class ThrottledError(Exception):
+    """页面落在验证码/风控页或返回403/429；继续解析只会得到验证码页的内容"""
+
+    def __init__(self, platform: str, url: str, status: Optional[int] = None):
+        self.platform = platform
+        self.url = url
+        self.status = status
+        super().__init__(f"{platform} throttled (status {status}) at {url}")
+
+
+def looks_throttled(status: Optional[int] = None, url: Optional[str] = None) -> bool:
+    """Return True if an HTTP status or landing URL signals throttling or a captcha"""
+    if status in (403, 429):
+        return True
+    if url:
+        lowered = url.lower()
+        return any(marker in lowered for marker in CAPTCHA_URL_MARKERS)
+    return False
+
+
+class SQLiteBucketStore:
+    """在多个进程间共享令牌桶状态的SQLite存储"""
+
+    def __init__(self, path: str):
+        """
+        Initialize shared bucket store
+
+        Args:
+            path: SQLite database file shared by all processes on this host
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    rate REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def update(self, key: str, initial: Dict, mutate) -> Tuple[Dict, object]:
+        """
+        Atomically read, mutate and write one bucket state
+
+        Args:
+            key: Bucket key
+            initial: State used when the bucket does not exist yet
+            mutate: Callable(state) -> result, may modify state in place
+
+        Returns:
+            (new state, result of mutate)
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, rate, updated_at, blocked_until FROM rate_buckets WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row:
+                state = {
+                    "tokens": row[0],
+                    "rate": row[1],
+                    "updated_at": row[2],
+                    "blocked_until": row[3],
+                }
+            else:
+                state = dict(initial)
+            result = mutate(state)
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO rate_buckets (key, tokens, rate, updated_at, blocked_until)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, state["tokens"], state["rate"], state["updated_at"], state["blocked_until"]),
+            )
+            conn.execute("COMMIT")
+            return state, result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class TokenBucket:
+    """支持自适应退避（AIMD）的令牌桶"""
+
+    def __init__(
+        self,
+        key: str,
+        rate: float,
+        capacity: float,
+        min_rate: Optional[float] = None,
+        backoff_factor: float = 0.5,
+        recovery_fraction: float = 0.1,
+        cooldown: float = 30.0,
+        store: Optional[SQLiteBucketStore] = None,
+    ):
+        """
+        Initialize token bucket
+
+        Args:
+            key: Bucket key, usually "platform:account"
+            rate: Base refill rate in tokens per second
+            capacity: Maximum burst size
+            min_rate: Lowest rate reached through backoff (default: rate / 16)
+            backoff_factor: Rate multiplier applied on each throttle signal
+            recovery_fraction: Fraction of the base rate regained per successful request
+            cooldown: Seconds to pause the bucket after a throttle signal
+            store: Optional cross-process store, in-process state is used otherwise
+        """
+        self.key = key
+        self.base_rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.backoff_factor = backoff_factor
+        self.recovery_fraction = recovery_fraction
+        self.cooldown = cooldown
+        self.store = store
+        self._lock = threading.Lock()
+        self._state = self._initial_state()
+
+    def _initial_state(self) -> Dict:
+        return {
+            "tokens": float(self.capacity),
+            "rate": float(self.base_rate),
+            "updated_at": time.time(),
+            "blocked_until": 0.0,
+        }
+
+    def _apply(self, mutate):
+        """Run mutate(state) atomically against local or shared state"""
+        if self.store:
+            state, result = self.store.update(self.key, self._initial_state(), mutate)
+            self._state = state
+            return result
+        with self._lock:
+            return mutate(self._state)
+
+    def _refill(self, state: Dict, now: float):
+        elapsed = max(0.0, now - state["updated_at"])
+        state["tokens"] = min(self.capacity, state["tokens"] + elapsed * state["rate"])
+        state["updated_at"] = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens if available
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds to wait before retrying
+
+        Raises:
+            ValueError: More tokens than the bucket can ever hold
+        """
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot take {tokens} tokens from {self.key} (capacity {self.capacity})")
+
+        def mutate(state):
+            now = time.time()
+            self._refill(state, now)
+            if now < state["blocked_until"]:
+                return state["blocked_until"] - now
+            if state["tokens"] >= tokens:
+                state["tokens"] -= tokens
+                return 0.0
+            return (tokens - state["tokens"]) / state["rate"]
+
+        return self._apply(mutate)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait asynchronously until tokens are available"""
+        while True:
+            # 共享存储在文件锁上可能等待，放到线程里以免阻塞事件循环
+            wait = await asyncio.to_thread(self.try_acquire, tokens) if self.store else self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: float = 1.0):
+        """Block the calling thread until tokens are available"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self, retry_after: Optional[float] = None, reason: str = "429"):
+        """Back off after a 429/captcha signal: cut the rate and pause the bucket"""
+        def mutate(state):
+            now = time.time()
+            self._refill(state, now)
+            state["rate"] = max(self.min_rate, state["rate"] * self.backoff_factor)
+            state["tokens"] = 0.0
+            pause = max(self.cooldown, retry_after or 0.0)
+            state["blocked_until"] = max(state["blocked_until"], now + pause)
+            return state["rate"]
+
+        new_rate = self._apply(mutate)
+        logger.warning(f"Rate limit signal ({reason}) for {self.key}, rate lowered to {new_rate:.3f}/s")
+
+    def reward(self):
+        """Recover part of the base rate after a successful request"""
+        def mutate(state):
+            if state["rate"] < self.base_rate:
+                state["rate"] = min(
+                    self.base_rate, state["rate"] + self.base_rate * self.recovery_fraction
+                )
+
+        self._apply(mutate)
+
+    def snapshot(self) -> Dict:
+        """Current budget of this bucket"""
+        def mutate(state):
+            self._refill(state, time.time())
+            return dict(state)
+
+        state = self._apply(mutate)
+        return {
+            "tokens": round(state["tokens"], 3),
+            "capacity": self.capacity,
+            "rate": round(state["rate"], 4),
+            "base_rate": self.base_rate,
+            "blocked_for": round(max(0.0, state["blocked_until"] - time.time()), 3),
+        }
+
+
+class RateLimiter:
+    """按平台/账号管理令牌桶的礼貌调度器"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict]] = None,
+        state_path: Optional[str] = None,
+    ):
+        """
+        Initialize rate limiter
+
+        Args:
+            limits: Per-platform bucket settings, merged over DEFAULT_PLATFORM_LIMITS
+            state_path: SQLite file to share budgets across processes (optional)
+        """
+        self.limits = {**DEFAULT_PLATFORM_LIMITS, **(limits or {})}
+        self.store = SQLiteBucketStore(state_path) if state_path else None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        logger.info(
+            f"RateLimiter initialized ({'shared: ' + state_path if state_path else 'in-process'})"
+        )
+
+    def bucket(self, platform: str, account: str = "default") -> TokenBucket:
+        """Get or create the bucket for a platform/account pair"""
+        key = f"{platform}:{account}"
+        with self._lock:
+            if key not in self._buckets:
+                settings = self.limits.get(platform, FALLBACK_LIMIT)
+                self._buckets[key] = TokenBucket(key, store=self.store, **settings)
+            return self._buckets[key]
+
+    async def acquire(self, platform: str, account: str = "default", tokens: float = 1.0):
+        """Wait asynchronously for a request slot"""
+        await self.bucket(platform, account).acquire(tokens)
+
+    def acquire_sync(self, platform: str, account: str = "default", tokens: float = 1.0):
+        """Block the calling thread until a request slot is available"""
+        self.bucket(platform, account).acquire_sync(tokens)
+
+    def report_throttled(
+        self,
+        platform: str,
+        account: str = "default",
+        retry_after: Optional[float] = None,
+        reason: str = "429",
+    ):
+        """Report a 429/captcha signal for a platform/account"""
+        self.bucket(platform, account).penalize(retry_after, reason)
+
+    def report_success(self, platform: str, account: str = "default"):
+        """Report a successful request for a platform/account"""
+        self.bucket(platform, account).reward()
+
+    async def navigate(self, page, url: str, platform: str, account: str = "default"):
+        """
+        Open a URL in a Playwright page within the platform's rate budget
+
+        The landing status/URL is checked for throttling signals and reported back, so
+        the browser collectors share one navigation policy. A throttled landing raises,
+        so the crawl stops instead of parsing a captcha page.
+
+        Args:
+            page: Playwright page
+            url: Target URL
+            platform: Rate limiter platform
+            account: Account the page is logged in as
+
+        Returns:
+            Playwright response (None for same-document navigations)
+
+        Raises:
+            ThrottledError: The page landed on a captcha/verification page or got 403/429
+        """
+        bucket = self.bucket(platform, account)
+        await bucket.acquire()
+        response = await page.goto(url, wait_until="networkidle")
+        status = response.status if response else None
+        throttled = looks_throttled(status, page.url)
+        if throttled:
+            report = lambda: bucket.penalize(reason="captcha")
+        else:
+            report = bucket.reward
+        if bucket.store:
+            await asyncio.to_thread(report)
+        else:
+            report()
+        if throttled:
+            raise ThrottledError(platform, page.url, status)
+        return response
+
+    def budgets(self) -> Dict[str, Dict]:
+        """Current budgets of all known buckets"""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {bucket.key: bucket.snapshot() for bucket in buckets}
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the process-wide rate limiter
+
+    Set RATE_LIMIT_STATE_PATH to share budgets with other processes on this host.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(state_path=os.getenv("RATE_LIMIT_STATE_PATH"))
+        return _rate_limiter
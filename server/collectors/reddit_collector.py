@@ -9,14 +9,48 @@ from typing import List, Dict, Optional
 from datetime import datetime
 
 sys.path.append('/opt/.manus/.sandbox-runtime')
-from data_api import ApiClient
+try:
+    from data_api import ApiClient
+except ImportError:
+    ApiClient = None
+
+from api_cache import CachedApiClient, ResponseCache, get_response_cache
+from concurrent_fetch import fetch_concurrently
+from rate_limiter import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 class RedditCollector:
-    def __init__(self):
-        """Initialize Reddit API client"""
-        self.client = ApiClient()
+    def __init__(
+        self,
+        client=None,
+        max_workers: int = 4,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Initialize Reddit API client
+        
+        Args:
+            client: Object with call_api(endpoint, query=...) (default: Manus ApiClient,
+                    use StubApiClient for tests and offline runs)
+            max_workers: Maximum number of subreddits fetched in parallel
+            cache: Response cache (default: the shared process-wide cache)
+            use_cache: Set to False to always call the upstream API
+        """
+        if client is None:
+            if ApiClient is None:
+                raise ImportError("data_api is not available; pass client=StubApiClient() to run locally")
+            client = ApiClient()
+        self.max_workers = max_workers
+        self.rate_limiter = get_rate_limiter()
+        # 相同接口和参数在TTL内只请求一次上游，缓存命中不消耗速率配额
+        self.client = CachedApiClient(
+            client,
+            cache=(cache or get_response_cache()) if use_cache else None,
+            platform='reddit',
+            rate_limiter=self.rate_limiter,
+        )
         logger.info("Reddit API client initialized")
 
     def search_posts(
@@ -46,25 +80,23 @@ class RedditCollector:
         # Select relevant subreddits
         subreddits = keyword_subreddit_map.get(keyword, ["all"])
         
-        all_posts = []
         posts_per_subreddit = max(10, max_results // len(subreddits))
         
-        for subreddit in subreddits:
-            try:
-                posts = self.get_subreddit_posts(subreddit, posts_per_subreddit)
-                # Filter posts containing the keyword
-                filtered_posts = [
-                    p for p in posts 
-                    if keyword.lower() in p['content'].lower() or 
-                       keyword.lower() in p.get('title', '').lower()
-                ]
-                all_posts.extend(filtered_posts)
-                
-                if len(all_posts) >= max_results:
-                    break
-            except Exception as e:
-                logger.warning(f"Failed to collect from r/{subreddit}: {e}")
-                continue
+        # Filter posts containing the keyword
+        def matches(post: Dict) -> bool:
+            return (
+                keyword.lower() in post['content'].lower() or
+                keyword.lower() in post.get('title', '').lower()
+            )
+        
+        # 并发拉取各子版块，凑够max_results条后不再等待其余请求
+        all_posts = fetch_concurrently(
+            lambda subreddit: self.get_subreddit_posts(subreddit, posts_per_subreddit),
+            subreddits,
+            max_workers=self.max_workers,
+            max_results=max_results,
+            select=matches,
+        )
         
         result = all_posts[:max_results]
         logger.info(f"Collected {len(result)} Reddit posts for keyword: {keyword}")
@@ -1,5 +1,5 @@
 """
-Unified collector script for all platforms (Twitter, Weibo, Zhihu)
+Unified collector script for all platforms (Twitter, Weibo, Zhihu, Reddit, YouTube)
 Supports command-line arguments and database storage
 """
 
@@ -14,13 +14,26 @@ from datetime import datetime
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlp"))
 
 import pymysql
 from dotenv import load_dotenv
 
+from analytics.anomaly import open_task_detector
+from analytics.rollup import refresh_sentiment_stats
+
 # Import collectors
-from twitter_collector import TwitterCollector
+from checkpoint import JobCheckpoint, run_key
+from dedupe_index import open_dedupe_index
+from job_queue import PLATFORMS
+from lexicon_engine import aspects_json
+from near_duplicate import NearDuplicateRegistry
+from reddit_collector import RedditCollector
+from segment_store import SegmentStore
+from text_normalizer import normalize_text
+from twitter_collector import SinceIdStore, TwitterCollector
 from weibo_collector import WeiboCollector
+from youtube_collector import YouTubeCollector
 from zhihu_collector import ZhihuCollector
 
 load_dotenv()
@@ -65,8 +78,8 @@ class DatabaseManager:
                 sql = """
                 INSERT INTO comments (
                     taskId, platform, platformId, author, authorId,
-                    content, url, publishedAt, likes, replies, shares, collectedAt
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    content, url, publishedAt, likes, replies, shares, clusterId, collectedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
                 """
                 cursor.execute(sql, (
                     task_id,
@@ -79,7 +92,8 @@ class DatabaseManager:
                     comment_data.get('publishedAt'),
                     comment_data.get('likes', 0),
                     comment_data.get('replies', 0),
-                    comment_data.get('shares', 0)
+                    comment_data.get('shares', 0),
+                    comment_data.get('clusterId')
                 ))
                 self.connection.commit()
                 return cursor.lastrowid
@@ -91,14 +105,29 @@ class DatabaseManager:
             self.connection.rollback()
             return None
     
+    def find_unanalyzed_comment(self, platform_id: str) -> Optional[int]:
+        """已入库但还没有情感分析结果的评论ID（用于断点续跑时补做分析）"""
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("""
+                SELECT c.id FROM comments c
+                LEFT JOIN sentiment_analysis sa ON sa.commentId = c.id
+                WHERE c.platformId = %s AND sa.id IS NULL
+                """, (platform_id,))
+                row = cursor.fetchone()
+                return row['id'] if row else None
+        except Exception as e:
+            logger.error(f"Error looking up comment {platform_id}: {e}")
+            return None
+    
     def insert_sentiment_analysis(self, comment_id: int, sentiment_data: Dict) -> bool:
         """插入情感分析结果"""
         try:
             with self.connection.cursor() as cursor:
                 sql = """
                 INSERT INTO sentiment_analysis (
-                    commentId, sentiment, score, confidence, keywords, analyzedAt
-                ) VALUES (%s, %s, %s, %s, %s, NOW())
+                    commentId, sentiment, score, confidence, keywords, aspectScores, analyzedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, NOW())
                 """
                 keywords_json = json.dumps(sentiment_data.get('keywords', []), ensure_ascii=False)
                 cursor.execute(sql, (
@@ -106,7 +135,8 @@ class DatabaseManager:
                     sentiment_data.get('sentiment'),
                     sentiment_data.get('score'),
                     sentiment_data.get('confidence'),
-                    keywords_json
+                    keywords_json,
+                    aspects_json(sentiment_data.get('aspects'))
                 ))
                 self.connection.commit()
                 return True
@@ -116,14 +146,36 @@ class DatabaseManager:
             return False
     
     def update_crawl_job(self, task_id: int, platform: str, status: str, 
-                        total_collected: int, new_comments: int, error_msg: str = None):
-        """更新爬虫任务状态"""
+                        total_collected: int, new_comments: int, error_msg: str = None,
+                        duplicates: int = 0, job: Optional[Dict] = None) -> bool:
+        """
+        更新爬虫任务状态
+
+        `job` is a row claimed from the queue: only that row is updated, and only while
+        its leaseToken still matches, so a worker that lost the lease cannot overwrite
+        the new holder's results. Returns False if the update was fenced off.
+        """
         try:
             with self.connection.cursor() as cursor:
-                # 查找或创建crawl job
+                if job is not None:
+                    updated = cursor.execute("""
+                    UPDATE crawl_jobs
+                    SET totalCollected = %s, newComments = %s, duplicates = %s, status = %s,
+                        errorMessage = %s, completedAt = NOW(), leaseExpiresAt = NULL
+                    WHERE id = %s AND leaseToken = %s AND status = 'running'
+                    """, (
+                        total_collected, new_comments, duplicates, status, error_msg,
+                        job['id'], job['leaseToken']
+                    ))
+                    self.connection.commit()
+                    if not updated:
+                        logger.warning(f"Lease of crawl job {job['id']} was lost, discarding its {status} update")
+                    return bool(updated)
+                
+                # 查找或创建crawl job（不碰worker持有租约的记录）
                 sql_check = """
                 SELECT id FROM crawl_jobs 
-                WHERE taskId = %s AND platform = %s AND status = 'running'
+                WHERE taskId = %s AND platform = %s AND status = 'running' AND workerId IS NULL
                 ORDER BY id DESC LIMIT 1
                 """
                 cursor.execute(sql_check, (task_id, platform))
@@ -133,28 +185,30 @@ class DatabaseManager:
                     # 更新现有记录
                     sql_update = """
                     UPDATE crawl_jobs 
-                    SET totalCollected = %s, newComments = %s, status = %s,
+                    SET totalCollected = %s, newComments = %s, duplicates = %s, status = %s,
                         errorMessage = %s, completedAt = NOW()
                     WHERE id = %s
                     """
                     cursor.execute(sql_update, (
-                        total_collected, new_comments, status, error_msg, result['id']
+                        total_collected, new_comments, duplicates, status, error_msg, result['id']
                     ))
                 else:
                     # 创建新记录
                     sql_insert = """
                     INSERT INTO crawl_jobs (
-                        taskId, platform, totalCollected, newComments, status,
+                        taskId, platform, totalCollected, newComments, duplicates, status,
                         errorMessage, startedAt, completedAt, createdAt
-                    ) VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW(), NOW())
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), NOW())
                     """
                     cursor.execute(sql_insert, (
-                        task_id, platform, total_collected, new_comments, status, error_msg
+                        task_id, platform, total_collected, new_comments, duplicates, status, error_msg
                     ))
                 
                 self.connection.commit()
+                return True
         except Exception as e:
             logger.error(f"Error updating crawl job: {e}")
+            return False
     
     def close(self):
         """关闭数据库连接"""
@@ -163,118 +217,300 @@ class DatabaseManager:
             logger.info("Database connection closed")
 
 
+async def open_collector(platform: str):
+    """
+    创建平台采集器；浏览器类采集器会启动浏览器并登录
+    """
+    if platform == "twitter":
+        return TwitterCollector(
+            os.getenv("TWITTER_API_KEY"),
+            os.getenv("TWITTER_API_SECRET"),
+            os.getenv("TWITTER_ACCESS_TOKEN"),
+            os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
+        )
+    if platform == "reddit":
+        return RedditCollector()
+    if platform == "youtube":
+        return YouTubeCollector()
+    if platform == "weibo":
+        collector = WeiboCollector(os.getenv("WEIBO_USERNAME"), os.getenv("WEIBO_PASSWORD"))
+    elif platform == "zhihu":
+        collector = ZhihuCollector(os.getenv("ZHIHU_USERNAME"), os.getenv("ZHIHU_PASSWORD"))
+    else:
+        raise ValueError(f"Unknown platform: {platform}")
+    await collector.start()
+    await collector.login()
+    return collector
+
+
+async def close_collector(collector):
+    if hasattr(collector, "close"):
+        await collector.close()
+
+
+def analyze_remote(nlp_url: str, text: str) -> Optional[Dict]:
+    """调用NLP服务分析一条规范化文本；失败时返回None"""
+    import requests
+    try:
+        response = requests.post(
+            f"{nlp_url}/sentiment",
+            json={"text": text, "normalized": True},
+            timeout=5
+        )
+        if response.status_code == 200:
+            return response.json()
+    except Exception as e:
+        logger.warning(f"NLP analysis failed: {e}")
+    return None
+
+
 async def collect_from_platform(
     platform: str,
     keyword: str,
     max_results: int,
     task_id: int,
     db: DatabaseManager,
-    nlp_url: str = None
+    nlp_url: str = None,
+    dedupe_index=None,
+    near_duplicates=None,
+    detector=None,
+    segment_store=None,
+    replay_from=None,
+    checkpoint=None,
+    collectors: Optional[Dict] = None,
+    prefetched: Optional[List[Dict]] = None,
+    job: Optional[Dict] = None
 ) -> Dict:
-    """从指定平台采集数据"""
+    """
+    从指定平台采集数据
+
+    With a segment store, raw results are made durable before any DB/NLP work and the
+    storing loop reads them back from the store. `replay_from` skips crawling and
+    re-processes stored posts from that sequence number instead. A checkpoint records
+    the crawl cursor and processing position so an interrupted job can be resumed.
+    The stream's writer (and its lock) is released when the job ends.
+
+    A long-running worker passes `collectors`, a per-slot dict of open collectors that
+    is reused across jobs instead of launching and logging in a browser every time.
+    `prefetched` posts (e.g. mock data) replace the crawl, and `job` is the claimed
+    crawl_jobs row whose lease fences the final status update.
+
+    Blocking work (synchronous API clients, DB writes, NLP requests, fsyncs) runs in
+    a thread via asyncio.to_thread so concurrent jobs on one event loop overlap; the
+    in-memory dedupe/cluster indexes and the detector are only touched on the loop.
+    """
     
-    logger.info(f"Starting collection from {platform} for keyword: {keyword}")
+    if replay_from is None:
+        logger.info(f"Starting collection from {platform} for keyword: {keyword}")
+    else:
+        logger.info(f"Replaying stored {platform} posts of task {task_id} from seq {replay_from}")
     
     collected_count = 0
     new_comments = 0
+    duplicate_count = 0
+    near_duplicate_count = 0
     error_msg = None
+    since_store = newest_ids = None
     
     try:
-        if platform == "twitter":
-            # Twitter采集
-            api_key = os.getenv("TWITTER_API_KEY")
-            api_secret = os.getenv("TWITTER_API_SECRET")
-            access_token = os.getenv("TWITTER_ACCESS_TOKEN")
-            access_secret = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
-            
-            collector = TwitterCollector(api_key, api_secret, access_token, access_secret)
-            posts = collector.search_tweets(keyword, max_results)
-            collected_count = len(posts)
-            
-        elif platform == "weibo":
-            # 微博采集
-            username = os.getenv("WEIBO_USERNAME")
-            password = os.getenv("WEIBO_PASSWORD")
-            
-            collector = WeiboCollector(username, password)
-            await collector.start()
-            await collector.login()
-            posts = await collector.search_posts(keyword, max_results)
-            await collector.close()
-            collected_count = len(posts)
+        posts = None
+        if replay_from is not None:
+            pass
+        
+        elif checkpoint and checkpoint.crawl_done:
+            # 断点续跑：采集阶段已完成，只处理段文件中尚未入库的条目
+            logger.info(f"{platform} crawl of task {task_id} already finished, resuming processing")
             
-        elif platform == "zhihu":
-            # 知乎采集
-            username = os.getenv("ZHIHU_USERNAME")
-            password = os.getenv("ZHIHU_PASSWORD")
+        elif prefetched is not None:
+            posts = prefetched
             
-            collector = ZhihuCollector(username, password)
-            await collector.start()
-            await collector.login()
-            posts = await collector.search_content(keyword, max_results)
-            await collector.close()
-            collected_count = len(posts)
+        elif platform not in PLATFORMS:
+            raise ValueError(f"Unknown platform: {platform}")
             
         else:
-            raise ValueError(f"Unknown platform: {platform}")
+            collector = collectors.get(platform) if collectors is not None else None
+            if collector is None:
+                collector = await open_collector(platform)
+                if collectors is not None:
+                    collectors[platform] = collector
+            try:
+                if platform == "twitter":
+                    # 增量采集：各用户时间线只取本任务上次读完之后的新推文
+                    since_store = SinceIdStore()
+                    since_ids = await asyncio.to_thread(since_store.get, task_id)
+                if platform == "twitter" and checkpoint:
+                    # 每页落盘后记录分页游标，续跑时从未完成的分页继续
+                    remaining = max_results - checkpoint.counts['collected']
+                    if remaining > 0:
+                        await asyncio.to_thread(
+                            collector.search_tweets, keyword, remaining, since_ids=since_ids,
+                            page_tokens=checkpoint.state['cursor'],
+                            on_page=checkpoint.page_recorder(segment_store.writer(task_id, platform))
+                        )
+                        newest_ids = dict(collector.newest_ids)
+                elif platform == "twitter":
+                    posts = await asyncio.to_thread(collector.search_tweets, keyword, max_results,
+                                                    since_ids=since_ids)
+                    newest_ids = dict(collector.newest_ids)
+                elif platform == "reddit":
+                    posts = await asyncio.to_thread(collector.search_posts, keyword, max_results)
+                elif platform == "youtube":
+                    posts = await asyncio.to_thread(collector.search_videos, keyword, max_results)
+                elif platform == "weibo":
+                    posts = await collector.search_posts(keyword, max_results)
+                else:
+                    posts = await collector.search_content(keyword, max_results)
+            finally:
+                # 单次运行用完即关闭；常驻worker的采集器由worker统一关闭
+                if collectors is None:
+                    await close_collector(collector)
+        
+        # 原始结果先落盘：入库中途崩溃可以重放或续跑，无需重新采集
+        if replay_from is not None:
+            stored = segment_store.read(task_id, platform, replay_from)
+        elif checkpoint:
+            if not checkpoint.crawl_done:
+                await asyncio.to_thread(checkpoint.finish_crawl, segment_store.writer(task_id, platform), posts)
+            counts = checkpoint.counts
+            collected_count = counts['collected']
+            new_comments = counts['new']
+            duplicate_count = counts['duplicates']
+            near_duplicate_count = counts['near_duplicates']
+            stored = checkpoint.pending(segment_store)
+        elif segment_store:
+            first_seq, _ = await asyncio.to_thread(segment_store.append, task_id, platform, posts)
+            stored = segment_store.read(task_id, platform, first_seq)
+        else:
+            stored = enumerate(posts)
+        if replay_from is None and not checkpoint:
+            collected_count = len(posts)
+        
+        cluster_index = near_duplicates.index_for(task_id) if near_duplicates else None
         
         # 存储到数据库
-        for post in posts:
-            comment_id = db.insert_comment(task_id, post)
-            if comment_id:
-                new_comments += 1
+        for seq, post in stored:
+            if replay_from is not None:
+                collected_count += 1
+            
+            comment_id = analyzed_id = None
+            try:
+                # 先查去重索引，已见过的内容跳过数据库和NLP
+                repair_id = None
+                if dedupe_index and dedupe_index.is_duplicate(post['platform'], post['platformId']):
+                    if checkpoint and checkpoint.may_be_partial(seq):
+                        repair_id = await asyncio.to_thread(db.find_unanalyzed_comment, post['platformId'])
+                    if not repair_id:
+                        duplicate_count += 1
+                        continue
+                
+                # 入库时统一规范化一次，聚类和NLP都使用规范化文本
+                post['normalizedContent'] = normalize_text(post['content'])
+                
+                cached_sentiment = None
+                if repair_id:
+                    # 上次中断前已入库但未分析的条目，只补做分析
+                    comment_id = repair_id
+                else:
+                    # 转发/模板内容归入同一聚类，复用代表条目的分析结果
+                    is_canonical = True
+                    if cluster_index:
+                        post['clusterId'], is_canonical = cluster_index.assign(post['normalizedContent'])
+                        if not is_canonical:
+                            near_duplicate_count += 1
+                    
+                    comment_id = await asyncio.to_thread(db.insert_comment, task_id, post)
+                    if dedupe_index:
+                        dedupe_index.add(post['platform'], post['platformId'])
+                    if comment_id:
+                        new_comments += 1
+                        if cluster_index and not is_canonical:
+                            cached_sentiment = cluster_index.get_result(post['clusterId'])
                 
+                if comment_id and cached_sentiment:
+                    if await asyncio.to_thread(db.insert_sentiment_analysis, comment_id, cached_sentiment):
+                        analyzed_id = comment_id
+                    if detector:
+                        detector.observe(task_id, post.get('publishedAt'), cached_sentiment['sentiment'])
                 # 如果提供了NLP服务URL，进行情感分析
-                if nlp_url:
-                    try:
-                        import requests
-                        response = requests.post(
-                            f"{nlp_url}/sentiment",
-                            json={"text": post['content']},
-                            timeout=5
-                        )
-                        if response.status_code == 200:
-                            sentiment_data = response.json()
-                            db.insert_sentiment_analysis(comment_id, sentiment_data)
-                    except Exception as e:
-                        logger.warning(f"NLP analysis failed: {e}")
+                elif comment_id and nlp_url:
+                    sentiment_data = await asyncio.to_thread(analyze_remote, nlp_url, post['normalizedContent'])
+                    if sentiment_data:
+                        if await asyncio.to_thread(db.insert_sentiment_analysis, comment_id, sentiment_data):
+                            analyzed_id = comment_id
+                        if detector:
+                            detector.observe(task_id, post.get('publishedAt'), sentiment_data['sentiment'])
+                        if cluster_index and not repair_id:
+                            cluster_index.set_result(post['clusterId'], sentiment_data)
+            finally:
+                if checkpoint:
+                    checkpoint.counts.update(new=new_comments, duplicates=duplicate_count,
+                                             near_duplicates=near_duplicate_count)
+                    checkpoint.processed(seq, comment_id, analyzed_id)
+        
+        if checkpoint:
+            checkpoint.finish()
+        
+        # 推文全部入库后才推进since ID，中途失败的任务下次重新采集这段时间线
+        if newest_ids:
+            await asyncio.to_thread(since_store.update, task_id, newest_ids)
         
         # 更新任务状态
-        db.update_crawl_job(task_id, platform, 'completed', collected_count, new_comments)
+        await asyncio.to_thread(db.update_crawl_job, task_id, platform, 'completed', collected_count,
+                                new_comments, duplicates=duplicate_count, job=job)
         
-        logger.info(f"Completed {platform} collection: {collected_count} collected, {new_comments} new")
+        logger.info(f"Completed {platform} collection: {collected_count} collected, "
+                    f"{new_comments} new, {duplicate_count} duplicates, "
+                    f"{near_duplicate_count} near-duplicates")
         
         return {
             "success": True,
             "platform": platform,
             "collected": collected_count,
-            "new": new_comments
+            "new": new_comments,
+            "duplicates": duplicate_count,
+            "near_duplicates": near_duplicate_count
         }
         
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error collecting from {platform}: {error_msg}")
-        db.update_crawl_job(task_id, platform, 'failed', collected_count, new_comments, error_msg)
+        db.update_crawl_job(task_id, platform, 'failed', collected_count, new_comments, error_msg, job=job)
         
         return {
             "success": False,
             "platform": platform,
             "error": error_msg
         }
+    finally:
+        # 写入器和流锁只在本次任务内持有，同一任务/平台可由其他进程接手
+        if segment_store:
+            await asyncio.to_thread(segment_store.release, task_id, platform)
 
 
 async def main():
     parser = argparse.ArgumentParser(description="Multi-platform data collector")
     parser.add_argument("--task-id", type=int, required=True, help="Monitoring task ID")
-    parser.add_argument("--keyword", type=str, required=True, help="Search keyword")
+    parser.add_argument("--keyword", type=str, help="Search keyword")
     parser.add_argument("--platforms", type=str, default="twitter,weibo,zhihu", 
                        help="Platforms to collect from (comma-separated)")
     parser.add_argument("--max-results", type=int, default=50, 
                        help="Maximum results per platform")
     parser.add_argument("--skip-nlp", action="store_true", 
                        help="Skip NLP sentiment analysis")
+    parser.add_argument("--no-store", action="store_true",
+                       help="Do not keep raw results in the local segment store")
+    parser.add_argument("--replay-from", type=int, metavar="SEQ",
+                       help="Re-process stored posts from this sequence number instead of crawling")
+    parser.add_argument("--resume", action="store_true",
+                       help="Continue interrupted platform jobs from their checkpoints")
     
     args = parser.parse_args()
+    if args.replay_from is None and not args.keyword:
+        parser.error("--keyword is required unless --replay-from is given")
+    if args.replay_from is not None and args.no_store:
+        parser.error("--replay-from reads from the segment store")
+    if args.resume and (args.no_store or args.replay_from is not None):
+        parser.error("--resume needs the segment store and cannot be combined with --replay-from")
     
     # 连接数据库
     db_url = os.getenv("DATABASE_URL")
@@ -283,22 +519,42 @@ async def main():
         return
     
     db = DatabaseManager(db_url)
+    dedupe_index = open_dedupe_index(db.connection)
+    near_duplicates = NearDuplicateRegistry(db.connection)
+    segment_store = None if args.no_store else SegmentStore()
     
     # NLP服务URL
     nlp_url = None if args.skip_nlp else os.getenv("NLP_SERVICE_URL", "http://localhost:8000")
     
+    # 突发检测基线从汇总表预热，告警写入sentiment_alerts
+    detector = open_task_detector(db.connection, args.task_id) if nlp_url else None
+    
     # 解析平台列表
     platforms = [p.strip() for p in args.platforms.split(',')]
     
-    # 并发采集
+    # 逐个平台采集（各平台共用数据库连接和索引）
     results = []
     for platform in platforms:
+        # 每个平台一个检查点；续跑时已完成的平台不会重复采集
+        checkpoint = None
+        if segment_store and args.replay_from is None:
+            checkpoint = (JobCheckpoint.load if args.resume else JobCheckpoint.begin)(
+                args.task_id, platform, run_key(keyword=args.keyword))
         result = await collect_from_platform(
             platform, args.keyword, args.max_results, 
-            args.task_id, db, nlp_url
+            args.task_id, db, nlp_url, dedupe_index, near_duplicates, detector,
+            segment_store, args.replay_from, checkpoint
         )
         results.append(result)
     
+    dedupe_index.save()
+    if segment_store:
+        segment_store.close()
+    
+    # 把本次写入的情感结果汇总进sentiment_stats
+    if nlp_url:
+        refresh_sentiment_stats(db.connection)
+    
     # 输出结果
     print(json.dumps({
         "task_id": args.task_id,
@@ -15,8 +15,19 @@ from datetime import datetime
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlp"))
+
 # 导入Twitter采集器
-from twitter_collector import TwitterCollector
+from twitter_collector import SinceIdStore, TwitterCollector
+from dedupe_index import open_dedupe_index
+from near_duplicate import NearDuplicateRegistry
+from segment_store import SegmentStore
+from checkpoint import JobCheckpoint, run_key
+from text_normalizer import normalize_text
+from lexicon_engine import aspects_json
+from analytics.anomaly import open_task_detector
+from analytics.rollup import refresh_sentiment_stats
 
 # 加载环境变量
 load_dotenv()
@@ -79,8 +90,8 @@ class DatabaseManager:
                 sql = """
                 INSERT INTO comments (
                     taskId, platform, platformId, author, authorId,
-                    content, url, publishedAt, likes, replies, shares, collectedAt
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    content, url, publishedAt, likes, replies, shares, clusterId, collectedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
                 """
                 cursor.execute(sql, (
                     task_id,
@@ -93,7 +104,8 @@ class DatabaseManager:
                     comment_data.get('publishedAt'),
                     comment_data.get('likes', 0),
                     comment_data.get('replies', 0),
-                    comment_data.get('shares', 0)
+                    comment_data.get('shares', 0),
+                    comment_data.get('clusterId')
                 ))
                 self.connection.commit()
                 return cursor.lastrowid
@@ -106,14 +118,29 @@ class DatabaseManager:
             self.connection.rollback()
             return None
     
+    def find_unanalyzed_comment(self, platform_id: str) -> Optional[int]:
+        """已入库但还没有情感分析结果的评论ID（用于断点续跑时补做分析）"""
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("""
+                SELECT c.id FROM comments c
+                LEFT JOIN sentiment_analysis sa ON sa.commentId = c.id
+                WHERE c.platformId = %s AND sa.id IS NULL
+                """, (platform_id,))
+                row = cursor.fetchone()
+                return row['id'] if row else None
+        except Exception as e:
+            logger.error(f"Error looking up comment {platform_id}: {e}")
+            return None
+    
     def insert_sentiment_analysis(self, comment_id: int, sentiment_data: Dict) -> bool:
         """插入情感分析结果"""
         try:
             with self.connection.cursor() as cursor:
                 sql = """
                 INSERT INTO sentiment_analysis (
-                    commentId, sentiment, score, confidence, keywords, analyzedAt
-                ) VALUES (%s, %s, %s, %s, %s, NOW())
+                    commentId, sentiment, score, confidence, keywords, aspectScores, analyzedAt
+                ) VALUES (%s, %s, %s, %s, %s, %s, NOW())
                 """
                 keywords_json = json.dumps(sentiment_data.get('keywords', []), ensure_ascii=False)
                 cursor.execute(sql, (
@@ -121,7 +148,8 @@ class DatabaseManager:
                     sentiment_data.get('sentiment'),
                     sentiment_data.get('score'),
                     sentiment_data.get('confidence'),
-                    keywords_json
+                    keywords_json,
+                    aspects_json(sentiment_data.get('aspects'))
                 ))
                 self.connection.commit()
                 return True
@@ -196,12 +224,12 @@ class NLPServiceClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
     
-    def analyze_sentiment(self, text: str) -> Optional[Dict]:
+    def analyze_sentiment(self, text: str, normalized: bool = False) -> Optional[Dict]:
         """调用情感分析服务"""
         try:
             response = requests.post(
                 f"{self.base_url}/sentiment",
-                json={"text": text, "language": "zh"},
+                json={"text": text, "language": "zh", "normalized": normalized},
                 timeout=30
             )
             if response.status_code == 200:
@@ -213,12 +241,12 @@ class NLPServiceClient:
             logger.error(f"Error calling NLP service: {e}")
             return None
     
-    def extract_keywords(self, text: str, top_k: int = 10) -> Optional[List[Dict]]:
+    def extract_keywords(self, text: str, top_k: int = 10, normalized: bool = False) -> Optional[List[Dict]]:
         """调用关键词提取服务"""
         try:
             response = requests.post(
                 f"{self.base_url}/keywords",
-                json={"text": text, "language": "zh"},
+                json={"text": text, "language": "zh", "normalized": normalized},
                 params={"top_k": top_k},
                 timeout=30
             )
@@ -239,8 +267,12 @@ def main():
     parser.add_argument('--keyword', type=str, required=True, help='搜索关键词')
     parser.add_argument('--max-results', type=int, default=100, help='最大采集数量')
     parser.add_argument('--skip-nlp', action='store_true', help='跳过NLP分析')
+    parser.add_argument('--no-store', action='store_true', help='不在本地段文件中保留原始结果')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的检查点继续，不重复采集和分析')
     
     args = parser.parse_args()
+    if args.resume and args.no_store:
+        parser.error('--resume needs the segment store')
     
     # 获取环境变量
     database_url = os.getenv('DATABASE_URL')
@@ -260,8 +292,19 @@ def main():
     
     # 初始化组件
     db = DatabaseManager(database_url)
+    dedupe_index = open_dedupe_index(db.connection)
+    cluster_index = NearDuplicateRegistry(db.connection).index_for(args.task_id)
     collector = TwitterCollector(api_key, api_secret, access_token, access_token_secret)
+    since_store = SinceIdStore()
+    since_ids = since_store.get(args.task_id)
     nlp_client = NLPServiceClient() if not args.skip_nlp else None
+    segment_store = None if args.no_store else SegmentStore()
+    checkpoint = None
+    if segment_store:
+        checkpoint = (JobCheckpoint.load if args.resume else JobCheckpoint.begin)(
+            args.task_id, 'twitter', run_key(keyword=args.keyword))
+    # 突发检测基线从汇总表预热，告警写入sentiment_alerts
+    detector = open_task_detector(db.connection, args.task_id) if nlp_client else None
     
     try:
         # 更新任务状态为运行中
@@ -269,32 +312,84 @@ def main():
         
         logger.info(f"Starting Twitter collection for task {args.task_id}, keyword: {args.keyword}")
         
-        # 采集推文
-        tweets = collector.search_tweets(args.keyword, max_results=args.max_results)
+        # 原始结果先落盘，后续处理从段文件读取；入库中途崩溃无需重新调用API。
+        # 检查点记录每页之后的分页游标和段文件序号，--resume从中断处继续
+        if checkpoint and checkpoint.status == 'completed':
+            logger.info(f"Checkpoint of task {args.task_id} is already completed, nothing to resume")
+        elif checkpoint and not checkpoint.crawl_done:
+            writer = segment_store.writer(args.task_id, 'twitter')
+            remaining = args.max_results - checkpoint.counts['collected']
+            if remaining > 0:
+                collector.search_tweets(
+                    args.keyword, max_results=remaining, since_ids=since_ids,
+                    page_tokens=checkpoint.state['cursor'], on_page=checkpoint.page_recorder(writer)
+                )
+            checkpoint.finish_crawl(writer)
+        
+        if checkpoint:
+            collected = checkpoint.counts['collected']
+            stored = checkpoint.pending(segment_store)
+        else:
+            tweets = collector.search_tweets(args.keyword, max_results=args.max_results, since_ids=since_ids)
+            collected = len(tweets)
+            stored = enumerate(tweets)
         
-        logger.info(f"Collected {len(tweets)} tweets")
+        logger.info(f"Collected {collected} tweets")
         
         # 更新进度
         db.update_crawl_job_progress(args.task_id, {
-            'collected': len(tweets),
+            'collected': collected,
             'processed': 0,
             'status': 'processing'
         })
         
         # 处理并存储推文
-        processed_count = 0
-        for i, tweet in enumerate(tweets):
+        counts = checkpoint.counts if checkpoint else {}
+        processed_count = counts.get('new', 0) + counts.get('duplicates', 0)
+        duplicate_count = counts.get('duplicates', 0)
+        for seq, tweet in stored:
+            comment_id = analyzed_id = None
             try:
-                # 插入评论
-                comment_id = db.insert_comment(args.task_id, tweet)
+                # 已见过的推文直接跳过，不再访问数据库和NLP服务
+                repair_id = None
+                if dedupe_index.is_duplicate('twitter', tweet['platformId']):
+                    if checkpoint and checkpoint.may_be_partial(seq):
+                        repair_id = db.find_unanalyzed_comment(tweet['platformId'])
+                    if not repair_id:
+                        duplicate_count += 1
+                        processed_count += 1
+                        continue
+                
+                # 规范化一次，聚类和NLP共用
+                tweet['normalizedContent'] = normalize_text(tweet['content'])
                 
-                if comment_id and nlp_client:
+                if repair_id:
+                    # 上次中断前已入库但未分析的推文，只补做分析
+                    comment_id, cached_sentiment = repair_id, None
+                else:
+                    # 转发/模板推文归入同一聚类
+                    tweet['clusterId'], is_canonical = cluster_index.assign(tweet['normalizedContent'])
+                    cached_sentiment = None if is_canonical else cluster_index.get_result(tweet['clusterId'])
+                    
+                    # 插入评论
+                    comment_id = db.insert_comment(args.task_id, tweet)
+                    dedupe_index.add('twitter', tweet['platformId'])
+                
+                if comment_id and cached_sentiment:
+                    # 近似重复直接复用代表推文的分析结果
+                    if db.insert_sentiment_analysis(comment_id, cached_sentiment):
+                        analyzed_id = comment_id
+                    if detector:
+                        detector.observe(args.task_id, tweet.get('publishedAt'), cached_sentiment['sentiment'])
+                elif comment_id and nlp_client:
                     # 进行情感分析
-                    sentiment_result = nlp_client.analyze_sentiment(tweet['content'])
+                    sentiment_result = nlp_client.analyze_sentiment(tweet['normalizedContent'], normalized=True)
                     
                     if sentiment_result:
                         # 提取关键词
-                        keywords_result = nlp_client.extract_keywords(tweet['content'], top_k=5)
+                        keywords_result = nlp_client.extract_keywords(
+                            tweet['normalizedContent'], top_k=5, normalized=True
+                        )
                         keywords = [kw['word'] for kw in keywords_result] if keywords_result else []
                         
                         # 存储情感分析结果
@@ -302,42 +397,64 @@ def main():
                             'sentiment': sentiment_result['sentiment'],
                             'score': sentiment_result['score'],
                             'confidence': sentiment_result['confidence'],
-                            'keywords': keywords
+                            'keywords': keywords,
+                            'aspects': sentiment_result.get('aspects')
                         }
-                        db.insert_sentiment_analysis(comment_id, sentiment_data)
+                        if db.insert_sentiment_analysis(comment_id, sentiment_data):
+                            analyzed_id = comment_id
+                        if detector:
+                            detector.observe(args.task_id, tweet.get('publishedAt'), sentiment_data['sentiment'])
+                        if not repair_id:
+                            cluster_index.set_result(tweet['clusterId'], sentiment_data)
                 
                 processed_count += 1
                 
                 # 每处理10条更新一次进度
-                if (i + 1) % 10 == 0:
+                if processed_count % 10 == 0:
                     db.update_crawl_job_progress(args.task_id, {
-                        'collected': len(tweets),
+                        'collected': collected,
                         'processed': processed_count,
                         'status': 'processing'
                     })
-                    logger.info(f"Processed {processed_count}/{len(tweets)} tweets")
+                    logger.info(f"Processed {processed_count}/{collected} tweets")
                 
             except Exception as e:
-                logger.error(f"Error processing tweet {i}: {e}")
+                logger.error(f"Error processing tweet {seq}: {e}")
                 continue
+            
+            finally:
+                if checkpoint:
+                    counts['new'] = processed_count - duplicate_count
+                    counts['duplicates'] = duplicate_count
+                    checkpoint.processed(seq, comment_id, analyzed_id)
+        
+        if checkpoint:
+            checkpoint.finish()
+        
+        # 推文全部入库后才推进since ID，中途失败时下次重新采集这段时间线
+        since_store.update(args.task_id, collector.newest_ids)
         
         # 更新最终状态
         db.update_crawl_job_progress(args.task_id, {
-            'collected': len(tweets),
+            'collected': collected,
             'processed': processed_count,
             'status': 'completed'
         })
         db.update_task_status(args.task_id, 'completed')
+        dedupe_index.save()
+        if nlp_client:
+            refresh_sentiment_stats(db.connection)
         
-        logger.info(f"Collection completed: {processed_count} tweets processed")
+        logger.info(f"Collection completed: {processed_count} tweets processed, {duplicate_count} duplicates")
         
         # 输出结果JSON供Node.js读取
         result = {
             'success': True,
             'task_id': args.task_id,
             'keyword': args.keyword,
-            'collected': len(tweets),
+            'collected': collected,
             'processed': processed_count,
+            'duplicates': duplicate_count,
             'timestamp': datetime.now().isoformat()
         }
         print(json.dumps(result))
@@ -360,6 +477,8 @@ def main():
         sys.exit(1)
     
     finally:
+        if segment_store:
+            segment_store.close()
         db.close()
 
 
@@ -0,0 +1,286 @@
+"""
+Crawl scheduler for monitoring tasks
+Decides how often and how deep each active (task, platform) is crawled from its recent
+new-item rate, duplicate ratio and the task's priority, keeps every platform within a
+global fetch budget, and enqueues the jobs that are due into crawl_jobs. Platforms
+without a collector are skipped, and a (task, platform) whose jobs keep failing is
+crawled exponentially less often until a job completes again
+"""
+
+import sys
+import os
+import argparse
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from analytics.rollup import connect
+
+from job_queue import PLATFORMS, CrawlJobQueue
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_WEIGHTS = {"low": 0.5, "normal": 1.0, "high": 2.0}
+
+# 每个平台每小时可抓取的条数（API配额/反爬承受能力）
+DEFAULT_BUDGET_PER_HOUR = 500
+
+
+def _seconds(value) -> float:
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+def job_stats(jobs: List[Dict]) -> Dict:
+    """
+    New-item rate and duplicate ratio from a (task, platform)'s recent completed jobs
+
+    The rate counts the items found by each job since the previous one, over the time
+    between their completions; the first job's items are backlog, not rate.
+
+    Args:
+        jobs: Completed jobs ordered by completion time
+
+    Returns:
+        {"new_rate": items/hour or None, "duplicate_ratio": float or None, "last_depth": int or None}
+    """
+    stats = {"new_rate": None, "duplicate_ratio": None, "last_depth": jobs[-1]["maxResults"] if jobs else None}
+    collected = sum(job["totalCollected"] or 0 for job in jobs)
+    new = sum(job["newComments"] or 0 for job in jobs)
+    if collected:
+        stats["duplicate_ratio"] = 1.0 - new / collected
+    if len(jobs) >= 2:
+        span = _seconds(jobs[-1]["completedAt"]) - _seconds(jobs[0]["completedAt"])
+        if span > 0:
+            stats["new_rate"] = sum(job["newComments"] or 0 for job in jobs[1:]) * 3600.0 / span
+    return stats
+
+
+class CrawlScheduler:
+    """按活跃度、重复率和优先级为每个(任务, 平台)分配采集频率和深度"""
+
+    def __init__(
+        self,
+        connection,
+        budgets: Optional[Dict[str, float]] = None,
+        lookback_hours: int = 24,
+        history: int = 10,
+        explore_rate: float = 5.0,
+        min_depth: int = 10,
+        max_depth: int = 200,
+        default_depth: int = 50,
+        min_interval: int = 300,
+        max_interval: int = 6 * 3600,
+        low_duplicates: float = 0.2,
+        high_duplicates: float = 0.6,
+        max_backoff: int = 24 * 3600,
+    ):
+        """
+        Args:
+            connection: pymysql connection (DictCursor)
+            budgets: Items per hour each platform may fetch in total (default DEFAULT_BUDGET_PER_HOUR)
+            lookback_hours: Completed jobs considered for the rate estimates
+            history: At most this many recent jobs per (task, platform)
+            explore_rate: Items/hour added to every rate, so quiet and new tasks are still sampled
+            min_depth: Smallest maxResults per job
+            max_depth: Largest maxResults per job
+            default_depth: Depth of a (task, platform) without history
+            min_interval: Shortest seconds between two crawls of a (task, platform)
+            max_interval: Longest seconds between two crawls (before budget scaling)
+            low_duplicates: Below this duplicate ratio a crawl probably stopped short; depth grows
+            high_duplicates: Above this ratio a crawl mostly refetched known items; depth shrinks
+            max_backoff: Longest seconds between two crawls of a (task, platform) whose jobs keep failing
+        """
+        self.connection = connection
+        self.budgets = budgets or {}
+        self.lookback_hours = lookback_hours
+        self.history = history
+        self.explore_rate = explore_rate
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.default_depth = default_depth
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.low_duplicates = low_duplicates
+        self.high_duplicates = high_duplicates
+        self.max_backoff = max_backoff
+        self._unsupported = set()
+        self.queue = CrawlJobQueue(connection)
+
+    def budget(self, platform: str) -> float:
+        return self.budgets.get(platform, DEFAULT_BUDGET_PER_HOUR)
+
+    def _load(self) -> Tuple[List[Dict], Dict[Tuple[int, str], List[Dict]], Dict[Tuple[int, str], Dict]]:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT id, keyword, platforms, priority FROM monitoring_tasks WHERE status = 'active'")
+            tasks = cursor.fetchall()
+            cursor.execute("""
+            SELECT taskId, platform, totalCollected, newComments, maxResults, completedAt
+            FROM crawl_jobs
+            WHERE status = 'completed' AND completedAt >= NOW() - INTERVAL %s HOUR
+            ORDER BY completedAt
+            """, (self.lookback_hours,))
+            history = defaultdict(list)
+            for job in cursor.fetchall():
+                history[(job['taskId'], job['platform'])].append(job)
+            # failures: 最近一次成功之后失败的作业数
+            cursor.execute("""
+            SELECT j.taskId, j.platform, TIMESTAMPDIFF(SECOND, MAX(j.createdAt), NOW()) AS sinceQueued,
+                   SUM(j.status IN ('pending', 'running')) AS active,
+                   SUM(j.status = 'failed' AND j.id > IFNULL(ok.lastId, 0)) AS failures
+            FROM crawl_jobs j
+            LEFT JOIN (
+                SELECT taskId, platform, MAX(id) AS lastId FROM crawl_jobs
+                WHERE status = 'completed' GROUP BY taskId, platform
+            ) ok ON ok.taskId = j.taskId AND ok.platform = j.platform
+            GROUP BY j.taskId, j.platform
+            """)
+            latest = {(row['taskId'], row['platform']): row for row in cursor.fetchall()}
+        self.connection.commit()
+        return tasks, history, latest
+
+    def next_depth(self, stats: Dict) -> int:
+        """Adjust the previous depth by the duplicate ratio it produced"""
+        depth = stats["last_depth"] or self.default_depth
+        ratio = stats["duplicate_ratio"]
+        if ratio is not None:
+            if ratio < self.low_duplicates:
+                depth *= 1.5
+            elif ratio > self.high_duplicates:
+                depth *= 0.7
+        return int(min(max(depth, self.min_depth), self.max_depth))
+
+    def plan(self) -> List[Dict]:
+        """
+        Crawl plan for every active (task, platform)
+
+        Each platform's hourly budget is split in proportion to
+        priority weight x (new-item rate + explore_rate). A (task, platform) fetches
+        `depth` items every `interval` seconds, i.e. its share of the budget; when the
+        interval bounds push the total over budget, all intervals are stretched. Each
+        failed job since the last completed one doubles the interval, up to max_backoff.
+
+        Returns:
+            Plan entries (task_id, platform, keyword, weight, depth, interval, due, ...)
+        """
+        tasks, history, latest = self._load()
+
+        by_platform: Dict[str, List[Dict]] = defaultdict(list)
+        for task in tasks:
+            platforms = task['platforms']
+            platforms = json.loads(platforms) if isinstance(platforms, str) else platforms
+            priority = PRIORITY_WEIGHTS.get(task.get('priority') or "normal", 1.0)
+            for platform in platforms:
+                if platform not in PLATFORMS:
+                    if platform not in self._unsupported:
+                        self._unsupported.add(platform)
+                        logger.warning(f"No collector for platform {platform}, not scheduling it")
+                    continue
+                stats = job_stats(history.get((task['id'], platform), [])[-self.history:])
+                new_rate = stats["new_rate"] if stats["new_rate"] is not None else 0.0
+                by_platform[platform].append({
+                    "task_id": task['id'],
+                    "platform": platform,
+                    "keyword": task['keyword'],
+                    "priority": task.get('priority') or "normal",
+                    "new_rate": round(new_rate, 2),
+                    "duplicate_ratio": stats["duplicate_ratio"],
+                    "weight": priority * (new_rate + self.explore_rate),
+                    "depth": self.next_depth(stats),
+                })
+
+        plans = []
+        for platform, entries in by_platform.items():
+            budget = self.budget(platform)
+            total_weight = sum(entry["weight"] for entry in entries)
+            for entry in entries:
+                share = budget * entry["weight"] / total_weight
+                entry["interval"] = min(max(entry["depth"] * 3600.0 / share, self.min_interval), self.max_interval)
+
+            # 区间上限让总量超出预算时，等比例拉长所有间隔
+            fetch_rate = sum(entry["depth"] * 3600.0 / entry["interval"] for entry in entries)
+            stretch = max(fetch_rate / budget, 1.0)
+
+            for entry in entries:
+                state = latest.get((entry["task_id"], platform))
+                entry["failures"] = int(state['failures'] or 0) if state else 0
+                interval = entry["interval"] * stretch
+                if entry["failures"]:
+                    interval = max(interval, min(interval * 2 ** entry["failures"], self.max_backoff))
+                entry["interval"] = int(interval)
+                entry["active"] = bool(state and state['active'])
+                entry["due"] = not entry["active"] and (state is None or state['sinceQueued'] >= entry["interval"])
+                plans.append(entry)
+
+        plans.sort(key=lambda entry: entry["weight"], reverse=True)
+        return plans
+
+    def run_once(self) -> List[Dict]:
+        """
+        Enqueue the due jobs, highest weight first
+
+        Returns:
+            The plan entries that were enqueued
+        """
+        due = [entry for entry in self.plan() if entry["due"]]
+        for entry in due:
+            job_id = self.queue.enqueue(entry["task_id"], entry["platform"], entry["keyword"], entry["depth"])
+            logger.info(f"Queued job {job_id}: task {entry['task_id']} {entry['platform']} depth {entry['depth']}, "
+                        f"every {entry['interval']}s (new {entry['new_rate']}/h, weight {entry['weight']:.1f}, "
+                        f"{entry['failures']} recent failures)")
+        return due
+
+
+def parse_budgets(value: Optional[str]) -> Dict[str, float]:
+    """"twitter=600,weibo=300" -> {"twitter": 600.0, "weibo": 300.0}"""
+    budgets = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            platform, _, amount = item.partition("=")
+            budgets[platform.strip()] = float(amount)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule crawl jobs by task activity and priority")
+    parser.add_argument("--budget", default=os.getenv("CRAWL_BUDGETS"),
+                        help="Items per hour per platform, e.g. twitter=600,weibo=300")
+    parser.add_argument("--interval", type=int, default=60,
+                        help="Seconds between scheduling passes (0 = run once)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without enqueuing")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("DATABASE_URL not set")
+        return
+
+    connection = connect(db_url)
+    scheduler = CrawlScheduler(connection, budgets=parse_budgets(args.budget))
+    try:
+        if args.dry_run:
+            print(json.dumps(scheduler.plan(), ensure_ascii=False, indent=2))
+            return
+        while True:
+            due = scheduler.run_once()
+            logger.info(f"Scheduling pass queued {len(due)} jobs")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -0,0 +1,195 @@
+"""
+Event-driven infinite-scroll loader for Playwright pages
+Scrolls until enough unique result nodes are present instead of sleeping for fixed intervals
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# 统计页面上唯一结果节点的数量（优先使用key属性，否则使用文本前缀）
+COUNT_UNIQUE_ITEMS_JS = """
+({selector, keyAttribute}) => {
+    const nodes = document.querySelectorAll(selector);
+    const keys = new Set();
+    nodes.forEach((node) => {
+        let key = null;
+        if (keyAttribute) {
+            key = node.getAttribute(keyAttribute);
+            if (!key) {
+                const child = node.querySelector(`[${keyAttribute}]`);
+                key = child ? child.getAttribute(keyAttribute) : null;
+            }
+        }
+        keys.add(key || (node.textContent || "").trim().slice(0, 200));
+    });
+    return keys.size;
+}
+"""
+
+WAIT_FOR_MORE_ITEMS_JS = """
+({selector, keyAttribute, previous}) => {
+    const count = (%s)({selector, keyAttribute});
+    return count > previous;
+}
+""" % COUNT_UNIQUE_ITEMS_JS.strip()
+
+
+class InfiniteScrollLoader:
+    """等待新结果节点出现的无限滚动驱动器"""
+
+    def __init__(
+        self,
+        page: Page,
+        item_selector: str,
+        key_attribute: Optional[str] = None,
+        initial_timeout: float = 5.0,
+        min_timeout: float = 0.5,
+        max_timeout: float = 8.0,
+        timeout_factor: float = 2.5,
+        max_idle_rounds: int = 2,
+        max_scrolls: int = 50,
+    ):
+        """
+        Initialize scroll loader
+
+        Args:
+            page: Playwright page to scroll
+            item_selector: CSS selector matching one result item
+            key_attribute: Attribute holding a stable item ID (e.g. "mid"), text is used otherwise
+            initial_timeout: Seconds to wait for the first batch and the first scroll
+            min_timeout: Lower bound of the adaptive per-scroll timeout in seconds
+            max_timeout: Upper bound of the adaptive per-scroll timeout in seconds
+            timeout_factor: Multiplier applied to the observed load latency
+            max_idle_rounds: Consecutive scrolls without new items before giving up
+            max_scrolls: Hard cap on the number of scrolls
+        """
+        self.page = page
+        self.item_selector = item_selector
+        self.key_attribute = key_attribute
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.max_idle_rounds = max_idle_rounds
+        self.max_scrolls = max_scrolls
+        self._xhr_responses = 0
+
+    def _on_response(self, response):
+        """Count XHR/fetch responses as a signal that content is still loading"""
+        try:
+            if response.request.resource_type in ("xhr", "fetch"):
+                self._xhr_responses += 1
+        except Exception:
+            pass
+
+    async def count_items(self) -> int:
+        """Count unique result items currently in the DOM"""
+        return await self.page.evaluate(
+            COUNT_UNIQUE_ITEMS_JS,
+            {"selector": self.item_selector, "keyAttribute": self.key_attribute},
+        )
+
+    async def _wait_for_more(self, previous: int, timeout: float) -> bool:
+        """Wait until more than `previous` unique items are present"""
+        try:
+            await self.page.wait_for_function(
+                WAIT_FOR_MORE_ITEMS_JS,
+                arg={
+                    "selector": self.item_selector,
+                    "keyAttribute": self.key_attribute,
+                    "previous": previous,
+                },
+                timeout=timeout * 1000,
+            )
+            return True
+        except Exception:
+            return False
+
+    async def load(self, max_items: int) -> Dict:
+        """
+        Scroll until `max_items` unique items are present or no progress is made
+
+        Args:
+            max_items: Number of unique items wanted
+
+        Returns:
+            Scroll statistics (scrolls, productive scrolls, efficiency, stop reason, ...)
+        """
+        start = time.monotonic()
+        scrolls = 0
+        productive_scrolls = 0
+        idle_rounds = 0
+        timeout = self.initial_timeout
+        stop_reason = "max_scrolls"
+        count = 0
+        initial_count = 0
+
+        self._xhr_responses = 0
+        self.page.on("response", self._on_response)
+
+        try:
+            try:
+                await self.page.wait_for_selector(
+                    self.item_selector, timeout=self.initial_timeout * 1000
+                )
+            except Exception:
+                stop_reason = "no_results"
+            else:
+                count = await self.count_items()
+                initial_count = count
+
+            while stop_reason != "no_results" and scrolls < self.max_scrolls:
+                if count >= max_items:
+                    stop_reason = "target_reached"
+                    break
+
+                xhr_before = self._xhr_responses
+                scroll_start = time.monotonic()
+                await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                scrolls += 1
+
+                grew = await self._wait_for_more(count, timeout)
+                if not grew and self._xhr_responses > xhr_before:
+                    # 有网络请求返回但节点尚未渲染，再给一次最长等待
+                    grew = await self._wait_for_more(count, self.max_timeout)
+
+                if grew:
+                    latency = time.monotonic() - scroll_start
+                    count = await self.count_items()
+                    productive_scrolls += 1
+                    idle_rounds = 0
+                    # 根据观测到的加载延迟自适应调整超时
+                    timeout = min(
+                        self.max_timeout,
+                        max(self.min_timeout, latency * self.timeout_factor),
+                    )
+                else:
+                    idle_rounds += 1
+                    timeout = min(self.max_timeout, timeout * 2)
+                    if idle_rounds >= self.max_idle_rounds:
+                        stop_reason = "no_progress"
+                        break
+
+            if stop_reason == "max_scrolls" and count >= max_items:
+                stop_reason = "target_reached"
+        finally:
+            self.page.remove_listener("response", self._on_response)
+
+        stats = {
+            "items": count,
+            "target": max_items,
+            "scrolls": scrolls,
+            "productive_scrolls": productive_scrolls,
+            "efficiency": round(productive_scrolls / scrolls, 3) if scrolls else 1.0,
+            "items_per_scroll": round((count - initial_count) / scrolls, 2) if scrolls else 0.0,
+            "xhr_responses": self._xhr_responses,
+            "elapsed": round(time.monotonic() - start, 3),
+            "stop_reason": stop_reason,
+        }
+        logger.info(f"Scroll loader finished for {self.item_selector}: {stats}")
+        return stats
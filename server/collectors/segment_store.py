@@ -0,0 +1,338 @@
+"""
+Append-only segment store for raw crawl results
+Collected posts are written to compressed, checksummed blocks in per task/platform
+segment files before any DB or NLP work; later stages (and replays) read them back
+through memory-mapped iteration using a per-segment offset index
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台不做写锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yuqing", "segments")
+
+_MAGIC = b"YQSG"
+_BLOCK = struct.Struct("<4sIIIIQ")  # magic, compressed length, raw length, record count, crc32, first seq
+_INDEX = struct.Struct("<QQI")  # first seq, block offset, record count
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+
+def _encode(record: Dict) -> bytes:
+    # json.dumps会转义换行，块内可以用换行分隔记录
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _segment_names(path: str) -> List[str]:
+    if not os.path.isdir(path):
+        return []
+    return sorted(name[:-len(SEGMENT_SUFFIX)] for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX))
+
+
+def _read_index(index_path: str) -> List[Tuple[int, int, int]]:
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % _INDEX.size
+    return [_INDEX.unpack_from(data, offset) for offset in range(0, usable, _INDEX.size)]
+
+
+def _scan_blocks(data, start: int = 0) -> Tuple[List[Tuple[int, int, int]], int]:
+    """
+    Validate blocks from `start`, stopping at the first torn or corrupt one
+
+    Returns:
+        (index entries of the valid blocks, end offset of the last valid block)
+    """
+    entries = []
+    offset = start
+    while offset + _BLOCK.size <= len(data):
+        magic, clen, _, count, crc, first_seq = _BLOCK.unpack_from(data, offset)
+        end = offset + _BLOCK.size + clen
+        if magic != _MAGIC or end > len(data) or zlib.crc32(data[offset + _BLOCK.size:end]) != crc:
+            break
+        entries.append((first_seq, offset, count))
+        offset = end
+    return entries, offset
+
+
+class SegmentWriter:
+    """单个(任务, 平台)数据流的追加写入器"""
+
+    def __init__(
+        self,
+        path: str,
+        block_bytes: int = 256 * 1024,
+        segment_bytes: int = 64 * 1024 * 1024,
+        compression_level: int = 6,
+    ):
+        """
+        Open a stream for appending, repairing a torn tail left by a crash
+
+        Args:
+            path: Stream directory
+            block_bytes: Uncompressed bytes buffered before a block is compressed and written
+            segment_bytes: Size at which a new segment file is started
+            compression_level: zlib level
+        """
+        self.path = path
+        self.block_bytes = block_bytes
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        os.makedirs(path, exist_ok=True)
+
+        self._lock_file = open(os.path.join(path, ".lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(f"Segment stream {path} is being written by another process")
+
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._segment = None
+        self._index = None
+        self._tail: Optional[str] = None
+        self.next_seq = self._recover()
+
+    def _recover(self) -> int:
+        """Bring the last segment's index in line with its valid blocks; return the next seq"""
+        names = _segment_names(self.path)
+        if not names:
+            return 0
+
+        name = names[-1]
+        segment_path = os.path.join(self.path, name + SEGMENT_SUFFIX)
+        index_path = os.path.join(self.path, name + INDEX_SUFFIX)
+        with open(segment_path, "rb") as f:
+            data = f.read()
+
+        self._tail = name
+        entries, end = _scan_blocks(data)
+        if end < len(data):
+            logger.warning(f"Truncating torn tail of {segment_path} ({len(data) - end} bytes)")
+            with open(segment_path, "r+b") as f:
+                f.truncate(end)
+        if entries != _read_index(index_path):
+            with open(index_path, "wb") as f:
+                f.write(b"".join(_INDEX.pack(*entry) for entry in entries))
+
+        if entries:
+            first_seq, _, count = entries[-1]
+            return first_seq + count
+        return int(name)
+
+    def _open_segment(self):
+        # 上次会话的最后一个段未写满时继续追加，避免每次采集产生一个小文件
+        name = self._tail
+        self._tail = None
+        if name is None or os.path.getsize(os.path.join(self.path, name + SEGMENT_SUFFIX)) >= self.segment_bytes:
+            name = f"{self.next_seq:016d}"
+        self._segment = open(os.path.join(self.path, name + SEGMENT_SUFFIX), "ab")
+        self._index = open(os.path.join(self.path, name + INDEX_SUFFIX), "ab")
+
+    def append(self, record: Dict) -> int:
+        """
+        Buffer one record
+
+        Returns:
+            Sequence number of the record within the stream
+        """
+        data = _encode(record)
+        self._buffer.append(data)
+        self._buffered_bytes += len(data) + 1
+        seq = self.next_seq + len(self._buffer) - 1
+        if self._buffered_bytes >= self.block_bytes:
+            self.flush(sync=False)
+        return seq
+
+    def append_many(self, records: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Append records and make them durable
+
+        Returns:
+            (first seq, number of records)
+        """
+        first = self.next_seq + len(self._buffer)
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        self.flush()
+        return first, count
+
+    def flush(self, sync: bool = True):
+        """Compress buffered records into one block; with `sync`, fsync segment and index"""
+        if self._buffer:
+            if self._segment is None or self._segment.tell() >= self.segment_bytes:
+                self._close_segment()
+                self._open_segment()
+
+            raw = b"\n".join(self._buffer)
+            payload = zlib.compress(raw, self.compression_level)
+            count = len(self._buffer)
+            offset = self._segment.tell()
+            # 先写数据块再写索引：崩溃时索引最多落后，恢复时从数据块重建
+            self._segment.write(_BLOCK.pack(_MAGIC, len(payload), len(raw), count, zlib.crc32(payload), self.next_seq))
+            self._segment.write(payload)
+            self._segment.flush()
+            self._index.write(_INDEX.pack(self.next_seq, offset, count))
+            self._index.flush()
+
+            self.next_seq += count
+            self._buffer = []
+            self._buffered_bytes = 0
+
+        if sync and self._segment is not None:
+            os.fsync(self._segment.fileno())
+            os.fsync(self._index.fileno())
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+    def close(self):
+        self.flush()
+        self._close_segment()
+        self._lock_file.close()
+
+
+class SegmentReader:
+    """按偏移索引和内存映射顺序读取一个数据流"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.segments = _segment_names(path)
+        self._starts = [int(name) for name in self.segments]
+
+    def __len__(self) -> int:
+        total = 0
+        for name in self.segments:
+            for _, _, count in _read_index(os.path.join(self.path, name + INDEX_SUFFIX)):
+                total += count
+        return total
+
+    def read(self, start_seq: int = 0, end_seq: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Iterate records as (seq, record) from `start_seq` up to `end_seq` (exclusive)
+
+        Only the blocks overlapping the range are decompressed.
+        """
+        first_segment = max(bisect.bisect_right(self._starts, start_seq) - 1, 0)
+        for name in self.segments[first_segment:]:
+            if end_seq is not None and int(name) >= end_seq:
+                return
+            segment_path = os.path.join(self.path, name + SEGMENT_SUFFIX)
+            entries = _read_index(os.path.join(self.path, name + INDEX_SUFFIX))
+            if not entries or os.path.getsize(segment_path) == 0:
+                continue
+
+            with open(segment_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                position = max(bisect.bisect_right([e[0] for e in entries], start_seq) - 1, 0)
+                for first_seq, offset, count in entries[position:]:
+                    if end_seq is not None and first_seq >= end_seq:
+                        return
+                    if first_seq + count <= start_seq:
+                        continue
+                    if offset + _BLOCK.size > len(data):
+                        break
+                    magic, clen, _, _, crc, _ = _BLOCK.unpack_from(data, offset)
+                    payload = data[offset + _BLOCK.size:offset + _BLOCK.size + clen]
+                    if magic != _MAGIC or len(payload) != clen or zlib.crc32(payload) != crc:
+                        logger.error(f"Corrupt block at {segment_path}:{offset}, skipping rest of segment")
+                        break
+                    for i, line in enumerate(zlib.decompress(payload).split(b"\n")):
+                        seq = first_seq + i
+                        if seq < start_seq:
+                            continue
+                        if end_seq is not None and seq >= end_seq:
+                            return
+                        yield seq, json.loads(line)
+
+    __iter__ = read
+
+
+class SegmentStore:
+    """按任务和平台组织的原始采集结果存储"""
+
+    def __init__(self, root: Optional[str] = None, **writer_options):
+        """
+        Args:
+            root: Store directory (default: CRAWL_STORE_DIR or ~/.cache/yuqing/segments)
+            writer_options: Passed to SegmentWriter (block_bytes, segment_bytes, compression_level)
+        """
+        self.root = root or os.getenv("CRAWL_STORE_DIR", DEFAULT_STORE_DIR)
+        self.writer_options = writer_options
+        self._writers: Dict[Tuple[int, str], SegmentWriter] = {}
+
+    def stream_path(self, task_id: int, platform: str) -> str:
+        return os.path.join(self.root, str(task_id), platform)
+
+    def writer(self, task_id: int, platform: str) -> SegmentWriter:
+        key = (task_id, platform)
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = self._writers[key] = SegmentWriter(self.stream_path(task_id, platform), **self.writer_options)
+        return writer
+
+    def append(self, task_id: int, platform: str, posts: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Durably append a crawl's posts
+
+        Returns:
+            (first seq, number of posts)
+        """
+        return self.writer(task_id, platform).append_many(posts)
+
+    def read(self, task_id: int, platform: str, start_seq: int = 0,
+             end_seq: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+        # 同进程内的未落盘记录先写出，保证读到全部已追加的数据
+        writer = self._writers.get((task_id, platform))
+        if writer is not None:
+            writer.flush(sync=False)
+        return SegmentReader(self.stream_path(task_id, platform)).read(start_seq, end_seq)
+
+    def posts(self, task_id: int, platform: str, start_seq: int = 0,
+              end_seq: Optional[int] = None) -> Iterator[Dict]:
+        return (post for _, post in self.read(task_id, platform, start_seq, end_seq))
+
+    def streams(self, task_id: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Existing (task id, platform) streams"""
+        if not os.path.isdir(self.root):
+            return []
+        tasks = [str(task_id)] if task_id is not None else sorted(os.listdir(self.root))
+        result = []
+        for task in tasks:
+            task_dir = os.path.join(self.root, task)
+            if not task.isdigit() or not os.path.isdir(task_dir):
+                continue
+            result.extend((int(task), platform) for platform in sorted(os.listdir(task_dir)))
+        return result
+
+    def release(self, task_id: int, platform: str):
+        """Flush and close a stream's writer, dropping its lock so other processes can append"""
+        writer = self._writers.pop((task_id, platform), None)
+        if writer is not None:
+            writer.close()
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the Manus data_api ApiClient
+Serves canned Reddit/YouTube responses so collectors can run in tests and offline
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+Response = Union[Dict, Callable[[Dict], Dict]]
+
+
+def _reddit_posts(query: Dict) -> Dict:
+    subreddit = query.get('subreddit', 'all')
+    limit = int(query.get('limit', 10))
+    return {
+        'success': True,
+        'posts': [
+            {
+                'data': {
+                    'id': f'{subreddit}_{i}',
+                    'author': f'user_{i}',
+                    'title': f'Post {i} in r/{subreddit} about AI',
+                    'selftext': f'Discussion {i} about AI and Python',
+                    'permalink': f'/r/{subreddit}/comments/{subreddit}_{i}',
+                    'created_utc': 1700000000 + i,
+                    'ups': i * 10,
+                    'num_comments': i,
+                    'subreddit': subreddit,
+                }
+            }
+            for i in range(limit)
+        ],
+    }
+
+
+def _youtube_videos(query: Dict) -> Dict:
+    source = query.get('q') or query.get('id', 'channel')
+    return {
+        'contents': [
+            {
+                'type': 'video',
+                'video': {
+                    'videoId': f'{source}_{i}',
+                    'channelTitle': f'channel_{source}',
+                    'channelId': str(source),
+                    'title': f'Video {i} about {source}',
+                    'descriptionSnippet': f'Description {i}',
+                    'publishedTimeText': f'{i} days ago',
+                    'viewCountText': f'{i}K views',
+                    'lengthText': '10:00',
+                    'lengthSeconds': 600,
+                    'stats': {'views': i * 1000},
+                },
+            }
+            for i in range(20)
+        ],
+    }
+
+
+DEFAULT_RESPONSES: Dict[str, Response] = {
+    'Reddit/AccessAPI': _reddit_posts,
+    'Youtube/search': _youtube_videos,
+    'Youtube/get_channel_videos': _youtube_videos,
+}
+
+
+class StubApiClient:
+    """模拟ApiClient，返回固定数据并记录调用"""
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, Response]] = None,
+        latency: float = 0.0,
+    ):
+        """
+        Initialize stub client
+
+        Args:
+            responses: Endpoint -> response dict or callable(query) -> dict
+            latency: Seconds to sleep per call, to simulate network time
+        """
+        self.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self.latency = latency
+        self.calls: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def call_api(self, endpoint: str, query: Optional[Dict] = None) -> Optional[Dict]:
+        """Return the canned response for an endpoint"""
+        query = query or {}
+        with self._lock:
+            self.calls.append({'endpoint': endpoint, 'query': dict(query)})
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = self.responses.get(endpoint)
+        if response is None:
+            return None
+        return response(query) if callable(response) else response
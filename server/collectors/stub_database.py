@@ -0,0 +1,151 @@
+"""
+Local stand-in for the collectors' MySQL DatabaseManager
+Backed by SQLite (in memory by default) with the same methods and the comments /
+sentiment_analysis / crawl_jobs columns they touch, so the ingest pipeline can be
+benchmarked and exercised without a MySQL server
+"""
+
+import json
+import logging
+import sqlite3
+from typing import Dict, Optional
+
+from lexicon_engine import aspects_json
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taskId INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    platformId TEXT NOT NULL UNIQUE,
+    author TEXT,
+    authorId TEXT,
+    content TEXT NOT NULL,
+    url TEXT,
+    publishedAt TEXT,
+    likes INTEGER DEFAULT 0,
+    replies INTEGER DEFAULT 0,
+    shares INTEGER DEFAULT 0,
+    clusterId TEXT,
+    collectedAt TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS sentiment_analysis (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commentId INTEGER NOT NULL UNIQUE,
+    sentiment TEXT NOT NULL,
+    score REAL NOT NULL,
+    confidence REAL NOT NULL,
+    keywords TEXT,
+    aspectScores TEXT,
+    analyzedAt TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taskId INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    status TEXT NOT NULL,
+    totalCollected INTEGER DEFAULT 0,
+    newComments INTEGER DEFAULT 0,
+    duplicates INTEGER DEFAULT 0,
+    errorMessage TEXT,
+    completedAt TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class StubDatabaseManager:
+    """SQLite版数据库管理器（基准测试和离线运行用）"""
+
+    def __init__(self, path: str = ":memory:", commit_every: int = 1):
+        """
+        Args:
+            path: SQLite database file
+            commit_every: Commit after this many writes (1 matches the per-row commits
+                of the MySQL manager)
+        """
+        # 采集流程在线程中执行数据库调用（asyncio.to_thread），连接不绑定创建线程
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+        self.commit_every = commit_every
+        self._writes = 0
+
+    def _written(self):
+        self._writes += 1
+        if self._writes >= self.commit_every:
+            self.connection.commit()
+            self._writes = 0
+
+    def comment_exists(self, platform_id: str) -> bool:
+        cursor = self.connection.execute("SELECT 1 FROM comments WHERE platformId = ? LIMIT 1", (platform_id,))
+        return cursor.fetchone() is not None
+
+    def insert_comment(self, task_id: int, comment_data: Dict) -> Optional[int]:
+        """插入评论数据"""
+        try:
+            cursor = self.connection.execute("""
+            INSERT INTO comments (
+                taskId, platform, platformId, author, authorId,
+                content, url, publishedAt, likes, replies, shares, clusterId
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                task_id,
+                comment_data.get('platform'),
+                comment_data.get('platformId'),
+                comment_data.get('author'),
+                comment_data.get('authorId'),
+                comment_data.get('content'),
+                comment_data.get('url'),
+                comment_data.get('publishedAt'),
+                comment_data.get('likes', 0),
+                comment_data.get('replies', 0),
+                comment_data.get('shares', 0),
+                comment_data.get('clusterId'),
+            ))
+            self._written()
+            return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+    def find_unanalyzed_comment(self, platform_id: str) -> Optional[int]:
+        cursor = self.connection.execute("""
+        SELECT c.id FROM comments c
+        LEFT JOIN sentiment_analysis sa ON sa.commentId = c.id
+        WHERE c.platformId = ? AND sa.id IS NULL
+        """, (platform_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def insert_sentiment_analysis(self, comment_id: int, sentiment_data: Dict) -> bool:
+        """插入情感分析结果"""
+        try:
+            self.connection.execute("""
+            INSERT INTO sentiment_analysis (commentId, sentiment, score, confidence, keywords, aspectScores)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                comment_id,
+                sentiment_data.get('sentiment'),
+                sentiment_data.get('score'),
+                sentiment_data.get('confidence'),
+                json.dumps(sentiment_data.get('keywords', []), ensure_ascii=False),
+                aspects_json(sentiment_data.get('aspects')),
+            ))
+            self._written()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_crawl_job(self, task_id: int, platform: str, status: str,
+                         total_collected: int, new_comments: int, error_msg: str = None,
+                         duplicates: int = 0, job: Optional[Dict] = None) -> bool:
+        self.connection.execute("""
+        INSERT INTO crawl_jobs (taskId, platform, status, totalCollected, newComments, duplicates, errorMessage)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (task_id, platform, status, total_collected, new_comments, duplicates, error_msg))
+        self.connection.commit()
+        return True
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
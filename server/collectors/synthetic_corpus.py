@@ -0,0 +1,397 @@
+"""
+Vectorized synthetic corpus generator
+Produces millions of mock posts as columnar NumPy batches (or post dicts) from a
+seeded RNG: Zipf-distributed authors and keywords, a controllable sentiment mix,
+log-normal content lengths, Poisson arrival times, popularity-scaled engagement,
+reposts and re-delivered duplicates. Batches can be written straight to the segment
+store or to Parquet; this is the data source for load tests and benchmarks
+"""
+
+import sys
+import os
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_data_generator import MockDataGenerator
+
+logger = logging.getLogger(__name__)
+
+SENTIMENTS = ("positive", "neutral", "negative")
+
+# 平台的互动量级（点赞中位数）
+PLATFORM_ENGAGEMENT = {"twitter": 50.0, "weibo": 200.0, "zhihu": 500.0}
+
+
+def zipf_sampler(n: int, exponent: float):
+    """
+    Sampler of ranks 0..n-1 with P(rank k) proportional to (k + 1) ** -exponent
+
+    Bounded, unlike numpy's Generator.zipf; sampling is a searchsorted on the CDF.
+    """
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+
+    def sample(rng: np.random.Generator, size: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), n - 1)
+    return sample
+
+
+def _earlier_rows(rng: np.random.Generator, rows: np.ndarray, pool: np.ndarray) -> np.ndarray:
+    """For each row, a random member of `pool` (sorted row numbers) that precedes it, or -1"""
+    if not len(pool):
+        return np.full(len(rows), -1, dtype=np.int64)
+    before = np.searchsorted(pool, rows)
+    pick = np.floor(rng.random(len(rows)) * before).astype(np.int64)
+    return np.where(before > 0, pool[np.minimum(pick, len(pool) - 1)], -1)
+
+
+class SyntheticCorpus:
+    """基于NumPy向量化生成的大规模合成语料"""
+
+    def __init__(
+        self,
+        keywords: Sequence[str] = ("人工智能",),
+        platforms: Sequence[str] = ("twitter", "weibo", "zhihu"),
+        platform_weights: Optional[Sequence[float]] = None,
+        num_authors: int = 100000,
+        author_exponent: float = 1.1,
+        keyword_exponent: float = 1.0,
+        sentiment_mix: Sequence[float] = (0.5, 0.3, 0.2),
+        repost_rate: float = 0.1,
+        duplicate_rate: float = 0.0,
+        length_mean: float = 60,
+        length_sigma: float = 0.6,
+        posts_per_hour: float = 1000,
+        start: Optional[datetime] = None,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            keywords: Keywords inserted into the templates, Zipf-distributed in this order
+            platforms: Platforms posts are spread over
+            platform_weights: Relative volume per platform (default: equal)
+            num_authors: Distinct authors; activity is Zipf-distributed over them
+            author_exponent: Zipf exponent of author activity (and of their engagement)
+            keyword_exponent: Zipf exponent of keyword frequency
+            sentiment_mix: Shares of positive, neutral and negative originals
+            repost_rate: Share of reposts quoting an earlier original (near-duplicates)
+            duplicate_rate: Share of rows re-delivering an earlier post with its platformId
+            length_mean: Mean content length in characters (log-normal)
+            length_sigma: Spread of the log-normal length distribution
+            posts_per_hour: Mean arrival rate; publish times form a Poisson process
+            start: Publish time of the first post (default: so the corpus ends around now)
+            seed: RNG seed; equal settings, start and seed give identical corpora
+        """
+        if len(sentiment_mix) != len(SENTIMENTS):
+            raise ValueError("sentiment_mix needs positive, neutral and negative shares")
+        self.keywords = list(keywords)
+        self.platforms = list(platforms)
+        weights = np.asarray(platform_weights or [1.0] * len(self.platforms), dtype=np.float64)
+        self.platform_p = weights / weights.sum()
+        mix = np.asarray(sentiment_mix, dtype=np.float64)
+        self.sentiment_p = mix / mix.sum()
+        self.num_authors = num_authors
+        self.author_exponent = author_exponent
+        self.repost_rate = repost_rate
+        self.duplicate_rate = duplicate_rate
+        self.length_mu = np.log(length_mean) - length_sigma ** 2 / 2
+        self.length_sigma = length_sigma
+        self.posts_per_hour = posts_per_hour
+        self.start = start
+        self.seed = seed
+
+        self._authors = zipf_sampler(num_authors, author_exponent)
+        self._keywords = zipf_sampler(len(self.keywords), keyword_exponent)
+
+        # 模板按(情感, 关键词)预先格式化；填充句拼成一条长文本，按句子边界切片
+        vocabulary = MockDataGenerator()
+        groups = (vocabulary.positive_templates, vocabulary.neutral_templates, vocabulary.negative_templates)
+        self._templates = [
+            [[template.format(keyword=keyword) for template in group] for keyword in self.keywords]
+            for group in groups
+        ]
+        self._template_counts = np.array([len(group) for group in groups])
+        filler_rng = np.random.default_rng(seed)
+        sentences = vocabulary.filler_sentences
+        order = filler_rng.integers(0, len(sentences), 20000)
+        self._filler = "".join(sentences[i] for i in order)
+        self._filler_bounds = np.concatenate(([0], np.cumsum([len(sentences[i]) for i in order])))
+
+    def _fillers(self, rng: np.random.Generator, needed: np.ndarray) -> List[str]:
+        """Whole filler sentences, at least `needed` characters per row"""
+        last_start = len(self._filler_bounds) - 1
+        starts = rng.integers(0, last_start // 2, len(needed))
+        begin = self._filler_bounds[starts]
+        end_index = np.searchsorted(self._filler_bounds, begin + needed, side="left")
+        end = self._filler_bounds[np.minimum(end_index, last_start)]
+        filler = self._filler
+        return [filler[b:e] if e > b else "" for b, e in zip(begin.tolist(), end.tolist())]
+
+    def iter_columns(self, count: int, batch_size: int = 100000) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Stream the corpus as columnar batches
+
+        Columns: id, platformId, platform (+ platformIndex), author, authorId, content,
+        sentiment (label of the original, + sentimentIndex), isRepost,
+        publishedAt (datetime64[s]), likes, replies, shares.
+        Reposts and duplicates refer to earlier rows of the same batch.
+        """
+        rng = np.random.default_rng(self.seed)
+        platforms = np.array(self.platforms, dtype=object)
+        engagement = np.array([PLATFORM_ENGAGEMENT.get(p, 100.0) for p in self.platforms])
+        start = self.start
+        if start is None:
+            start = datetime.now() - timedelta(hours=count / self.posts_per_hour)
+        clock = np.datetime64(start.replace(microsecond=0), "s").astype(np.int64)
+
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            rows = np.arange(size)
+            ids = offset + rows
+
+            platform = rng.choice(len(self.platforms), size, p=self.platform_p)
+            author = self._authors(rng, size)
+            keyword = self._keywords(rng, size)
+            sentiment = rng.choice(len(SENTIMENTS), size, p=self.sentiment_p)
+            template = (rng.random(size) * self._template_counts[sentiment]).astype(np.int64)
+
+            # 泊松到达：指数间隔累加
+            gaps = rng.exponential(3600.0 / self.posts_per_hour, size)
+            published = clock + np.cumsum(gaps).astype(np.int64)
+            clock = int(published[-1])
+
+            # 作者越靠前（越活跃）互动越高
+            scale = engagement[platform] * (author + 1.0) ** (-self.author_exponent / 2) * 10
+            likes = rng.poisson(scale * rng.lognormal(0.0, 1.0, size))
+            replies = rng.binomial(likes, 0.1)
+            shares = np.where(platforms[platform] == "zhihu", 0, rng.binomial(likes, 0.05))
+
+            heads = [self._templates[s][k][t] for s, k, t in zip(sentiment.tolist(), keyword.tolist(), template.tolist())]
+            target = rng.lognormal(self.length_mu, self.length_sigma, size)
+            needed = np.maximum(target - np.fromiter(map(len, heads), np.int64, size), 0).astype(np.int64)
+            content = np.array([h + f for h, f in zip(heads, self._fillers(rng, needed))], dtype=object)
+
+            author_names = np.char.add("用户", author.astype(str)).astype(object)
+            author_ids = np.char.add(np.char.add(platforms[platform].astype(str), "_"), author.astype(str)).astype(object)
+            platform_ids = np.char.add(
+                np.char.add(platforms[platform].astype(str), f"_synth_{self.seed}_"), ids.astype(str)
+            ).astype(object)
+            is_repost = np.zeros(size, dtype=bool)
+
+            roll = rng.random(size)
+            repost = roll < self.repost_rate
+            duplicate = (roll >= self.repost_rate) & (roll < self.repost_rate + self.duplicate_rate)
+            originals = np.flatnonzero(~repost & ~duplicate)
+
+            # 转发：引用本批次中更早的原创内容（平台跟随原帖），获得新的platformId
+            repost_rows = np.flatnonzero(repost)
+            sources = _earlier_rows(rng, repost_rows, originals)
+            valid = sources >= 0
+            repost_rows, sources = repost_rows[valid], sources[valid]
+            content[repost_rows] = [
+                f"转发 //@{a}: {c}" for a, c in zip(author_names[sources], content[sources])
+            ]
+            platform[repost_rows] = platform[sources]
+            sentiment[repost_rows] = sentiment[sources]
+            is_repost[repost_rows] = True
+            platform_ids[repost_rows] = np.char.add(
+                np.char.add(platforms[platform[repost_rows]].astype(str), f"_synth_{self.seed}_"),
+                ids[repost_rows].astype(str)
+            ).astype(object)
+            author_ids[repost_rows] = np.char.add(
+                np.char.add(platforms[platform[repost_rows]].astype(str), "_"), author[repost_rows].astype(str)
+            ).astype(object)
+
+            # 重复投递：整行复制更早的条目（同一platformId）
+            duplicate_rows = np.flatnonzero(duplicate)
+            sources = _earlier_rows(rng, duplicate_rows, originals)
+            valid = sources >= 0
+            duplicate_rows, sources = duplicate_rows[valid], sources[valid]
+            for column in (platform, sentiment, content, author_names, author_ids, platform_ids,
+                           published, likes, replies, shares):
+                column[duplicate_rows] = column[sources]
+
+            yield {
+                "id": ids,
+                "platformId": platform_ids,
+                "platform": platforms[platform],
+                "platformIndex": platform,
+                "author": author_names,
+                "authorId": author_ids,
+                "content": content,
+                "sentiment": np.array(SENTIMENTS, dtype=object)[sentiment],
+                "sentimentIndex": sentiment,
+                "isRepost": is_repost,
+                "publishedAt": published.astype("datetime64[s]"),
+                "likes": likes,
+                "replies": replies,
+                "shares": shares,
+            }
+
+    def iter_posts(self, count: int, batch_size: int = 100000) -> Iterator[Dict]:
+        """Stream the corpus as post dicts shaped like the collectors' output"""
+        for batch in self.iter_columns(count, batch_size):
+            published = np.datetime_as_string(batch["publishedAt"]).tolist()
+            columns = zip(
+                batch["id"].tolist(), batch["platformId"], batch["platform"], batch["author"],
+                batch["authorId"], batch["content"], published,
+                batch["likes"].tolist(), batch["replies"].tolist(), batch["shares"].tolist(),
+            )
+            for row_id, platform_id, platform, author, author_id, content, published_at, likes, replies, shares in columns:
+                yield {
+                    "platformId": platform_id,
+                    "platform": platform,
+                    "author": author,
+                    "authorId": author_id,
+                    "content": content,
+                    "url": f"https://example.com/{platform}/{row_id}",
+                    "publishedAt": published_at,
+                    "likes": likes,
+                    "replies": replies,
+                    "shares": shares,
+                }
+
+    def write_segments(self, store, task_id: int, count: int, batch_size: int = 100000) -> Dict[str, int]:
+        """
+        Append the corpus to a SegmentStore, one stream per platform
+
+        Returns:
+            Posts written per platform
+        """
+        written: Dict[str, int] = {}
+        batch: Dict[str, List[Dict]] = {}
+        for i, post in enumerate(self.iter_posts(count, batch_size), 1):
+            batch.setdefault(post["platform"], []).append(post)
+            if i % batch_size == 0 or i == count:
+                for platform, posts in batch.items():
+                    store.append(task_id, platform, posts)
+                    written[platform] = written.get(platform, 0) + len(posts)
+                batch = {}
+        return written
+
+    def write_parquet(self, path: str, count: int, batch_size: int = 100000, compression: str = "zstd") -> int:
+        """
+        Write the corpus to a Parquet file, one row group per batch
+
+        Returns:
+            Rows written
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("id", pa.int64()),
+            ("platformId", pa.string()),
+            ("platform", pa.dictionary(pa.int32(), pa.string())),
+            ("author", pa.string()),
+            ("authorId", pa.string()),
+            ("content", pa.string()),
+            ("sentiment", pa.dictionary(pa.int8(), pa.string())),
+            ("isRepost", pa.bool_()),
+            ("publishedAt", pa.timestamp("s")),
+            ("likes", pa.int64()),
+            ("replies", pa.int64()),
+            ("shares", pa.int64()),
+        ])
+        platform_dictionary = pa.array(self.platforms, pa.string())
+        sentiment_dictionary = pa.array(SENTIMENTS, pa.string())
+
+        tmp_path = f"{path}.tmp"
+        rows = 0
+        writer = pq.ParquetWriter(tmp_path, schema, compression=compression)
+        try:
+            for batch in self.iter_columns(count, batch_size):
+                arrays = []
+                for field in schema:
+                    values = batch[field.name]
+                    if field.name == "platform":
+                        indices = pa.array(batch["platformIndex"].astype(np.int32))
+                        arrays.append(pa.DictionaryArray.from_arrays(indices, platform_dictionary))
+                    elif field.name == "sentiment":
+                        indices = pa.array(batch["sentimentIndex"].astype(np.int8))
+                        arrays.append(pa.DictionaryArray.from_arrays(indices, sentiment_dictionary))
+                    else:
+                        arrays.append(pa.array(values, field.type))
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += len(batch["id"])
+            writer.close()
+            os.replace(tmp_path, path)
+        except BaseException:
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus into Parquet or the segment store")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--keywords", default="人工智能", help="Comma-separated, most frequent first")
+    parser.add_argument("--platforms", default="twitter,weibo,zhihu")
+    parser.add_argument("--authors", type=int, default=100000)
+    parser.add_argument("--author-exponent", type=float, default=1.1)
+    parser.add_argument("--keyword-exponent", type=float, default=1.0)
+    parser.add_argument("--sentiment-mix", default="0.5,0.3,0.2", help="Positive,neutral,negative shares")
+    parser.add_argument("--repost-rate", type=float, default=0.1)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--length-mean", type=float, default=60)
+    parser.add_argument("--length-sigma", type=float, default=0.6)
+    parser.add_argument("--posts-per-hour", type=float, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--parquet", help="Write the corpus to this Parquet file")
+    output.add_argument("--segments", help="Append the corpus to the segment store under this directory")
+    parser.add_argument("--task-id", type=int, default=1, help="Task the segment streams belong to")
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(
+        keywords=[k.strip() for k in args.keywords.split(",")],
+        platforms=[p.strip() for p in args.platforms.split(",")],
+        num_authors=args.authors,
+        author_exponent=args.author_exponent,
+        keyword_exponent=args.keyword_exponent,
+        sentiment_mix=[float(share) for share in args.sentiment_mix.split(",")],
+        repost_rate=args.repost_rate,
+        duplicate_rate=args.duplicate_rate,
+        length_mean=args.length_mean,
+        length_sigma=args.length_sigma,
+        posts_per_hour=args.posts_per_hour,
+        seed=args.seed,
+    )
+
+    started = time.perf_counter()
+    if args.parquet:
+        rows = corpus.write_parquet(args.parquet, args.count, args.batch_size)
+        written = {"rows": rows}
+    else:
+        from segment_store import SegmentStore
+        store = SegmentStore(root=args.segments)
+        try:
+            written = corpus.write_segments(store, args.task_id, args.count, args.batch_size)
+        finally:
+            store.close()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "written": written,
+        "seconds": round(elapsed, 3),
+        "posts_per_sec": round(args.count / elapsed, 1) if elapsed else None,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
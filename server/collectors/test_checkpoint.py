@@ -0,0 +1,73 @@
+"""
+Crash-and-resume tests for JobCheckpoint on top of the segment store
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from checkpoint import JobCheckpoint, run_key
+from segment_store import SegmentStore
+
+
+def _posts(start, count):
+    return [{"platformId": f"twitter_{i}", "platform": "twitter", "content": f"post {i}"}
+            for i in range(start, start + count)]
+
+
+def _complete_run(store, root, key):
+    checkpoint = JobCheckpoint.begin(1, "twitter", key, root=root)
+    checkpoint.finish_crawl(store.writer(1, "twitter"), _posts(0, 5))
+    for seq, _ in checkpoint.pending(store):
+        checkpoint.processed(seq)
+    checkpoint.finish()
+
+
+def test_resume_after_partial_crawl_ignores_earlier_finished_run(tmp_path):
+    store = SegmentStore(root=str(tmp_path / "segments"))
+    root = str(tmp_path / "checkpoints")
+    key = run_key(keyword="人工智能")
+    _complete_run(store, root, key)
+
+    # 第二次运行抓了一页后崩溃
+    checkpoint = JobCheckpoint.begin(1, "twitter", key, root=root)
+    on_page = checkpoint.page_recorder(store.writer(1, "twitter"))
+    on_page("search", _posts(5, 3), "token-2")
+    del checkpoint
+
+    resumed = JobCheckpoint.load(1, "twitter", key, root=root)
+    assert resumed.status == "crawling"
+    assert not resumed.crawl_done
+    assert resumed.state["cursor"] == {"search": "token-2"}
+    assert resumed.counts["collected"] == 3
+    assert [post["platformId"] for _, post in resumed.pending(store)] == \
+        ["twitter_5", "twitter_6", "twitter_7"]
+    store.close()
+
+
+def test_crash_before_first_page_resumes_with_fresh_crawl(tmp_path):
+    store = SegmentStore(root=str(tmp_path / "segments"))
+    root = str(tmp_path / "checkpoints")
+    key = run_key(keyword="人工智能")
+    _complete_run(store, root, key)
+
+    # 浏览器平台在finish_crawl之前不写页面；开始时的检查点覆盖上一次的完成状态
+    JobCheckpoint.begin(1, "twitter", key, root=root)
+
+    resumed = JobCheckpoint.load(1, "twitter", key, root=root)
+    assert not resumed.crawl_done
+    assert resumed.state["first_seq"] is None
+    assert list(resumed.pending(store)) == []
+    store.close()
+
+
+def test_jobs_do_not_share_checkpoints(tmp_path):
+    store = SegmentStore(root=str(tmp_path / "segments"))
+    root = str(tmp_path / "checkpoints")
+    _complete_run(store, root, run_key(job_id=7))
+
+    retry = JobCheckpoint.load(1, "twitter", run_key(job_id=8), root=root)
+    assert retry.status == "crawling"
+    assert run_key(keyword="a") != run_key(keyword="b")
+    store.close()
@@ -0,0 +1,68 @@
+"""
+Bloom filter dedupe index tests: scaling, exact confirmation and persistence
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dedupe_index import BloomFilter, PlatformIdIndex
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    ids = [f"weibo_{i}" for i in range(1000)]
+    for platform_id in ids:
+        bloom.add(platform_id)
+
+    assert all(platform_id in bloom for platform_id in ids)
+    false_positives = sum(f"zhihu_{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_index_adds_filters_as_they_fill_and_keeps_platforms_apart(tmp_path):
+    index = PlatformIdIndex(path=str(tmp_path), initial_capacity=10)
+    for i in range(35):
+        index.add("twitter", str(i))
+
+    # 10 + 20 + 40：每个新过滤器容量翻倍
+    assert [bloom.capacity for bloom in index.filters["twitter"]] == [10, 20, 40]
+    assert all(index.might_contain("twitter", str(i)) for i in range(35))
+    assert not index.might_contain("reddit", "0")
+
+
+def test_positives_are_confirmed_with_exact_check(tmp_path):
+    stored = {("twitter", "1")}
+    index = PlatformIdIndex(path=str(tmp_path), exact_check=lambda platform, pid: (platform, pid) in stored)
+    index.add("twitter", "1")
+    index.add("twitter", "2")
+
+    assert index.is_duplicate("twitter", "1")
+    # 过滤器里有但数据库里没有：按误判处理，条目不会被丢弃
+    assert not index.is_duplicate("twitter", "2")
+    assert not index.is_duplicate("twitter", "3")
+    assert index.stats == {"checks": 3, "negatives": 1, "confirmed": 1, "false_positives": 1}
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = PlatformIdIndex(path=str(tmp_path), initial_capacity=10)
+    for i in range(25):
+        index.add("weibo", f"m{i}")
+    index.last_comment_id = 42
+
+    snapshot = index.snapshot()
+    # 快照之后的修改不进入已写出的文件
+    index.add("weibo", "late")
+    index.write_snapshot(snapshot)
+
+    loaded = PlatformIdIndex(path=str(tmp_path), initial_capacity=10)
+    assert loaded.load()
+    assert loaded.last_comment_id == 42
+    assert len(loaded.filters["weibo"]) == 2
+    assert all(loaded.might_contain("weibo", f"m{i}") for i in range(25))
+    assert not loaded.might_contain("weibo", "late")
+
+
+def test_load_without_files_reports_missing(tmp_path):
+    assert not PlatformIdIndex(path=str(tmp_path / "empty")).load()
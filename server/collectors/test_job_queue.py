@@ -0,0 +1,176 @@
+"""
+Crawl job queue tests: consistent hash ring and lease fencing tokens
+"""
+
+import os
+import sys
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import CrawlJobQueue, HashRing
+
+
+def test_ring_spreads_keys_and_moves_only_the_lost_share():
+    workers = [f"worker-{i}" for i in range(4)]
+    ring = HashRing(workers)
+    keys = [str(task_id) for task_id in range(4000)]
+    before = {key: ring.owner(key) for key in keys}
+
+    counts = Counter(before.values())
+    assert set(counts) == set(workers)
+    assert min(counts.values()) > 600
+
+    # 去掉一个worker：只有它负责的任务换主，其余任务不动
+    after = HashRing(workers[:3])
+    for key, owner in before.items():
+        if owner != "worker-3":
+            assert after.owner(key) == owner
+        else:
+            assert after.owner(key) in workers[:3]
+
+
+def test_ring_is_deterministic_and_empty_ring_has_no_owner():
+    assert HashRing(["a", "b"]).owner("42") == HashRing(["b", "a", "a"]).owner("42")
+    assert len(HashRing(["b", "a", "a"])) == 2
+    assert HashRing([]).owner("42") is None
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        jobs = self.db.jobs
+        if sql.startswith("UPDATE crawl_jobs SET status = 'running'"):
+            worker_id, lease_seconds, job_id = params
+            job = jobs.get(job_id)
+            if job is None or job["status"] != "pending":
+                return 0
+            job.update(status="running", workerId=worker_id, attempts=job["attempts"] + 1,
+                       leaseToken=job["leaseToken"] + 1, leaseExpiresAt=self.db.now + lease_seconds)
+            return 1
+        if sql.startswith("SELECT id, taskId, platform, keyword"):
+            self.rows = [dict(jobs[params[0]])]
+            return 1
+        if sql.startswith("UPDATE crawl_jobs SET heartbeatAt"):
+            lease_seconds, job_id, token = params
+            job = jobs[job_id]
+            if job["leaseToken"] != token or job["status"] != "running":
+                return 0
+            job["leaseExpiresAt"] = self.db.now + lease_seconds
+            return 1
+        if sql.startswith("UPDATE crawl_jobs SET status = 'failed'"):
+            expired = [j for j in jobs.values() if j["status"] == "running"
+                       and j["leaseExpiresAt"] < self.db.now and j["attempts"] >= params[0]]
+            for job in expired:
+                job["status"] = "failed"
+            return len(expired)
+        if sql.startswith("UPDATE crawl_jobs SET status = 'pending'"):
+            expired = [j for j in jobs.values() if j["status"] == "running" and j["leaseExpiresAt"] < self.db.now]
+            for job in expired:
+                job.update(status="pending", workerId=None, leaseExpiresAt=None)
+            return len(expired)
+        if sql.startswith("SELECT workerId, platforms FROM crawl_workers"):
+            self.rows = [{"workerId": worker, "platforms": None} for worker in self.db.workers]
+            return len(self.rows)
+        if sql.startswith("SELECT id, taskId, platform, TIMESTAMPDIFF"):
+            self.rows = [{"id": j["id"], "taskId": j["taskId"], "platform": j["platform"],
+                          "waiting": self.db.now - j["queuedAt"]}
+                         for j in sorted(jobs.values(), key=lambda j: j["id"]) if j["status"] == "pending"]
+            return len(self.rows)
+        if sql.startswith("DELETE FROM crawl_workers"):
+            return 0
+        raise AssertionError(f"unexpected SQL: {sql}")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class _JobsDb:
+    """crawl_jobs/crawl_workers的内存替身，只实现队列用到的语句"""
+
+    def __init__(self, workers=()):
+        self.now = 0
+        self.jobs = {}
+        self.workers = list(workers)
+
+    def add_job(self, job_id, task_id, platform="weibo"):
+        self.jobs[job_id] = {
+            "id": job_id, "taskId": task_id, "platform": platform, "keyword": "k", "maxResults": 50,
+            "status": "pending", "workerId": None, "attempts": 0, "leaseToken": 0,
+            "leaseExpiresAt": None, "queuedAt": self.now,
+        }
+
+    def cursor(self, *args):
+        return _Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_claim_is_won_once_and_bumps_the_fencing_token():
+    db = _JobsDb()
+    db.add_job(1, task_id=7)
+    first, second = CrawlJobQueue(db), CrawlJobQueue(db)
+
+    job = first._claim(1, "worker-a")
+    assert (job["leaseToken"], job["attempts"]) == (1, 1)
+    assert second._claim(1, "worker-b") is None
+    assert first.renew(1, job["leaseToken"])
+
+
+def test_worker_that_lost_its_lease_is_fenced_out():
+    db = _JobsDb()
+    db.add_job(1, task_id=7)
+    queue = CrawlJobQueue(db, lease_seconds=120, max_attempts=3)
+
+    stale = queue._claim(1, "worker-a")
+    db.now += 121
+    assert queue.requeue_expired() == 1
+    assert not queue.renew(1, stale["leaseToken"])
+
+    fresh = queue._claim(1, "worker-b")
+    assert fresh["leaseToken"] == stale["leaseToken"] + 1
+    # 旧持有者的心跳不能延长新租约，新持有者可以
+    assert not queue.renew(1, stale["leaseToken"])
+    assert queue.renew(1, fresh["leaseToken"])
+    assert db.jobs[1]["workerId"] == "worker-b"
+
+
+def test_expired_job_fails_after_max_attempts():
+    db = _JobsDb()
+    db.add_job(1, task_id=7)
+    queue = CrawlJobQueue(db, lease_seconds=10, max_attempts=2)
+    for _ in range(2):
+        queue._claim(1, "worker-a")
+        db.now += 11
+        queue.requeue_expired()
+    assert db.jobs[1]["status"] == "failed"
+    assert queue._claim(1, "worker-a") is None
+
+
+def test_claim_prefers_ring_owner_until_steal_after():
+    db = _JobsDb(workers=["worker-a", "worker-b"])
+    queue = CrawlJobQueue(db, steal_after=30)
+    task_id = next(t for t in range(100) if queue.owner(t, "weibo") == "worker-a")
+    db.add_job(1, task_id=task_id)
+
+    assert queue.claim("worker-b") is None
+    db.now += 31
+    # 等待超过steal_after后其他worker可以接手
+    assert queue.claim("worker-b")["id"] == 1
@@ -0,0 +1,100 @@
+"""
+SimHash near-duplicate clustering tests: band lookup, repost handling and bounded caches
+"""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from near_duplicate import NearDuplicateIndex, NearDuplicateRegistry, hamming_distance, simhash
+
+
+def _flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_band_lookup_finds_every_fingerprint_within_max_distance():
+    rng = random.Random(7)
+    index = NearDuplicateIndex(max_distance=3)
+    canonical = rng.getrandbits(64)
+    index.add_cluster(NearDuplicateIndex.cluster_id(canonical))
+
+    # 鸽巢原理：最多3个比特不同时至少有一个分段完全相同
+    for distance in range(4):
+        for _ in range(200):
+            probe = _flip(canonical, rng.sample(range(64), distance))
+            assert index.lookup(probe) == 0
+
+    for _ in range(200):
+        probe = _flip(canonical, rng.sample(range(64), 4))
+        assert index.lookup(probe) is None
+
+
+def test_band_lookup_matches_brute_force():
+    rng = random.Random(11)
+    index = NearDuplicateIndex(max_distance=3)
+    canonicals = [rng.getrandbits(64) for _ in range(300)]
+    for fingerprint in canonicals:
+        index.add_cluster(NearDuplicateIndex.cluster_id(fingerprint))
+
+    for _ in range(300):
+        probe = _flip(rng.choice(canonicals), rng.sample(range(64), rng.randint(0, 5)))
+        expected = min(
+            (hamming_distance(probe, fingerprint), cluster)
+            for cluster, fingerprint in enumerate(index.canonicals)
+        )
+        found = index.lookup(probe)
+        if expected[0] <= 3:
+            assert hamming_distance(probe, index.canonicals[found]) == expected[0]
+        else:
+            assert found is None
+
+
+def test_reposts_join_the_original_cluster():
+    index = NearDuplicateIndex()
+    original = "这家店的服务太差了，等了一个小时才上菜，再也不会来了"
+
+    cluster_id, is_canonical = index.assign(original)
+    assert is_canonical
+    assert index.assign(f"转发：{original}") == (cluster_id, False)
+    assert index.assign(f"RT {original}！！") == (cluster_id, False)
+
+    other_id, is_canonical = index.assign("今天天气很好，适合出去散步")
+    assert is_canonical and other_id != cluster_id
+    assert index.stats()["near_duplicates"] == 2
+
+
+def test_empty_texts_are_not_clustered():
+    index = NearDuplicateIndex()
+    assert simhash("！！！") == 0
+    assert index.assign("") == (None, True)
+    assert index.assign("  。。 ") == (None, True)
+    assert index.stats()["clusters"] == 0
+
+
+def test_results_cache_drops_least_recently_used():
+    index = NearDuplicateIndex(max_results=2)
+    index.set_result("a", {"sentiment": "positive"})
+    index.set_result("b", {"sentiment": "negative"})
+    assert index.get_result("a") == {"sentiment": "positive"}
+
+    index.set_result("c", {"sentiment": "neutral"})
+    assert index.get_result("b") is None
+    assert index.get_result("a") is not None
+    assert index.get_result("c") is not None
+
+
+def test_registry_evicts_idle_task_indexes():
+    registry = NearDuplicateRegistry(max_tasks=2)
+    first = registry.index_for(1)
+    second = registry.index_for(2)
+    assert registry.index_for(1) is first
+
+    registry.index_for(3)
+    # 任务2最久未使用被淘汰，再次使用时重新建立
+    assert registry.index_for(1) is first
+    assert registry.index_for(2) is not second
@@ -0,0 +1,110 @@
+"""
+Token bucket, shared SQLite store and throttled navigation tests
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import RateLimiter, SQLiteBucketStore, ThrottledError, TokenBucket, looks_throttled
+
+
+def test_bucket_allows_burst_then_asks_to_wait():
+    bucket = TokenBucket("test:default", rate=2.0, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.5
+
+
+def test_bucket_rejects_requests_above_capacity():
+    bucket = TokenBucket("test:default", rate=1.0, capacity=3)
+    with pytest.raises(ValueError):
+        bucket.try_acquire(4)
+    with pytest.raises(ValueError):
+        asyncio.run(bucket.acquire(4))
+
+
+def test_penalize_backs_off_and_reward_recovers():
+    bucket = TokenBucket("test:default", rate=1.0, capacity=3, cooldown=60, recovery_fraction=0.5)
+    bucket.penalize(reason="test")
+
+    snapshot = bucket.snapshot()
+    assert snapshot["rate"] == 0.5
+    assert snapshot["blocked_for"] > 59
+    # 冷却期内即使有令牌也不放行
+    assert bucket.try_acquire() > 59
+
+    bucket.reward()
+    bucket.reward()
+    assert bucket.snapshot()["rate"] == 1.0
+
+
+def test_store_shares_budget_between_buckets(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    # 两个进程各自创建桶，状态都落在同一个SQLite文件里
+    first = TokenBucket("weibo:acct", rate=0.01, capacity=2, store=SQLiteBucketStore(path))
+    second = TokenBucket("weibo:acct", rate=0.01, capacity=2, store=SQLiteBucketStore(path))
+
+    assert first.try_acquire() == 0.0
+    assert second.try_acquire() == 0.0
+    assert first.try_acquire() > 0
+    assert second.try_acquire() > 0
+
+    other = TokenBucket("weibo:other", rate=0.01, capacity=2, store=SQLiteBucketStore(path))
+    assert other.try_acquire() == 0.0
+
+
+def test_store_keeps_penalty_across_instances(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    TokenBucket("zhihu:acct", rate=1.0, capacity=2, store=SQLiteBucketStore(path)).penalize(retry_after=120)
+
+    restarted = TokenBucket("zhihu:acct", rate=1.0, capacity=2, store=SQLiteBucketStore(path))
+    assert restarted.try_acquire() > 100
+
+
+class _Response:
+    def __init__(self, status):
+        self.status = status
+
+
+class _Page:
+    """Playwright页面的最小替身：goto后停在给定的URL和状态码"""
+
+    def __init__(self, landing_url, status=200):
+        self.url = "about:blank"
+        self.landing_url = landing_url
+        self.status = status
+
+    async def goto(self, url, wait_until=None):
+        self.url = self.landing_url
+        return _Response(self.status)
+
+
+def test_navigate_raises_on_captcha_landing_and_backs_off():
+    limiter = RateLimiter()
+    page = _Page("https://passport.weibo.com/visitor/visitor?entry=miniblog")
+
+    with pytest.raises(ThrottledError) as error:
+        asyncio.run(limiter.navigate(page, "https://s.weibo.com/weibo?q=test", "weibo"))
+    assert error.value.platform == "weibo"
+    assert limiter.bucket("weibo").snapshot()["blocked_for"] > 0
+
+
+def test_navigate_returns_response_on_normal_landing():
+    limiter = RateLimiter()
+    page = _Page("https://www.zhihu.com/search?q=test")
+
+    response = asyncio.run(limiter.navigate(page, page.landing_url, "zhihu"))
+    assert response.status == 200
+    assert limiter.bucket("zhihu").snapshot()["blocked_for"] == 0
+
+
+def test_looks_throttled():
+    assert looks_throttled(429)
+    assert looks_throttled(200, "https://www.zhihu.com/account/unhuman?type=captcha")
+    assert not looks_throttled(200, "https://www.zhihu.com/question/1")
@@ -0,0 +1,52 @@
+"""
+Crawl scheduler tests: rate and duplicate estimates and depth adjustment
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import CrawlScheduler, job_stats
+
+
+def _job(hour, collected, new, depth=50):
+    return {"completedAt": datetime(2024, 5, 1, hour), "totalCollected": collected,
+            "newComments": new, "maxResults": depth}
+
+
+def test_job_stats_rate_skips_the_first_jobs_backlog():
+    stats = job_stats([_job(0, 50, 50), _job(2, 40, 10), _job(4, 40, 30, depth=75)])
+    # 第一个作业的条目是积压，不计入速率：(10 + 30) / 4小时
+    assert stats["new_rate"] == 10.0
+    assert abs(stats["duplicate_ratio"] - (1 - 90 / 130)) < 1e-9
+    assert stats["last_depth"] == 75
+
+
+def test_job_stats_without_enough_history():
+    assert job_stats([]) == {"new_rate": None, "duplicate_ratio": None, "last_depth": None}
+
+    single = job_stats([_job(0, 20, 5)])
+    assert single["new_rate"] is None
+    assert single["duplicate_ratio"] == 0.75
+
+    # 没有采到任何条目时不计算重复率；completedAt也可以是epoch秒
+    stats = job_stats([{"completedAt": 0, "totalCollected": None, "newComments": None, "maxResults": 20},
+                       {"completedAt": 1800, "totalCollected": 0, "newComments": 0, "maxResults": 20}])
+    assert stats["duplicate_ratio"] is None
+    assert stats["new_rate"] == 0.0
+
+
+def test_next_depth_follows_the_duplicate_ratio_within_bounds():
+    scheduler = CrawlScheduler(None, min_depth=10, max_depth=200, default_depth=50)
+
+    def depth(last, ratio):
+        return scheduler.next_depth({"last_depth": last, "duplicate_ratio": ratio, "new_rate": None})
+
+    assert depth(None, None) == 50
+    assert depth(100, 0.1) == 150
+    assert depth(100, 0.4) == 100
+    assert depth(100, 0.9) == 70
+    assert depth(180, 0.0) == 200
+    assert depth(12, 1.0) == 10
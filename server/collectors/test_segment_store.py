@@ -0,0 +1,97 @@
+"""
+Segment store tests: block/segment round trip, range reads and torn-tail recovery
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from segment_store import INDEX_SUFFIX, SEGMENT_SUFFIX, SegmentReader, SegmentStore, SegmentWriter, _read_index
+
+
+def _posts(start, count):
+    return [{"id": f"p{i}", "content": f"第{i}条\n内容"} for i in range(start, start + count)]
+
+
+def _last_segment(path):
+    name = sorted(n for n in os.listdir(path) if n.endswith(SEGMENT_SUFFIX))[-1]
+    return os.path.join(path, name), os.path.join(path, name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+
+
+def test_round_trip_across_blocks_and_segments(tmp_path):
+    path = str(tmp_path / "stream")
+    writer = SegmentWriter(path, block_bytes=200, segment_bytes=600)
+    assert writer.append_many(_posts(0, 50)) == (0, 50)
+    assert writer.append_many(_posts(50, 30)) == (50, 30)
+    writer.close()
+
+    reader = SegmentReader(path)
+    assert len(reader.segments) > 1
+    assert len(reader) == 80
+    assert [record for _, record in reader.read()] == _posts(0, 80)
+    # 只解压与区间重叠的块
+    assert [seq for seq, _ in reader.read(37, 44)] == list(range(37, 44))
+    assert [record["id"] for _, record in reader.read(78)] == ["p78", "p79"]
+
+
+def test_torn_block_is_truncated_on_reopen(tmp_path):
+    path = str(tmp_path / "stream")
+    writer = SegmentWriter(path)
+    writer.append_many(_posts(0, 10))
+    writer.append_many(_posts(10, 10))
+    writer.close()
+
+    # 模拟写最后一个块时崩溃：数据块只写了一半
+    segment_path, index_path = _last_segment(path)
+    size = os.path.getsize(segment_path)
+    with open(segment_path, "r+b") as f:
+        f.truncate(size - 20)
+
+    writer = SegmentWriter(path)
+    assert writer.next_seq == 10
+    assert [entry[0] for entry in _read_index(index_path)] == [0]
+    assert writer.append_many(_posts(100, 5)) == (10, 5)
+    writer.close()
+
+    ids = [record["id"] for _, record in SegmentReader(path).read()]
+    assert ids == [f"p{i}" for i in range(10)] + [f"p{i}" for i in range(100, 105)]
+
+
+def test_garbage_tail_and_lagging_index_are_repaired(tmp_path):
+    path = str(tmp_path / "stream")
+    writer = SegmentWriter(path)
+    writer.append_many(_posts(0, 5))
+    writer.append_many(_posts(5, 5))
+    writer.close()
+
+    segment_path, index_path = _last_segment(path)
+    valid_size = os.path.getsize(segment_path)
+    with open(segment_path, "ab") as f:
+        f.write(b"YQSG\x00\x01garbage")
+    # 索引落后于数据块（写完数据块后、写索引前崩溃）
+    with open(index_path, "r+b") as f:
+        f.truncate(os.path.getsize(index_path) // 2)
+
+    writer = SegmentWriter(path)
+    assert writer.next_seq == 10
+    assert os.path.getsize(segment_path) == valid_size
+    assert [entry[0] for entry in _read_index(index_path)] == [0, 5]
+    writer.close()
+    assert len(SegmentReader(path)) == 10
+
+
+def test_stream_is_locked_until_released(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append(7, "weibo", _posts(0, 3))
+    with pytest.raises(RuntimeError):
+        SegmentWriter(store.stream_path(7, "weibo"))
+
+    store.release(7, "weibo")
+    other = SegmentStore(str(tmp_path))
+    assert other.append(7, "weibo", _posts(3, 2)) == (3, 2)
+    assert [post["id"] for post in other.posts(7, "weibo")] == [f"p{i}" for i in range(5)]
+    assert other.streams() == [(7, "weibo")]
+    other.close()
@@ -5,37 +5,228 @@ Collects tweets based on keywords and stores them in the database
 
 import tweepy
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Iterator, Optional, Union
 from datetime import datetime, timedelta
 import asyncio
+import json
+import threading
+import time
 from dotenv import load_dotenv
 import os
 
+from rate_limiter import get_rate_limiter
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 预定义的相关用户列表（根据关键词选择）
+KEYWORD_USERS_MAP = {
+    "AI": ["OpenAI", "DeepMind", "AndrewYNg"],
+    "人工智能": ["OpenAI", "DeepMind"],
+    "Python": ["ThePSF", "realpython"],
+    "科技": ["TechCrunch", "TheVerge"],
+}
+
+DEFAULT_USERS = ["OpenAI"]
+
+TWEET_FIELDS = ["created_at", "public_metrics"]
+
+DEFAULT_USER_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "yuqing", "twitter_user_ids.json"
+)
+
+DEFAULT_SINCE_ID_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "yuqing", "twitter_since_ids.json"
+)
+
+
+class TwitterRetryPolicy:
+    """推特请求的限流与429重试策略"""
+
+    def __init__(self, rate_limiter, account: str, max_retries: int = 3):
+        """
+        Args:
+            rate_limiter: Shared RateLimiter
+            account: Account the twitter bucket is charged to
+            max_retries: Retries per request after a 429
+        """
+        self.rate_limiter = rate_limiter
+        self.account = account
+        self.max_retries = max_retries
+
+    def _throttled(self, error: tweepy.TooManyRequests, attempt: int):
+        # 按x-rate-limit-reset退避；重试用尽后把429抛给调用方
+        retry_after = None
+        reset = error.response.headers.get("x-rate-limit-reset") if error.response is not None else None
+        if reset:
+            retry_after = max(0.0, float(reset) - time.time())
+        self.rate_limiter.report_throttled("twitter", self.account, retry_after=retry_after)
+        if attempt >= self.max_retries:
+            raise error
+
+    def call(self, method, **kwargs):
+        """
+        Call a tweepy method within the twitter rate budget
+
+        On a 429 the bucket backs off (honoring x-rate-limit-reset) and the call
+        is retried up to max_retries times.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire_sync("twitter", self.account)
+            try:
+                response = method(**kwargs)
+            except tweepy.TooManyRequests as e:
+                self._throttled(e, attempt)
+                continue
+            self.rate_limiter.report_success("twitter", self.account)
+            return response
+
+
+def convert_tweet(tweet, username: str, user_id) -> Dict:
+    """Convert a tweepy Tweet to our comment format"""
+    metrics = tweet.public_metrics
+    return {
+        "platformId": str(tweet.id),
+        "platform": "twitter",
+        "author": username,
+        "authorId": str(user_id),
+        "content": tweet.text,
+        "url": f"https://twitter.com/i/web/status/{tweet.id}",
+        "publishedAt": tweet.created_at.isoformat() if tweet.created_at else None,
+        "likes": metrics["like_count"] if metrics else 0,
+        "replies": metrics["reply_count"] if metrics else 0,
+        "shares": metrics["retweet_count"] if metrics else 0,
+    }
+
+
+class UserIdCache:
+    """用户名到用户ID的持久化缓存，避免每次采集都调用get_user"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize user ID cache
+        
+        Args:
+            path: JSON file to persist the cache (default: TWITTER_USER_CACHE_PATH or ~/.cache/yuqing)
+        """
+        self.path = path or os.getenv("TWITTER_USER_CACHE_PATH", DEFAULT_USER_CACHE_PATH)
+        self._lock = threading.Lock()
+        self._ids: Dict[str, str] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._ids = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable user ID cache {self.path}: {e}")
+
+    def get(self, username: str) -> Optional[str]:
+        """Return the cached user ID for a username, if any"""
+        with self._lock:
+            return self._ids.get(username.lower())
+
+    def set(self, username: str, user_id) -> None:
+        """Store a user ID and persist the cache atomically"""
+        with self._lock:
+            self._ids[username.lower()] = str(user_id)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._ids, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"Failed to persist user ID cache: {e}")
+
+
+class SinceIdStore:
+    """每个监控任务各用户时间线已采集到的最新推文ID，下次采集只取更新的推文"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file of {task id: {username: newest tweet ID}}
+                (default: TWITTER_SINCE_ID_PATH or ~/.cache/yuqing)
+        """
+        self.path = path or os.getenv("TWITTER_SINCE_ID_PATH", DEFAULT_SINCE_ID_PATH)
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable since ID store {self.path}: {e}")
+            return {}
+
+    def get(self, task_id: int) -> Dict[str, str]:
+        """Per-username newest tweet ID of the task's completed runs"""
+        with self._lock:
+            return self._read().get(str(task_id), {})
+
+    def update(self, task_id: int, newest_ids: Dict[str, str]) -> None:
+        """Advance the task's since IDs (never moves one backwards) and persist atomically"""
+        if not newest_ids:
+            return
+        with self._lock:
+            data = self._read()
+            since_ids = data.setdefault(str(task_id), {})
+            for username, newest_id in newest_ids.items():
+                if int(newest_id) > int(since_ids.get(username, 0)):
+                    since_ids[username] = newest_id
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"Failed to persist since IDs: {e}")
+
+
 class TwitterCollector:
     def __init__(
         self,
         api_key: str,
         api_secret: str,
         access_token: str,
-        access_token_secret: str
+        access_token_secret: str,
+        max_retries: int = 3,
+        user_cache: Optional[UserIdCache] = None
     ):
-        """Initialize Twitter API client with credentials"""
+        """
+        Initialize Twitter API client with credentials
+        
+        Rate limits are handled by the shared RateLimiter instead of tweepy's
+        wait_on_rate_limit, which would block the whole process on a 429.
+        """
         self.auth = tweepy.OAuthHandler(api_key, api_secret)
         self.auth.set_access_token(access_token, access_token_secret)
-        self.api = tweepy.API(self.auth, wait_on_rate_limit=True)
+        self.api = tweepy.API(self.auth, wait_on_rate_limit=False)
         self.client = tweepy.Client(
             consumer_key=api_key,
             consumer_secret=api_secret,
             access_token=access_token,
             access_token_secret=access_token_secret,
-            wait_on_rate_limit=True
+            wait_on_rate_limit=False
         )
+        # 访问令牌的前缀是账号ID，按账号分配配额
+        self.account = access_token.split("-")[0] if access_token else "default"
+        self.rate_limiter = get_rate_limiter()
+        self.max_retries = max_retries
+        self.retry_policy = TwitterRetryPolicy(self.rate_limiter, self.account, max_retries)
+        self.user_cache = user_cache or UserIdCache()
+        self.newest_ids: Dict[str, str] = {}
+        self.next_tokens: Dict[str, Optional[str]] = {}
         logger.info("Twitter API client initialized")
 
+    def _call(self, method, **kwargs):
+        """Call a tweepy method under the shared retry policy"""
+        return self.retry_policy.call(method, **kwargs)
+
     def search_tweets(
         self,
         keyword: str,
@@ -44,52 +235,81 @@ class TwitterCollector:
         tweet_fields: Optional[List[str]] = None,
         expansions: Optional[List[str]] = None,
         user_fields: Optional[List[str]] = None,
+        since_ids: Optional[Dict[str, str]] = None,
+        start_time: Optional[Union[datetime, str]] = None,
+        max_pages_per_user: int = 10,
+        page_tokens: Optional[Dict[str, Optional[str]]] = None,
+        on_page: Optional[Callable[[str, List[Dict], Optional[str]], None]] = None,
     ) -> List[Dict]:
         """
         Search for tweets using Free plan compatible method
         
         Note: Free plan doesn't support search_recent_tweets.
         This method collects tweets from predefined users related to the keyword.
+        Timelines are paged round-robin and paging stops as soon as
+        `max_results` keyword-matching tweets are found.
         
         Args:
             keyword: Search keyword (used to select relevant users)
             max_results: Maximum number of results to return
             lang: Language code (default: "zh" for Chinese)
+            since_ids: Per-username newest tweet ID from a previous run (incremental mode)
+            start_time: Only return tweets created after this time
+            max_pages_per_user: Maximum number of timeline pages read per user
+            page_tokens: Per-username pagination token to continue an interrupted
+                crawl from; users mapped to None are already exhausted
+            on_page: Called with (username, matching tweets, next token) after each
+                page, e.g. to checkpoint the crawl cursor
             
         Returns:
-            List of tweet dictionaries with metadata
+            List of tweet dictionaries with metadata; `self.newest_ids` then holds the
+            since IDs to store for the users whose timelines were read to the end
         """
         logger.warning("Free plan limitation: Using user timeline instead of keyword search")
         
-        # 预定义的相关用户列表（根据关键词选择）
-        keyword_users_map = {
-            "AI": ["OpenAI", "DeepMind", "AndrewYNg"],
-            "人工智能": ["OpenAI", "DeepMind"],
-            "Python": ["ThePSF", "realpython"],
-            "科技": ["TechCrunch", "TheVerge"],
-        }
-        
         # 选择相关用户
-        usernames = keyword_users_map.get(keyword, ["OpenAI"])  # 默认使用OpenAI
+        usernames = KEYWORD_USERS_MAP.get(keyword, DEFAULT_USERS)  # 默认使用OpenAI
+        since_ids = since_ids or {}
+        page_tokens = page_tokens or {}
+        self.newest_ids = {}
+        
+        page_iterators = {
+            username: self.iter_user_tweet_pages(
+                username,
+                since_id=since_ids.get(username),
+                start_time=start_time,
+                max_pages=max_pages_per_user,
+                pagination_token=page_tokens.get(username),
+            )
+            for username in usernames
+            if username not in page_tokens or page_tokens[username] is not None
+        }
         
         all_tweets = []
-        tweets_per_user = max(10, max_results // len(usernames))
         
-        for username in usernames:
-            try:
-                user_tweets = self.search_tweets_by_user(username, tweets_per_user)
+        # 轮流从每个用户的时间线取一页，满足配额后立即停止翻页
+        while page_iterators and len(all_tweets) < max_results:
+            for username in list(page_iterators):
+                try:
+                    page = next(page_iterators[username])
+                except StopIteration:
+                    del page_iterators[username]
+                    if on_page:
+                        on_page(username, [], None)
+                    continue
+                except Exception as e:
+                    logger.warning(f"Failed to collect from {username}: {e}")
+                    del page_iterators[username]
+                    continue
+                
                 # 过滤包含关键词的推文
-                filtered_tweets = [
-                    t for t in user_tweets 
-                    if keyword.lower() in t['content'].lower()
-                ]
-                all_tweets.extend(filtered_tweets)
+                matched = [t for t in page if keyword.lower() in t['content'].lower()]
+                all_tweets.extend(matched)
+                if on_page:
+                    on_page(username, matched, self.next_tokens.get(username))
                 
                 if len(all_tweets) >= max_results:
                     break
-            except Exception as e:
-                logger.warning(f"Failed to collect from {username}: {e}")
-                continue
         
         result = all_tweets[:max_results]
         logger.info(f"Collected {len(result)} tweets for keyword: {keyword} (Free plan mode)")
@@ -99,6 +319,8 @@ class TwitterCollector:
         self,
         username: str,
         max_results: int = 100,
+        since_id: Optional[str] = None,
+        start_time: Optional[Union[datetime, str]] = None,
     ) -> List[Dict]:
         """
         Search for tweets from a specific user
@@ -106,40 +328,23 @@ class TwitterCollector:
         Args:
             username: Twitter username
             max_results: Maximum number of results
+            since_id: Only return tweets newer than this ID
+            start_time: Only return tweets created after this time
             
         Returns:
             List of tweet dictionaries
         """
         try:
-            user = self.client.get_user(username=username)
-            if not user.data:
-                logger.warning(f"User {username} not found")
-                return []
-            
-            user_id = user.data.id
-            
-            response = self.client.get_users_tweets(
-                id=user_id,
-                max_results=min(max_results, 100),
-                tweet_fields=["created_at", "public_metrics"],
-            )
-            
             tweets = []
-            if response.data:
-                for tweet in response.data:
-                    tweet_data = {
-                        "platformId": str(tweet.id),
-                        "platform": "twitter",
-                        "author": username,
-                        "authorId": str(user_id),
-                        "content": tweet.text,
-                        "url": f"https://twitter.com/i/web/status/{tweet.id}",
-                        "publishedAt": tweet.created_at.isoformat() if tweet.created_at else None,
-                        "likes": tweet.public_metrics["like_count"] if tweet.public_metrics else 0,
-                        "replies": tweet.public_metrics["reply_count"] if tweet.public_metrics else 0,
-                        "shares": tweet.public_metrics["retweet_count"] if tweet.public_metrics else 0,
-                    }
-                    tweets.append(tweet_data)
+            for page in self.iter_user_tweet_pages(
+                username,
+                page_size=max_results,
+                since_id=since_id,
+                start_time=start_time,
+            ):
+                tweets.extend(page[:max_results - len(tweets)])
+                if len(tweets) >= max_results:
+                    break
             
             logger.info(f"Collected {len(tweets)} tweets from user: {username}")
             return tweets
@@ -148,6 +353,99 @@ class TwitterCollector:
             logger.error(f"Error collecting tweets from user {username}: {str(e)}")
             raise
 
+    def iter_user_tweet_pages(
+        self,
+        username: str,
+        page_size: int = 100,
+        since_id: Optional[str] = None,
+        start_time: Optional[Union[datetime, str]] = None,
+        max_pages: Optional[int] = None,
+        pagination_token: Optional[str] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Yield a user's timeline page by page using pagination tokens
+        
+        Pages are only requested when the consumer asks for them, so stopping
+        iteration stops spending API quota. The token of the next page is kept in
+        `self.next_tokens` (None once the timeline is exhausted). The newest tweet ID
+        of the run goes to `self.newest_ids` for the next incremental run only once
+        the pages have been read down to `since_id`; recording it after an early stop
+        would skip the unread tweets between the two.
+        
+        Args:
+            username: Twitter username
+            page_size: Tweets per request (clamped to the API range 5-100)
+            since_id: Only return tweets newer than this ID
+            start_time: Only return tweets created after this time
+            max_pages: Maximum number of pages to request
+            pagination_token: Token of the first page to request (resume a crawl)
+            
+        Yields:
+            Lists of tweet dictionaries, one per API page
+        """
+        user_id = self.resolve_user_id(username)
+        if not user_id:
+            logger.warning(f"User {username} not found")
+            return
+        
+        pages = 0
+        # 从分页令牌续跑时第一页不是最新的一页，本次不推进newest_id
+        run_newest_id = None
+        resumed = pagination_token is not None
+        
+        while max_pages is None or pages < max_pages:
+            response = self._call(
+                self.client.get_users_tweets,
+                id=user_id,
+                max_results=max(5, min(page_size, 100)),
+                tweet_fields=TWEET_FIELDS,
+                pagination_token=pagination_token,
+                since_id=since_id,
+                start_time=start_time,
+            )
+            pages += 1
+            meta = response.meta or {}
+            if pages == 1 and not resumed:
+                run_newest_id = meta.get("newest_id")
+            
+            pagination_token = meta.get("next_token")
+            self.next_tokens[username] = pagination_token if response.data else None
+            
+            if response.data:
+                yield [convert_tweet(tweet, username, user_id) for tweet in response.data]
+            
+            if not response.data or not pagination_token:
+                break
+        else:
+            # 读满max_pages仍未到since_id时保留旧值，下次从原位置重新补齐；
+            # 首次采集没有since_id，本次读到的范围即为起点
+            if since_id is not None:
+                return
+        
+        if run_newest_id and int(run_newest_id) > int(self.newest_ids.get(username, 0)):
+            self.newest_ids[username] = run_newest_id
+
+    def resolve_user_id(self, username: str) -> Optional[str]:
+        """
+        Resolve a username to a user ID, using the persistent cache first
+        
+        Args:
+            username: Twitter username
+            
+        Returns:
+            User ID or None if the user does not exist
+        """
+        user_id = self.user_cache.get(username)
+        if user_id:
+            return user_id
+        
+        user = self._call(self.client.get_user, username=username)
+        if not user.data:
+            return None
+        
+        self.user_cache.set(username, user.data.id)
+        return str(user.data.id)
+
     def get_trending_topics(self, woeid: int = 1) -> List[Dict]:
         """
         Get trending topics (requires API v1.1)
@@ -159,7 +457,7 @@ class TwitterCollector:
             List of trending topics
         """
         try:
-            trends = self.api.get_place_trends(id=woeid)
+            trends = self._call(self.api.get_place_trends, id=woeid)
             return trends
         except Exception as e:
             logger.error(f"Error getting trending topics: {str(e)}")
@@ -12,6 +12,9 @@ from playwright.async_api import async_playwright, Page, Browser
 import os
 from dotenv import load_dotenv
 
+from rate_limiter import ThrottledError, get_rate_limiter
+from scroll_loader import InfiniteScrollLoader
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,8 @@ class WeiboCollector:
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.is_logged_in = False
+        self.last_scroll_stats: Optional[Dict] = None
+        self.rate_limiter = get_rate_limiter()
         logger.info("WeiboCollector initialized")
     
     async def start(self):
@@ -94,21 +99,23 @@ class WeiboCollector:
         try:
             # 访问搜索页面
             search_url = f'https://s.weibo.com/weibo?q={keyword}'
-            await self.page.goto(search_url, wait_until='networkidle')
-            await asyncio.sleep(2)  # 等待内容加载
+            await self.rate_limiter.navigate(self.page, search_url, 'weibo', self.username)
             
-            # 滚动页面加载更多内容
-            for _ in range(max_results // 10):
-                await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                await asyncio.sleep(1)
+            # 滚动页面直到出现足够的微博卡片或不再有新内容
+            loader = InfiniteScrollLoader(self.page, '.card-wrap', key_attribute='mid')
+            self.last_scroll_stats = await loader.load(max_results)
             
             # 提取微博卡片
             cards = await self.page.query_selector_all('.card-wrap')
+            seen_ids = set()
             
-            for card in cards[:max_results]:
+            for card in cards:
+                if len(posts) >= max_results:
+                    break
                 try:
                     post_data = await self._extract_post_data(card)
-                    if post_data:
+                    if post_data and post_data["platformId"] not in seen_ids:
+                        seen_ids.add(post_data["platformId"])
                         posts.append(post_data)
                 except Exception as e:
                     logger.warning(f"Failed to extract post data: {e}")
@@ -117,6 +124,8 @@ class WeiboCollector:
             logger.info(f"Collected {len(posts)} Weibo posts for keyword: {keyword}")
             return posts
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error searching Weibo posts: {str(e)}")
             return posts
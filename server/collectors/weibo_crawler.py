@@ -7,11 +7,12 @@ import asyncio
 import logging
 from typing import List, Dict, Optional
 from playwright.async_api import async_playwright, Page, Browser
-import time
-from datetime import datetime
 from urllib.parse import urlencode
 import re
 
+from rate_limiter import ThrottledError, get_rate_limiter
+from scroll_loader import InfiniteScrollLoader
+
 logger = logging.getLogger(__name__)
 
 class WeiboCrawler:
@@ -30,6 +31,8 @@ class WeiboCrawler:
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.base_url = "https://weibo.com"
+        self.last_scroll_stats: Optional[Dict] = None
+        self.rate_limiter = get_rate_limiter()
         logger.info("WeiboCrawler initialized")
 
     async def login(self) -> bool:
@@ -89,7 +92,7 @@ class WeiboCrawler:
             }
             search_url = f"{self.base_url}/search/realtime?{urlencode(params)}"
             
-            await self.page.goto(search_url, wait_until="networkidle")
+            await self.rate_limiter.navigate(self.page, search_url, "weibo", self.username)
             
             posts = []
             page_num = 1
@@ -126,6 +129,8 @@ class WeiboCrawler:
             logger.info(f"Collected {len(posts)} posts for keyword: {keyword}")
             return posts[:max_results]
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error searching posts: {str(e)}")
             return []
@@ -219,32 +224,35 @@ class WeiboCrawler:
         """
         try:
             user_url = f"{self.base_url}/u/{user_id}"
-            await self.page.goto(user_url, wait_until="networkidle")
+            await self.rate_limiter.navigate(self.page, user_url, "weibo", self.username)
             
             posts = []
+            seen_ids = set()
             
-            # Scroll to load more posts
-            for _ in range(max_results // 10):
-                await self.page.evaluate("window.scrollBy(0, window.innerHeight)")
-                await asyncio.sleep(1)
-                
-                post_elements = await self.page.query_selector_all(".feed-item")
+            # Scroll until enough posts are loaded or no new posts appear
+            loader = InfiniteScrollLoader(self.page, ".feed-item")
+            self.last_scroll_stats = await loader.load(max_results)
+            
+            post_elements = await self.page.query_selector_all(".feed-item")
+            
+            for element in post_elements:
+                if len(posts) >= max_results:
+                    break
                 
-                for element in post_elements:
-                    if len(posts) >= max_results:
-                        break
-                    
-                    try:
-                        post_data = await self._extract_post_data(element)
-                        if post_data:
-                            posts.append(post_data)
-                    except Exception as e:
-                        logger.warning(f"Error extracting post: {str(e)}")
-                        continue
+                try:
+                    post_data = await self._extract_post_data(element)
+                    if post_data and post_data["platformId"] not in seen_ids:
+                        seen_ids.add(post_data["platformId"])
+                        posts.append(post_data)
+                except Exception as e:
+                    logger.warning(f"Error extracting post: {str(e)}")
+                    continue
             
             logger.info(f"Collected {len(posts)} posts from user: {user_id}")
             return posts[:max_results]
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error getting user posts: {str(e)}")
             return []
@@ -0,0 +1,290 @@
+"""
+Long-running collector worker
+Claims jobs from the crawl_jobs queue and runs them with a fixed number of slots,
+keeping database connections, logged-in browser sessions, dedupe/near-duplicate
+indexes and anomaly detectors warm across jobs instead of paying process startup,
+imports, DB connect and browser launch per collection request.
+Several workers (on one or many machines) share the queue; see job_queue for how
+tasks are sharded between them
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import signal
+import socket
+import threading
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlp"))
+
+from dotenv import load_dotenv
+
+from analytics.anomaly import AlertStore, open_task_detector
+from analytics.rollup import refresh_sentiment_stats
+
+from checkpoint import JobCheckpoint, run_key
+from dedupe_index import open_dedupe_index
+from job_queue import CrawlJobQueue
+from mock_data_generator import MockDataGenerator
+from near_duplicate import NearDuplicateRegistry
+from run_collector import PLATFORMS, DatabaseManager, close_collector, collect_from_platform
+from segment_store import SegmentStore
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class CollectorWorker:
+    """常驻采集worker：从crawl_jobs队列领取任务，跨任务复用连接、浏览器和索引"""
+
+    def __init__(
+        self,
+        db_url: str,
+        worker_id: Optional[str] = None,
+        concurrency: int = 2,
+        platforms: Optional[List[str]] = None,
+        lease_seconds: int = 120,
+        poll_interval: float = 0.5,
+        nlp_url: Optional[str] = None,
+        store: bool = True,
+        mock: bool = False,
+    ):
+        """
+        Args:
+            db_url: DATABASE_URL
+            worker_id: Identity recorded on claimed jobs (default: host-pid)
+            concurrency: Jobs run at the same time, each slot with its own DB connection and browsers;
+                their blocking calls run in threads, so slots overlap on network and DB waits
+            platforms: Only claim jobs of these platforms (default: any)
+            lease_seconds: Job lease; heartbeats renew it every third of this
+            poll_interval: Seconds an idle slot waits before polling the queue again
+            nlp_url: NLP service URL (None skips sentiment analysis)
+            store: Keep raw results in the segment store and checkpoint jobs
+            mock: Use MockDataGenerator posts instead of crawling
+        """
+        self.db_url = db_url
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency
+        self.platforms = platforms
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.nlp_url = nlp_url
+        self.mock_generator = MockDataGenerator() if mock else None
+
+        # 领取任务、去重索引、聚类预加载和告警共用主连接，只在事件循环线程上使用；
+        # 各槽位的入库和NLP调用走自己的连接，在线程中执行
+        self.db = DatabaseManager(db_url)
+        self.queue = CrawlJobQueue(self.db.connection, lease_seconds=lease_seconds)
+        self.dedupe_index = open_dedupe_index(self.db.connection)
+        self.near_duplicates = NearDuplicateRegistry(self.db.connection)
+        self.segment_store = SegmentStore() if store else None
+        self.detectors: Dict[int, object] = {}
+        # 检测器产生的告警先暂存，任务结束时在槽位连接上批量写入，不阻塞事件循环
+        self._pending_alerts: List[Dict] = []
+
+        self._stopping: Optional[asyncio.Event] = None
+        self._heartbeat_stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 当前持有的租约：job id -> (leaseToken, 执行任务的asyncio.Task)
+        self._leases: Dict[int, tuple] = {}
+        self._lost: set = set()
+
+    def detector_for(self, task_id: int):
+        if self.nlp_url is None:
+            return None
+        if task_id not in self.detectors:
+            self.detectors[task_id] = open_task_detector(self.db.connection, task_id,
+                                                         sink=self._pending_alerts.append)
+        return self.detectors[task_id]
+
+    def _heartbeat_loop(self):
+        """
+        Keep the worker on the ring and renew its leases from a thread with its own
+        connection, so long blocking jobs do not lose them
+
+        A job whose lease could not be renewed has been requeued and possibly claimed
+        elsewhere; it is cancelled here and its final update would be fenced off anyway.
+        """
+        db = DatabaseManager(self.db_url)
+        queue = CrawlJobQueue(db.connection, lease_seconds=self.lease_seconds)
+        try:
+            while not self._heartbeat_stop.wait(self.lease_seconds / 3):
+                try:
+                    queue.register(self.worker_id, self.platforms, self.concurrency)
+                    for job_id, (lease_token, task) in list(self._leases.items()):
+                        if not queue.renew(job_id, lease_token):
+                            logger.warning(f"Lost the lease of job {job_id}, abandoning it")
+                            self._lost.add(job_id)
+                            self._loop.call_soon_threadsafe(task.cancel)
+                    queue.requeue_expired()
+                except Exception as e:
+                    logger.warning(f"Heartbeat failed: {e}")
+        finally:
+            db.close()
+
+    async def run_job(self, job: Dict, db: DatabaseManager, collectors: Dict) -> Dict:
+        task_id, platform = job['taskId'], job['platform']
+        checkpoint = None
+        if self.segment_store:
+            # 租约过期后重新领取的任务从检查点续跑
+            checkpoint = (JobCheckpoint.load if job['attempts'] > 1 else JobCheckpoint.begin)(
+                task_id, platform, run_key(job_id=job['id']))
+        if platform not in PLATFORMS:
+            raise ValueError(f"Unknown platform: {platform}")
+        prefetched = None
+        if self.mock_generator:
+            generate = getattr(self.mock_generator, f"generate_{platform}_posts")
+            prefetched = generate(job['keyword'], job['maxResults'])
+
+        try:
+            result = await collect_from_platform(
+                platform, job['keyword'], job['maxResults'], task_id, db, self.nlp_url,
+                self.dedupe_index, self.near_duplicates, self.detector_for(task_id),
+                self.segment_store, checkpoint=checkpoint, collectors=collectors, prefetched=prefetched,
+                job=job
+            )
+        finally:
+            alerts = self._pending_alerts[:]
+            self._pending_alerts.clear()
+            if alerts:
+                try:
+                    await asyncio.to_thread(AlertStore(db.connection).save_many, alerts)
+                except Exception as e:
+                    logger.error(f"Could not store {len(alerts)} alerts: {e}")
+
+        # 索引在事件循环上序列化，写文件和汇总在线程中使用本槽位的连接
+        await asyncio.to_thread(self.dedupe_index.write_snapshot, self.dedupe_index.snapshot())
+        if self.nlp_url:
+            await asyncio.to_thread(refresh_sentiment_stats, db.connection)
+        return result
+
+    async def _slot(self, slot: int):
+        db = DatabaseManager(self.db_url)
+        collectors: Dict = {}
+        try:
+            while not self._stopping.is_set():
+                try:
+                    job = self.queue.claim(self.worker_id, self.platforms)
+                except Exception as e:
+                    logger.error(f"Could not claim a job: {e}")
+                    job = None
+
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                logger.info(f"[slot {slot}] Running job {job['id']}: task {job['taskId']} "
+                            f"{job['platform']} '{job['keyword']}' (attempt {job['attempts']})")
+                task = asyncio.ensure_future(self.run_job(job, db, collectors))
+                self._leases[job['id']] = (job['leaseToken'], task)
+                try:
+                    result = await task
+                    logger.info(f"[slot {slot}] Job {job['id']} finished: {result}")
+                except asyncio.CancelledError:
+                    if job['id'] not in self._lost:
+                        raise
+                    self._lost.discard(job['id'])
+                    # 会话可能停在任意页面，下个任务重新登录
+                    stale = collectors.pop(job['platform'], None)
+                    if stale is not None:
+                        try:
+                            await close_collector(stale)
+                        except Exception as e:
+                            logger.warning(f"Error closing collector: {e}")
+                except Exception as e:
+                    logger.error(f"[slot {slot}] Job {job['id']} crashed: {e}")
+                    db.update_crawl_job(job['taskId'], job['platform'], 'failed', 0, 0, str(e), job=job)
+                finally:
+                    self._leases.pop(job['id'], None)
+        finally:
+            for collector in collectors.values():
+                try:
+                    await close_collector(collector)
+                except Exception as e:
+                    logger.warning(f"Error closing collector: {e}")
+            db.close()
+
+    async def run(self):
+        """Run until SIGINT/SIGTERM; running jobs are finished before exiting"""
+        self._stopping = asyncio.Event()
+        self._loop = loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+
+        # 先上环再领取任务，其他worker随即把属于本worker的任务留给它
+        self.queue.register(self.worker_id, self.platforms, self.concurrency)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} slots")
+        try:
+            await asyncio.gather(*(self._slot(slot) for slot in range(self.concurrency)))
+        finally:
+            self._heartbeat_stop.set()
+            heartbeat.join()
+            self.close()
+
+    def stop(self):
+        if self._stopping is not None and not self._stopping.is_set():
+            logger.info("Stopping worker after the running jobs")
+            self._stopping.set()
+
+    def close(self):
+        try:
+            self.queue.unregister(self.worker_id)
+        except Exception as e:
+            logger.warning(f"Could not unregister worker: {e}")
+        self.dedupe_index.save()
+        if self.segment_store:
+            self.segment_store.close()
+        self.db.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Collector worker pulling jobs from crawl_jobs")
+    parser.add_argument("--worker-id", help="Worker identity (default: host-pid)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("COLLECTOR_CONCURRENCY", "2")))
+    parser.add_argument("--platforms", help="Only run jobs of these platforms (comma-separated)")
+    parser.add_argument("--lease-seconds", type=int, default=120)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--skip-nlp", action="store_true", help="Skip NLP sentiment analysis")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Do not keep raw results in the local segment store")
+    parser.add_argument("--mock", action="store_true", help="Use mock posts instead of crawling")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("DATABASE_URL not set")
+        return
+
+    worker = CollectorWorker(
+        db_url,
+        worker_id=args.worker_id,
+        concurrency=args.concurrency,
+        platforms=[p.strip() for p in args.platforms.split(',')] if args.platforms else None,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        nlp_url=None if args.skip_nlp else os.getenv("NLP_SERVICE_URL", "http://localhost:8000"),
+        store=not args.no_store,
+        mock=args.mock,
+    )
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
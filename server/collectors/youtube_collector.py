@@ -9,14 +9,44 @@ from typing import List, Dict, Optional
 from datetime import datetime
 
 sys.path.append('/opt/.manus/.sandbox-runtime')
-from data_api import ApiClient
+try:
+    from data_api import ApiClient
+except ImportError:
+    ApiClient = None
+
+from api_cache import CachedApiClient, ResponseCache, get_response_cache
+from rate_limiter import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 class YouTubeCollector:
-    def __init__(self):
-        """Initialize YouTube API client"""
-        self.client = ApiClient()
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Initialize YouTube API client
+        
+        Args:
+            client: Object with call_api(endpoint, query=...) (default: Manus ApiClient,
+                    use StubApiClient for tests and offline runs)
+            cache: Response cache (default: the shared process-wide cache)
+            use_cache: Set to False to always call the upstream API
+        """
+        if client is None:
+            if ApiClient is None:
+                raise ImportError("data_api is not available; pass client=StubApiClient() to run locally")
+            client = ApiClient()
+        self.rate_limiter = get_rate_limiter()
+        # 相同接口和参数在TTL内只请求一次上游，缓存命中不消耗速率配额
+        self.client = CachedApiClient(
+            client,
+            cache=(cache or get_response_cache()) if use_cache else None,
+            platform='youtube',
+            rate_limiter=self.rate_limiter,
+        )
         logger.info("YouTube API client initialized")
 
     def search_videos(
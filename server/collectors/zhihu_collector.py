@@ -12,6 +12,9 @@ from playwright.async_api import async_playwright, Page, Browser
 import os
 from dotenv import load_dotenv
 
+from rate_limiter import ThrottledError, get_rate_limiter
+from scroll_loader import InfiniteScrollLoader
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,8 @@ class ZhihuCollector:
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.is_logged_in = False
+        self.last_scroll_stats: Optional[Dict] = None
+        self.rate_limiter = get_rate_limiter()
         logger.info("ZhihuCollector initialized")
     
     async def start(self):
@@ -116,21 +121,23 @@ class ZhihuCollector:
         try:
             # 访问搜索页面
             search_url = f'https://www.zhihu.com/search?type=content&q={keyword}'
-            await self.page.goto(search_url, wait_until='networkidle')
-            await asyncio.sleep(3)  # 等待内容加载
+            await self.rate_limiter.navigate(self.page, search_url, 'zhihu', self.username)
             
-            # 滚动页面加载更多内容
-            for _ in range(max_results // 10):
-                await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                await asyncio.sleep(2)
+            # 滚动页面直到出现足够的搜索结果或不再有新内容
+            loader = InfiniteScrollLoader(self.page, '.List-item')
+            self.last_scroll_stats = await loader.load(max_results)
             
             # 提取搜索结果
             result_items = await self.page.query_selector_all('.List-item')
+            seen_ids = set()
             
-            for item in result_items[:max_results]:
+            for item in result_items:
+                if len(contents) >= max_results:
+                    break
                 try:
                     content_data = await self._extract_content_data(item)
-                    if content_data:
+                    if content_data and content_data["platformId"] not in seen_ids:
+                        seen_ids.add(content_data["platformId"])
                         contents.append(content_data)
                 except Exception as e:
                     logger.warning(f"Failed to extract content data: {e}")
@@ -139,6 +146,8 @@ class ZhihuCollector:
             logger.info(f"Collected {len(contents)} Zhihu contents for keyword: {keyword}")
             return contents
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error searching Zhihu content: {str(e)}")
             return contents
@@ -238,21 +247,23 @@ class ZhihuCollector:
         
         try:
             url = f'https://www.zhihu.com/question/{question_id}'
-            await self.page.goto(url, wait_until='networkidle')
-            await asyncio.sleep(2)
+            await self.rate_limiter.navigate(self.page, url, 'zhihu', self.username)
             
-            # 滚动加载更多答案
-            for _ in range(max_results // 5):
-                await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                await asyncio.sleep(1)
+            # 滚动加载更多答案，直到数量足够或不再有新答案
+            loader = InfiniteScrollLoader(self.page, '.List-item')
+            self.last_scroll_stats = await loader.load(max_results)
             
             # 提取答案
             answer_items = await self.page.query_selector_all('.List-item')
+            seen_ids = set()
             
-            for item in answer_items[:max_results]:
+            for item in answer_items:
+                if len(answers) >= max_results:
+                    break
                 try:
                     answer_data = await self._extract_content_data(item)
-                    if answer_data:
+                    if answer_data and answer_data["platformId"] not in seen_ids:
+                        seen_ids.add(answer_data["platformId"])
                         answers.append(answer_data)
                 except Exception as e:
                     logger.warning(f"Failed to extract answer: {e}")
@@ -261,6 +272,8 @@ class ZhihuCollector:
             logger.info(f"Collected {len(answers)} answers for question {question_id}")
             return answers
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error getting question answers: {str(e)}")
             return answers
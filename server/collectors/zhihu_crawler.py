@@ -5,13 +5,13 @@ Collects questions, answers, and comments from Zhihu using browser automation
 
 import asyncio
 import logging
-from typing import List, Dict, Optional
-from playwright.async_api import async_playwright, Page, Browser
-import time
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext
 from urllib.parse import urlencode
 import re
-import json
+
+from rate_limiter import ThrottledError, get_rate_limiter
+from scroll_loader import InfiniteScrollLoader
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +29,11 @@ class ZhihuCrawler:
         self.password = password
         self.headless = headless
         self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.base_url = "https://www.zhihu.com"
+        self.rate_limiter = get_rate_limiter()
+        self.last_scroll_stats: Optional[Dict] = None
         logger.info("ZhihuCrawler initialized")
 
     async def login(self) -> bool:
@@ -96,7 +99,7 @@ class ZhihuCrawler:
             }
             search_url = f"{self.base_url}/search?{urlencode(params)}"
             
-            await self.page.goto(search_url, wait_until="networkidle")
+            await self.rate_limiter.navigate(self.page, search_url, "zhihu", self.username)
             
             questions = []
             page_num = 1
@@ -133,6 +136,8 @@ class ZhihuCrawler:
             logger.info(f"Collected {len(questions)} questions for keyword: {keyword}")
             return questions[:max_results]
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error searching questions: {str(e)}")
             return []
@@ -140,7 +145,8 @@ class ZhihuCrawler:
     async def get_question_answers(
         self,
         question_url: str,
-        max_answers: int = 10
+        max_answers: int = 10,
+        page: Optional[Page] = None
     ) -> List[Dict]:
         """
         Get answers and comments for a specific question
@@ -148,40 +154,136 @@ class ZhihuCrawler:
         Args:
             question_url: URL of the question
             max_answers: Maximum number of answers to collect
+            page: Page to load the question in (defaults to the main page)
             
         Returns:
             List of answer dictionaries with comments
         """
+        answers, self.last_scroll_stats = await self._question_answers(question_url, max_answers, page or self.page)
+        return answers
+
+    async def _question_answers(
+        self,
+        question_url: str,
+        max_answers: int,
+        page: Page
+    ) -> Tuple[List[Dict], Optional[Dict]]:
+        """get_question_answers() returning the page's scroll stats instead of storing them"""
+        scroll_stats = None
         try:
-            await self.page.goto(question_url, wait_until="networkidle")
+            await self.rate_limiter.navigate(page, question_url, "zhihu", self.username)
             
             answers = []
+            seen_ids = set()
             
-            # Scroll to load more answers
-            for _ in range(max_answers // 5):
-                await self.page.evaluate("window.scrollBy(0, window.innerHeight)")
-                await asyncio.sleep(1)
-                
-                answer_elements = await self.page.query_selector_all(".Answer")
+            # Scroll until enough answers are loaded or no new answers appear
+            loader = InfiniteScrollLoader(page, ".Answer")
+            scroll_stats = await loader.load(max_answers)
+            
+            answer_elements = await page.query_selector_all(".Answer")
+            
+            for element in answer_elements:
+                if len(answers) >= max_answers:
+                    break
                 
-                for element in answer_elements:
-                    if len(answers) >= max_answers:
-                        break
-                    
-                    try:
-                        answer_data = await self._extract_answer_data(element)
-                        if answer_data:
-                            answers.append(answer_data)
-                    except Exception as e:
-                        logger.warning(f"Error extracting answer: {str(e)}")
-                        continue
+                try:
+                    answer_data = await self._extract_answer_data(element)
+                    if answer_data and answer_data["platformId"] not in seen_ids:
+                        seen_ids.add(answer_data["platformId"])
+                        answers.append(answer_data)
+                except Exception as e:
+                    logger.warning(f"Error extracting answer: {str(e)}")
+                    continue
             
             logger.info(f"Collected {len(answers)} answers from question")
-            return answers[:max_answers]
+            return answers[:max_answers], scroll_stats
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error getting question answers: {str(e)}")
+            return [], scroll_stats
+
+    async def get_answers_for_questions(
+        self,
+        question_urls: List[str],
+        max_answers: int = 10,
+        concurrency: int = 3
+    ) -> List[List[Dict]]:
+        """
+        Get answers for many questions concurrently using a bounded pool of pages
+        
+        All pages belong to the logged-in browser context, so they share the
+        session cookies. Navigations share the per-account zhihu rate budget.
+        
+        Args:
+            question_urls: Question URLs to fetch
+            max_answers: Maximum number of answers per question
+            concurrency: Maximum number of pages loading at the same time
+            
+        Returns:
+            One answer list per question, in the same order as `question_urls`;
+            last_scroll_stats holds the totals and the per-question stats
+        """
+        if not question_urls:
             return []
+        
+        pool_size = max(1, min(concurrency, len(question_urls)))
+        page_pool: asyncio.Queue = asyncio.Queue()
+        extra_pages = []
+        
+        page_pool.put_nowait(self.page)
+        for _ in range(pool_size - 1):
+            try:
+                extra_page = await self.context.new_page()
+            except Exception as e:
+                logger.warning(f"Error opening extra page, using {len(extra_pages) + 1} page(s): {str(e)}")
+                break
+            extra_pages.append(extra_page)
+            page_pool.put_nowait(extra_page)
+        
+        async def fetch(question_url: str) -> Tuple[List[Dict], Optional[Dict]]:
+            page = await page_pool.get()
+            try:
+                return await self._question_answers(question_url, max_answers, page)
+            finally:
+                page_pool.put_nowait(page)
+        
+        tasks = [asyncio.ensure_future(fetch(url)) for url in question_urls]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # 某个问题被风控时其余抓取一并停止，再关闭页面
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for extra_page in extra_pages:
+                try:
+                    await extra_page.close()
+                except Exception:
+                    pass
+        
+        # 各问题并发滚动，统计按问题分别保存再汇总，避免互相覆盖
+        per_question = [stats for _, stats in results]
+        loaded = [stats for stats in per_question if stats]
+        scrolls = sum(stats["scrolls"] for stats in loaded)
+        productive = sum(stats["productive_scrolls"] for stats in loaded)
+        self.last_scroll_stats = {
+            "items": sum(stats["items"] for stats in loaded),
+            "target": max_answers * len(question_urls),
+            "scrolls": scrolls,
+            "productive_scrolls": productive,
+            "efficiency": round(productive / scrolls, 3) if scrolls else 1.0,
+            "xhr_responses": sum(stats["xhr_responses"] for stats in loaded),
+            "elapsed": max((stats["elapsed"] for stats in loaded), default=0.0),
+            "questions": dict(zip(question_urls, per_question)),
+        }
+        
+        logger.info(
+            f"Collected answers for {len(question_urls)} questions "
+            f"with {len(extra_pages) + 1} page(s)"
+        )
+        return [answers for answers, _ in results]
 
     async def _extract_question_data(self, element) -> Optional[Dict]:
         """
@@ -322,32 +424,35 @@ class ZhihuCrawler:
             List of answer dictionaries
         """
         try:
-            await self.page.goto(user_url, wait_until="networkidle")
+            await self.rate_limiter.navigate(self.page, user_url, "zhihu", self.username)
             
             answers = []
+            seen_ids = set()
             
-            # Scroll to load more answers
-            for _ in range(max_results // 10):
-                await self.page.evaluate("window.scrollBy(0, window.innerHeight)")
-                await asyncio.sleep(1)
-                
-                answer_elements = await self.page.query_selector_all(".Answer")
+            # Scroll until enough answers are loaded or no new answers appear
+            loader = InfiniteScrollLoader(self.page, ".Answer")
+            self.last_scroll_stats = await loader.load(max_results)
+            
+            answer_elements = await self.page.query_selector_all(".Answer")
+            
+            for element in answer_elements:
+                if len(answers) >= max_results:
+                    break
                 
-                for element in answer_elements:
-                    if len(answers) >= max_results:
-                        break
-                    
-                    try:
-                        answer_data = await self._extract_answer_data(element)
-                        if answer_data:
-                            answers.append(answer_data)
-                    except Exception as e:
-                        logger.warning(f"Error extracting answer: {str(e)}")
-                        continue
+                try:
+                    answer_data = await self._extract_answer_data(element)
+                    if answer_data and answer_data["platformId"] not in seen_ids:
+                        seen_ids.add(answer_data["platformId"])
+                        answers.append(answer_data)
+                except Exception as e:
+                    logger.warning(f"Error extracting answer: {str(e)}")
+                    continue
             
             logger.info(f"Collected {len(answers)} answers from user")
             return answers[:max_results]
             
+        except ThrottledError:
+            raise
         except Exception as e:
             logger.error(f"Error getting user answers: {str(e)}")
             return []
@@ -357,7 +462,8 @@ class ZhihuCrawler:
         try:
             playwright = await async_playwright().start()
             self.browser = await playwright.chromium.launch(headless=self.headless)
-            self.page = await self.browser.new_page()
+            self.context = await self.browser.new_context()
+            self.page = await self.context.new_page()
             logger.info("Browser started successfully")
         except Exception as e:
             logger.error(f"Error starting browser: {str(e)}")
@@ -368,6 +474,8 @@ class ZhihuCrawler:
         try:
             if self.page:
                 await self.page.close()
+            if self.context:
+                await self.context.close()
             if self.browser:
                 await self.browser.close()
             logger.info("Browser closed")
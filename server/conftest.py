@@ -0,0 +1,19 @@
+"""
+pytest setup for the Python services
+The collector and NLP scripts import their siblings by bare module name (they put
+server/ and server/nlp on sys.path themselves when run as scripts), so the same
+directories go on sys.path before any test module is collected
+"""
+
+import os
+import sys
+
+_SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+for _path in (
+    _SERVER_DIR,
+    os.path.join(_SERVER_DIR, "collectors"),
+    os.path.join(_SERVER_DIR, "nlp"),
+):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -1,6 +1,6 @@
-import { eq, desc, and, gte, lte, count, sum } from "drizzle-orm";
+import { eq, desc, and, gte, lte, count, sum, sql } from "drizzle-orm";
 import { drizzle } from "drizzle-orm/mysql2";
-import { InsertUser, users, monitoringTasks, comments, sentimentAnalysis, sentimentStats, crawlJobs, InsertMonitoringTask, InsertComment, InsertSentimentAnalysis, InsertSentimentStats, InsertCrawlJob } from "../drizzle/schema";
+import { InsertUser, users, monitoringTasks, comments, sentimentAnalysis, sentimentStats, sentimentAlerts, crawlJobs, crawlWorkers, InsertMonitoringTask, InsertComment, InsertSentimentAnalysis, InsertSentimentStats, InsertCrawlJob } from "../drizzle/schema";
 import { ENV } from './_core/env';
 
 let _db: ReturnType<typeof drizzle> | null = null;
@@ -196,6 +196,53 @@ export async function getSentimentAnalysisByTaskId(taskId: number) {
   .orderBy(desc(sentimentAnalysis.analyzedAt));
 }
 
+/**
+ * Aggregate per-comment aspect sentiment (aspectScores JSON) for a task
+ * The JSON objects are expanded with JSON_TABLE and grouped in MySQL, so only the
+ * topK aspect rows leave the database
+ */
+export async function getAspectSentimentByTaskId(taskId: number, topK = 30) {
+  const db = await getDb();
+  if (!db) return [];
+  const [rows] = await db.execute(sql`
+    SELECT
+      a.word AS word,
+      COUNT(*) AS mentions,
+      SUM(a.score) AS scoreSum,
+      SUM(a.score > 0) AS positive,
+      SUM(a.score < 0) AS negative
+    FROM (
+      SELECT
+        k.word AS word,
+        CAST(JSON_EXTRACT(sa.aspectScores, CONCAT('$.', JSON_QUOTE(k.word))) AS DECIMAL(10,4)) AS score
+      FROM ${sentimentAnalysis} sa
+      INNER JOIN ${comments} c ON c.id = sa.commentId
+      CROSS JOIN JSON_TABLE(
+        JSON_KEYS(IF(JSON_VALID(sa.aspectScores), sa.aspectScores, NULL)),
+        '$[*]' COLUMNS (word VARCHAR(64) PATH '$')
+      ) k
+      WHERE c.taskId = ${taskId} AND sa.aspectScores IS NOT NULL
+    ) a
+    GROUP BY a.word
+    ORDER BY mentions DESC, a.word
+    LIMIT ${topK}
+  `) as unknown as [Array<{ word: string; mentions: number; scoreSum: string | number; positive: string | number; negative: string | number }>];
+
+  // mysql2 returns SUM() results as strings
+  return rows.map((row) => {
+    const mentions = Number(row.mentions);
+    const scoreSum = Number(row.scoreSum);
+    return {
+      word: row.word,
+      mentions,
+      scoreSum,
+      positive: Number(row.positive),
+      negative: Number(row.negative),
+      averageScore: scoreSum / mentions,
+    };
+  });
+}
+
 // ==================== Sentiment Stats ====================
 
 export async function createSentimentStats(stats: InsertSentimentStats) {
@@ -204,21 +251,55 @@ export async function createSentimentStats(stats: InsertSentimentStats) {
   return await db.insert(sentimentStats).values(stats);
 }
 
-export async function getSentimentStatsByTaskId(taskId: number, startDate?: Date, endDate?: Date) {
+export async function getSentimentStatsByTaskId(
+  taskId: number,
+  startDate?: Date,
+  endDate?: Date,
+  options: { granularity?: "day" | "hour"; platform?: string } = {}
+) {
   const db = await getDb();
   if (!db) return [];
-  
+
+  // 默认读取按天、全平台汇总的桶
+  const conditions = [
+    eq(sentimentStats.taskId, taskId),
+    eq(sentimentStats.granularity, options.granularity ?? "day"),
+    eq(sentimentStats.platform, options.platform ?? "all"),
+  ];
   if (startDate && endDate) {
-    return await db.select().from(sentimentStats)
-      .where(and(eq(sentimentStats.taskId, taskId), gte(sentimentStats.date, startDate), lte(sentimentStats.date, endDate)))
-      .orderBy(sentimentStats.date);
+    conditions.push(gte(sentimentStats.date, startDate), lte(sentimentStats.date, endDate));
   }
-  
+
   return await db.select().from(sentimentStats)
-    .where(eq(sentimentStats.taskId, taskId))
+    .where(and(...conditions))
     .orderBy(sentimentStats.date);
 }
 
+// ==================== Sentiment Alerts ====================
+
+export async function getSentimentAlertsByTaskId(taskId: number, limit = 100, includeAcknowledged = false) {
+  const db = await getDb();
+  if (!db) return [];
+
+  const conditions = [eq(sentimentAlerts.taskId, taskId)];
+  if (!includeAcknowledged) {
+    conditions.push(eq(sentimentAlerts.acknowledged, false));
+  }
+
+  return await db.select().from(sentimentAlerts)
+    .where(and(...conditions))
+    .orderBy(desc(sentimentAlerts.bucketStart))
+    .limit(limit);
+}
+
+export async function acknowledgeSentimentAlert(taskId: number, alertId: number) {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+  return await db.update(sentimentAlerts)
+    .set({ acknowledged: true })
+    .where(and(eq(sentimentAlerts.id, alertId), eq(sentimentAlerts.taskId, taskId)));
+}
+
 // ==================== Crawl Jobs ====================
 
 export async function createCrawlJob(job: InsertCrawlJob) {
@@ -227,6 +308,46 @@ export async function createCrawlJob(job: InsertCrawlJob) {
   return await db.insert(crawlJobs).values(job);
 }
 
+/**
+ * 把采集任务放入crawl_jobs队列，由常驻worker领取执行；
+ * 同一任务/平台已有排队或运行中的任务时直接返回它。
+ * 唯一键(taskId, platform, active)保证并发入队只有一条插入成功，其余返回已有任务
+ */
+export async function enqueueCrawlJob(taskId: number, platform: string, keyword: string, maxResults: number): Promise<number> {
+  const db = await getDb();
+  if (!db) throw new Error("Database not available");
+  try {
+    const result = await db.insert(crawlJobs).values({ taskId, platform, keyword, maxResults, status: "pending" });
+    return result[0].insertId;
+  } catch (error) {
+    const code = (error as { cause?: { code?: string }; code?: string }).cause?.code ?? (error as { code?: string }).code;
+    if (code !== "ER_DUP_ENTRY") throw error;
+  }
+  const existing = await db.select({ id: crawlJobs.id }).from(crawlJobs)
+    .where(and(
+      eq(crawlJobs.taskId, taskId),
+      eq(crawlJobs.platform, platform),
+      eq(crawlJobs.active, 1),
+    ))
+    .limit(1);
+  // 活动任务恰好在插入和查询之间结束时重试插入
+  return existing.length > 0 ? existing[0].id : enqueueCrawlJob(taskId, platform, keyword, maxResults);
+}
+
+/**
+ * 没有在线采集worker的平台：worker每隔租约的三分之一心跳一次，
+ * 超过一个租约（默认120秒）未心跳即视为离线，排到这些平台的任务不会被领取
+ */
+export async function getPlatformsWithoutWorkers(platforms: string[], leaseSeconds = 120) {
+  const db = await getDb();
+  if (!db) return platforms;
+  const workers = await db.select({ platforms: crawlWorkers.platforms }).from(crawlWorkers)
+    .where(gte(crawlWorkers.heartbeatAt, sql`NOW() - INTERVAL ${leaseSeconds} SECOND`));
+  return platforms.filter(platform => !workers.some(
+    worker => worker.platforms === null || worker.platforms.split(",").includes(platform)
+  ));
+}
+
 export async function getCrawlJobsByTaskId(taskId: number) {
   const db = await getDb();
   if (!db) return [];
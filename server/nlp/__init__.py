@@ -3,8 +3,11 @@ Natural Language Processing package for Chinese text analysis
 """
 
 from .sentiment_analyzer import ChineseSentimentAnalyzer, ChineseKeywordExtractor
+from .text_normalizer import TextNormalizer, normalize_text
 
 __all__ = [
     "ChineseSentimentAnalyzer",
     "ChineseKeywordExtractor",
+    "TextNormalizer",
+    "normalize_text",
 ]
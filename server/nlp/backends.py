@@ -0,0 +1,433 @@
+"""
+Pluggable sentiment backends
+The lexicon rule engine and a CPU transformer model share one batch interface; the
+transformer backend batches texts by length and falls back to the rule engine when
+the model or its runtime is not available
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import jieba
+
+try:
+    from .lexicon_engine import LexiconScorer
+    from .lexicon_manager import LexiconBundle, LexiconManager, get_lexicon_manager
+except ImportError:
+    from lexicon_engine import LexiconScorer
+    from lexicon_manager import LexiconBundle, LexiconManager, get_lexicon_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "uer/roberta-base-finetuned-jd-binary-chinese"
+
+
+class SentimentBackend(abc.ABC):
+    """情感分析后端接口"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def analyze_batch(self, texts: Sequence[str]) -> List[Dict]:
+        """
+        Analyze texts
+
+        Returns:
+            One result per text, in order, each with sentiment, score, confidence and backend
+        """
+
+    def analyze(self, text: str) -> Dict:
+        return self.analyze_batch([text])[0]
+
+    def stats(self) -> Dict:
+        """Backend counters for monitoring"""
+        return {}
+
+    @staticmethod
+    def neutral_result(error: Optional[str] = None) -> Dict:
+        result = {"sentiment": "neutral", "score": 0.5, "confidence": 0.0}
+        if error:
+            result["error"] = error
+        return result
+
+
+class LexiconBackend(SentimentBackend):
+    """基于词典规则的后端（jieba分词 + 单遍打分）"""
+
+    name = "lexicon"
+
+    def __init__(self, lexicon_manager: Optional[LexiconManager] = None, with_aspects: bool = True):
+        """
+        Args:
+            lexicon_manager: Lexicon resources (default: process-wide manager)
+            with_aspects: Attribute sentiment to content words in the same pass
+        """
+        self.lexicon_manager = lexicon_manager or get_lexicon_manager()
+        self.with_aspects = with_aspects
+        self._bundle: Optional[LexiconBundle] = None
+        self._scorer: Optional[LexiconScorer] = None
+
+    def resources(self) -> Tuple[LexiconBundle, LexiconScorer]:
+        """当前版本的资源及对应打分器（热更新后自动切换）"""
+        bundle = self.lexicon_manager.get()
+        scorer = self._scorer
+        if bundle is not self._bundle or scorer is None:
+            scorer = LexiconScorer(bundle.lexicon, stopwords=bundle.stopwords)
+            self._bundle, self._scorer = bundle, scorer
+        return bundle, scorer
+
+    def analyze_batch(self, texts: Sequence[str]) -> List[Dict]:
+        bundle, scorer = self.resources()
+        cut = jieba.cut
+        results = scorer.analyze_batch((cut(text) for text in texts), self.with_aspects)
+        for result in results:
+            result["lexicon_version"] = bundle.version
+            result["backend"] = self.name
+        return results
+
+
+def truncate_ids(ids: List[int], max_tokens: int, policy: str = "head_tail", head_ratio: float = 0.25) -> List[int]:
+    """
+    Cut token IDs (without special tokens) to at most max_tokens
+
+    Args:
+        ids: Token IDs
+        max_tokens: Budget left after special tokens
+        policy: "head" keeps the beginning, "tail" the end, "head_tail" both ends
+        head_ratio: Share of the budget kept from the beginning for "head_tail"
+    """
+    if len(ids) <= max_tokens:
+        return ids
+    if policy == "head":
+        return ids[:max_tokens]
+    if policy == "tail":
+        return ids[-max_tokens:]
+    head = int(max_tokens * head_ratio)
+    tail = max_tokens - head
+    return ids[:head] + ids[-tail:]
+
+
+def length_buckets(lengths: Sequence[int], max_batch_size: int, max_batch_tokens: int) -> List[List[int]]:
+    """
+    Group indices into batches of similar length
+
+    Indices are sorted by length and cut into batches whose padded size
+    (batch size * longest sequence) stays within max_batch_tokens, so short texts
+    are not padded to the length of the longest text in the request.
+
+    Returns:
+        Batches of indices into `lengths`
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in order:
+        # 排序后当前长度即为批内最大长度
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class TransformerBackend(SentimentBackend):
+    """CPU推理的Transformer后端（ONNX Runtime优先，其次PyTorch）"""
+
+    name = "transformer"
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        max_length: int = 256,
+        truncation: str = "head_tail",
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 4096,
+        num_threads: Optional[int] = None,
+        quantize: bool = True,
+    ):
+        """
+        Load tokenizer and model
+
+        If `model_path` contains model.onnx and onnxruntime is installed, the ONNX graph
+        is used; otherwise the PyTorch model is loaded and, with `quantize`, its Linear
+        layers are dynamically quantized to int8.
+
+        Args:
+            model_path: Local directory or Hugging Face model ID (default: NLP_MODEL_PATH)
+            max_length: Maximum sequence length including special tokens
+            truncation: Truncation policy for longer texts ("head", "tail", "head_tail")
+            max_batch_size: Maximum texts per forward pass
+            max_batch_tokens: Maximum padded tokens per forward pass
+            num_threads: Intra-op CPU threads (default: NLP_NUM_THREADS or runtime default)
+            quantize: Apply dynamic int8 quantization to the PyTorch model
+
+        Raises:
+            ImportError: transformers or the inference runtime is not installed
+            OSError: the model cannot be found
+        """
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.model_path = model_path or os.getenv("NLP_MODEL_PATH", DEFAULT_MODEL)
+        self.max_length = max_length
+        self.truncation = truncation
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        threads = num_threads or int(os.getenv("NLP_NUM_THREADS", "0")) or None
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        config = AutoConfig.from_pretrained(self.model_path)
+        self.labels = self._label_kinds(config.id2label)
+
+        self.session = None
+        self.model = None
+        onnx_file = os.path.join(self.model_path, "model.onnx")
+        if os.path.exists(onnx_file):
+            try:
+                import onnxruntime as ort
+
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if threads:
+                    options.intra_op_num_threads = threads
+                self.session = ort.InferenceSession(
+                    onnx_file, options, providers=["CPUExecutionProvider"]
+                )
+                self.input_names = {i.name for i in self.session.get_inputs()}
+                self.runtime = "onnxruntime"
+            except ImportError:
+                logger.info("onnxruntime not installed, using PyTorch")
+
+        if self.session is None:
+            import torch
+            from transformers import AutoModelForSequenceClassification
+
+            if threads:
+                torch.set_num_threads(threads)
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+            model.eval()
+            if quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model = model
+            self.runtime = "torch-int8" if quantize else "torch"
+
+        logger.info(f"Transformer backend loaded: {self.model_path} ({self.runtime})")
+
+    @staticmethod
+    def _label_kinds(id2label: Dict) -> List[str]:
+        """Map model labels to positive/negative/neutral"""
+        names = [str(id2label[i]).lower() for i in sorted(id2label)]
+        kinds = []
+        for index, name in enumerate(names):
+            if "pos" in name or "正" in name:
+                kinds.append("positive")
+            elif "neg" in name or "负" in name:
+                kinds.append("negative")
+            elif "neu" in name or "中" in name:
+                kinds.append("neutral")
+            elif len(names) == 2:
+                # 二分类模型的LABEL_0/LABEL_1约定为负面/正面
+                kinds.append("negative" if index == 0 else "positive")
+            else:
+                kinds.append("neutral")
+        return kinds
+
+    def _encode(self, text: str) -> List[int]:
+        ids = self.tokenizer.encode(text, add_special_tokens=False)
+        budget = self.max_length - self.tokenizer.num_special_tokens_to_add()
+        ids = truncate_ids(ids, budget, self.truncation)
+        return self.tokenizer.build_inputs_with_special_tokens(ids)
+
+    def _forward(self, sequences: List[List[int]]):
+        """Run one padded batch, returning class probabilities as a NumPy array"""
+        import numpy as np
+
+        width = max(len(seq) for seq in sequences)
+        pad_id = self.tokenizer.pad_token_id or 0
+        input_ids = np.full((len(sequences), width), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+        for row, seq in enumerate(sequences):
+            input_ids[row, :len(seq)] = seq
+            attention_mask[row, :len(seq)] = 1
+
+        if self.session is not None:
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            logits = self.session.run(None, feeds)[0]
+        else:
+            import torch
+
+            with torch.inference_mode():
+                logits = self.model(
+                    input_ids=torch.from_numpy(input_ids),
+                    attention_mask=torch.from_numpy(attention_mask),
+                ).logits.numpy()
+
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _to_result(self, probs) -> Dict:
+        positive = sum(float(p) for p, kind in zip(probs, self.labels) if kind == "positive")
+        neutral = sum(float(p) for p, kind in zip(probs, self.labels) if kind == "neutral")
+        score = positive + 0.5 * neutral
+        return {
+            "sentiment": self.labels[int(probs.argmax())],
+            "score": score,
+            "confidence": abs(score - 0.5) * 2,
+            "backend": self.name,
+        }
+
+    def analyze_batch(self, texts: Sequence[str]) -> List[Dict]:
+        sequences = [self._encode(text) for text in texts]
+        results: List[Optional[Dict]] = [None] * len(texts)
+        for batch in length_buckets([len(s) for s in sequences], self.max_batch_size, self.max_batch_tokens):
+            probs = self._forward([sequences[i] for i in batch])
+            for row, i in enumerate(batch):
+                results[i] = self._to_result(probs[row])
+        return results
+
+
+class CascadeBackend(SentimentBackend):
+    """级联路由：先用词典规则，低置信度的文本再交给重模型"""
+
+    name = "cascade"
+
+    def __init__(self, cheap: SentimentBackend, heavy: SentimentBackend, threshold: float = 0.4):
+        """
+        Initialize cascade
+
+        Args:
+            cheap: First-stage backend run on every text
+            heavy: Second-stage backend run only on escalated texts
+            threshold: Texts whose first-stage confidence is below this are escalated
+        """
+        self.cheap = cheap
+        self.heavy = heavy
+        self.threshold = threshold
+        self._counters = {"texts": 0, "cheap_only": 0, "escalated": 0, "heavy_batches": 0, "heavy_failures": 0}
+        self._lock = threading.Lock()
+
+    def analyze_batch(self, texts: Sequence[str]) -> List[Dict]:
+        results = self.cheap.analyze_batch(texts)
+        escalate = [i for i, result in enumerate(results) if result["confidence"] < self.threshold]
+
+        heavy_failed = False
+        if escalate:
+            # 同一批中需要升级的文本合并成一次重模型调用
+            try:
+                heavy_results = self.heavy.analyze_batch([texts[i] for i in escalate])
+            except Exception as e:
+                logger.error(f"Cascade {self.heavy.name} stage failed, keeping {self.cheap.name} results: {e}")
+                heavy_failed = True
+            else:
+                for i, result in zip(escalate, heavy_results):
+                    result["cascade_confidence"] = results[i]["confidence"]
+                    # 重模型只给出整体情感，保留词典阶段的方面归因
+                    for key in ("lexicon_version", "aspects"):
+                        if key in results[i]:
+                            result.setdefault(key, results[i][key])
+                    results[i] = result
+
+        with self._lock:
+            self._counters["texts"] += len(texts)
+            if heavy_failed:
+                self._counters["heavy_failures"] += 1
+                self._counters["cheap_only"] += len(texts)
+            else:
+                self._counters["cheap_only"] += len(texts) - len(escalate)
+                self._counters["escalated"] += len(escalate)
+                if escalate:
+                    self._counters["heavy_batches"] += 1
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["threshold"] = self.threshold
+        counters["escalation_rate"] = counters["escalated"] / counters["texts"] if counters["texts"] else 0.0
+        return counters
+
+
+class MicroBatcher:
+    """把并发的单条请求合并成批次交给后端"""
+
+    def __init__(self, backend, max_batch_size: int = 32, max_wait: float = 0.01):
+        """
+        Initialize batcher
+
+        Args:
+            backend: Object with analyze_batch(texts), run in a worker thread
+            max_batch_size: Maximum requests merged into one call
+            max_wait: Seconds to wait for more requests after the first one arrives
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def analyze(self, text: str) -> Dict:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in items]
+            try:
+                results = await loop.run_in_executor(None, self.backend.analyze_batch, texts)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def create_backend(name: Optional[str] = None, lexicon_manager: Optional[LexiconManager] = None) -> SentimentBackend:
+    """
+    Build the configured backend
+
+    Args:
+        name: "lexicon", "transformer", "auto" or "cascade" (default: NLP_BACKEND or
+            "lexicon"); model-based choices fall back to the lexicon engine if the
+            model cannot be loaded. "cascade" escalates texts whose lexicon confidence
+            is below NLP_CASCADE_THRESHOLD (default 0.4) to the transformer
+        lexicon_manager: Lexicon resources for the rule engine
+    """
+    name = (name or os.getenv("NLP_BACKEND", "lexicon")).lower()
+    if name in ("transformer", "auto", "cascade"):
+        try:
+            heavy = TransformerBackend()
+        except Exception as e:
+            logger.warning(f"Transformer backend unavailable, falling back to lexicon rules: {e}")
+        else:
+            if name != "cascade":
+                return heavy
+            threshold = float(os.getenv("NLP_CASCADE_THRESHOLD", "0.4"))
+            return CascadeBackend(LexiconBackend(lexicon_manager), heavy, threshold)
+    return LexiconBackend(lexicon_manager)
@@ -0,0 +1,361 @@
+"""
+Lexicon-based sentiment scoring engine
+Weighted sentiment words, negators, intensifiers and contrast (转折) markers are loaded
+from lexicon files, compiled into a single lookup table and evaluated in one linear
+pass over the tokens
+"""
+
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicons")
+
+# 词条类型
+SENTIMENT = 0
+NEGATOR = 1
+INTENSIFIER = 2
+CONTRAST = 3
+BOUNDARY = 4
+
+# 分句边界：否定和程度修饰不跨越这些标点
+CLAUSE_BOUNDARIES = "，。！？；,.!?;…\n"
+
+Entry = Tuple[int, float, float]
+
+
+def aspects_json(aspects: Optional[Dict[str, float]]) -> Optional[str]:
+    """
+    Serialize aspect scores for the sentiment_analysis.aspectScores column
+
+    Args:
+        aspects: Aspect word -> sentiment contribution, as returned by the analyzers
+
+    Returns:
+        Compact JSON object, or None when there are no aspects
+    """
+    # 方面情感以紧凑JSON存储：{"词": 贡献值}
+    if not aspects:
+        return None
+    return json.dumps(aspects, ensure_ascii=False, separators=(",", ":"))
+
+
+def read_lexicon_file(path: str, columns: int = 1) -> Dict[str, Tuple[float, ...]]:
+    """
+    Read a tab-separated lexicon file
+
+    Lines are `word<TAB>value...`; blank lines and lines starting with # are ignored.
+
+    Args:
+        path: Lexicon file path
+        columns: Number of numeric columns expected after the word
+
+    Returns:
+        Mapping of word to its numeric values (missing values are None)
+    """
+    entries: Dict[str, Tuple[float, ...]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split("\t") if "\t" in line else line.split()
+            word, values = parts[0], parts[1:1 + columns]
+            try:
+                numbers = tuple(float(v) for v in values)
+            except ValueError:
+                logger.warning(f"Skipping malformed line {line_no} in {path}: {line}")
+                continue
+            entries[word] = numbers + (None,) * (columns - len(numbers))
+    return entries
+
+
+class CompiledLexicon:
+    """编译后的只读词典：词 -> 词条序列"""
+
+    def __init__(
+        self,
+        sentiment: Mapping[str, float],
+        negators: Iterable[str] = (),
+        intensifiers: Optional[Mapping[str, float]] = None,
+        contrast: Optional[Mapping[str, Tuple[float, float]]] = None,
+        max_cache_entries: int = 200000,
+    ):
+        """
+        Compile lexicon resources into one lookup table
+
+        Args:
+            sentiment: Word -> weight (positive or negative)
+            negators: Words that flip the polarity of the next sentiment word
+            intensifiers: Word -> multiplier for the next sentiment word
+            contrast: Word -> (weight of preceding text, weight of following text)
+            max_cache_entries: Bound on memoized decompositions of unknown tokens
+        """
+        table: Dict[str, Tuple[Entry, ...]] = {}
+        for char in CLAUSE_BOUNDARIES:
+            table[char] = ((BOUNDARY, 0.0, 0.0),)
+        for word, (before, after) in (contrast or {}).items():
+            table[word] = ((CONTRAST, before, after),)
+        for word, multiplier in (intensifiers or {}).items():
+            table[word] = ((INTENSIFIER, multiplier, 0.0),)
+        for word in negators:
+            table[word] = ((NEGATOR, 0.0, 0.0),)
+        for word, weight in sentiment.items():
+            table[word] = ((SENTIMENT, weight, 0.0),)
+
+        self.table = MappingProxyType(table)
+        self.sentiment_words = frozenset(sentiment)
+        # 可作为复合词前缀拆分的修饰词，如"不好"、"很差"、"不太满意"
+        self._modifiers = tuple(sorted(
+            (w for w in table if table[w][0][0] in (NEGATOR, INTENSIFIER)),
+            key=len,
+            reverse=True,
+        ))
+        self._resolved: Dict[str, Tuple[Entry, ...]] = {}
+        self.max_cache_entries = max_cache_entries
+
+    @classmethod
+    def from_directory(cls, path: str = DEFAULT_LEXICON_DIR) -> "CompiledLexicon":
+        """
+        Load sentiment.txt, negators.txt, intensifiers.txt and contrast.txt from a directory
+        """
+        def optional(name: str, columns: int) -> Dict[str, Tuple[float, ...]]:
+            file_path = os.path.join(path, name)
+            return read_lexicon_file(file_path, columns) if os.path.exists(file_path) else {}
+
+        sentiment = {w: v[0] for w, v in read_lexicon_file(os.path.join(path, "sentiment.txt")).items()
+                     if v[0] is not None}
+        negators = list(optional("negators.txt", 0))
+        intensifiers = {w: v[0] if v[0] is not None else 1.5
+                        for w, v in optional("intensifiers.txt", 1).items()}
+        contrast = {w: (v[0] if v[0] is not None else 0.5, v[1] if v[1] is not None else 1.5)
+                    for w, v in optional("contrast.txt", 2).items()}
+
+        lexicon = cls(sentiment, negators, intensifiers, contrast)
+        logger.info(
+            f"Lexicon loaded from {path}: {len(sentiment)} sentiment words, "
+            f"{len(negators)} negators, {len(intensifiers)} intensifiers, {len(contrast)} contrast markers"
+        )
+        return lexicon
+
+    def lookup(self, token: str) -> Tuple[Entry, ...]:
+        """
+        Entries for a token
+
+        Tokens missing from the table are split into modifier prefixes plus a known
+        word ("不太满意" -> 不太 + 满意) so the result does not depend on how the
+        tokenizer happened to merge them. Decompositions are memoized.
+        """
+        entries = self.table.get(token)
+        if entries is not None:
+            return entries
+        entries = self._resolved.get(token)
+        if entries is not None:
+            return entries
+
+        entries = self._decompose(token)
+        if len(self._resolved) >= self.max_cache_entries:
+            self._resolved.clear()
+        self._resolved[token] = entries
+        return entries
+
+    def _decompose(self, token: str, depth: int = 0) -> Tuple[Entry, ...]:
+        if depth >= 3 or len(token) < 2:
+            return ()
+        for prefix in self._modifiers:
+            if len(prefix) < len(token) and token.startswith(prefix):
+                rest = token[len(prefix):]
+                tail = self.table.get(rest) or self._decompose(rest, depth + 1)
+                if tail:
+                    return self.table[prefix] + tail
+        return ()
+
+
+class LexiconScorer:
+    """基于否定、程度和转折规则的单遍情感打分"""
+
+    def __init__(
+        self,
+        lexicon: Optional[CompiledLexicon] = None,
+        negation_factor: float = -0.8,
+        saturation: float = 2.0,
+        stopwords: FrozenSet[str] = frozenset(),
+        aspect_window: int = 4,
+        max_aspects: int = 10,
+    ):
+        """
+        Initialize scorer
+
+        Args:
+            lexicon: Compiled lexicon (default: lexicons shipped with the package)
+            negation_factor: Multiplier applied to a negated sentiment word
+            saturation: Raw score at which the output score is halfway to 0 or 1
+            stopwords: Words never treated as aspects
+            aspect_window: Maximum token distance between a sentiment word and an aspect
+            max_aspects: Aspects kept per text (largest absolute contribution first)
+        """
+        self.lexicon = lexicon or CompiledLexicon.from_directory()
+        self.negation_factor = negation_factor
+        self.saturation = saturation
+        self.stopwords = stopwords
+        self.aspect_window = aspect_window
+        self.max_aspects = max_aspects
+
+    def score_tokens(
+        self,
+        tokens: Iterable[str],
+        aspects: Optional[Dict[str, float]] = None,
+    ) -> Tuple[float, float, int]:
+        """
+        Score a token sequence in one pass
+
+        A negator or intensifier modifies the next sentiment word in the same clause.
+        A contrast marker scales everything before it and weights what follows.
+
+        When `aspects` is given, content words in the same clause are collected on the
+        way and, when the clause closes, each sentiment contribution is credited to
+        the nearest aspect within `aspect_window` tokens, preferring one to its left.
+
+        Args:
+            tokens: Token sequence
+            aspects: Dict receiving aspect word -> summed contribution (optional)
+
+        Returns:
+            (positive total, negative total, number of tokens)
+        """
+        table_get = self.lexicon.table.get
+        resolved_get = self.lexicon._resolved.get
+        lookup = self.lexicon.lookup
+        negation_factor = self.negation_factor
+        stopwords = self.stopwords
+        track = aspects is not None
+        clause_aspects: List[Tuple[int, str]] = []
+        clause_values: List[Tuple[int, float]] = []
+
+        positive = negative = 0.0
+        negated = False
+        multiplier = 1.0
+        weight = 1.0
+        count = 0
+
+        for token in tokens:
+            position = count
+            count += 1
+            entries = table_get(token)
+            if entries is None:
+                entries = resolved_get(token)
+                if entries is None:
+                    entries = lookup(token)
+            if track and not entries and len(token) > 1 and token.isalnum() \
+                    and not token.isdigit() and token not in stopwords:
+                clause_aspects.append((position, token))
+            for kind, a, b in entries:
+                if kind == SENTIMENT:
+                    value = a * multiplier * weight
+                    if negated:
+                        value *= negation_factor
+                    if value > 0:
+                        positive += value
+                    else:
+                        negative -= value
+                    if track:
+                        clause_values.append((position, value))
+                    negated = False
+                    multiplier = 1.0
+                elif kind == NEGATOR:
+                    negated = not negated
+                elif kind == INTENSIFIER:
+                    multiplier *= a
+                elif kind == CONTRAST:
+                    positive *= a
+                    negative *= a
+                    if track:
+                        self._attribute(clause_aspects, clause_values, aspects)
+                        for word in aspects:
+                            aspects[word] *= a
+                    weight = b
+                    negated = False
+                    multiplier = 1.0
+                else:
+                    if track:
+                        self._attribute(clause_aspects, clause_values, aspects)
+                    negated = False
+                    multiplier = 1.0
+
+        if track:
+            self._attribute(clause_aspects, clause_values, aspects)
+        return positive, negative, count
+
+    def _attribute(
+        self,
+        clause_aspects: List[Tuple[int, str]],
+        clause_values: List[Tuple[int, float]],
+        aspects: Dict[str, float],
+    ):
+        """Credit the closed clause's contributions to nearby aspects, then reset it"""
+        if clause_aspects and clause_values:
+            window = self.aspect_window
+            for position, value in clause_values:
+                # 中文多为"方面词+评价词"顺序：优先归给左侧最近的方面词，没有再找右侧
+                target = None
+                for p, word in clause_aspects:
+                    if p < position:
+                        if position - p <= window:
+                            target = word
+                    elif target is None and p - position <= window:
+                        target = word
+                        break
+                    else:
+                        break
+                if target is not None:
+                    aspects[target] = aspects.get(target, 0.0) + value
+        clause_aspects.clear()
+        clause_values.clear()
+
+    def top_aspects(self, aspects: Dict[str, float]) -> Dict[str, float]:
+        """Keep the strongest aspects, rounded for compact storage"""
+        ranked = sorted(aspects.items(), key=lambda item: abs(item[1]), reverse=True)
+        return {word: round(value, 3) for word, value in ranked[:self.max_aspects] if value}
+
+    def to_result(self, positive: float, negative: float) -> Dict:
+        """Map raw totals onto the sentiment/score/confidence result"""
+        raw = positive - negative
+        score = 0.5 + 0.5 * raw / (abs(raw) + self.saturation)
+        if raw > 0:
+            sentiment = "positive"
+        elif raw < 0:
+            sentiment = "negative"
+        else:
+            sentiment = "neutral"
+        return {
+            "sentiment": sentiment,
+            "score": float(score),
+            "confidence": float(abs(score - 0.5) * 2),
+        }
+
+    def analyze_tokens(self, tokens: Iterable[str], with_aspects: bool = False) -> Dict:
+        return self.analyze_batch([tokens], with_aspects)[0]
+
+    def analyze_batch(self, token_lists: Iterable[Iterable[str]], with_aspects: bool = False) -> List[Dict]:
+        """
+        Analyze several token sequences
+
+        Args:
+            token_lists: One token sequence per text
+            with_aspects: Add an "aspects" dict (word -> contribution) to each result
+        """
+        score_tokens = self.score_tokens
+        to_result = self.to_result
+        results = []
+        for tokens in token_lists:
+            aspects = {} if with_aspects else None
+            positive, negative, _ = score_tokens(tokens, aspects)
+            result = to_result(positive, negative)
+            if with_aspects:
+                result["aspects"] = self.top_aspects(aspects)
+            results.append(result)
+        return results
@@ -0,0 +1,182 @@
+"""
+Versioned, hot-reloadable NLP resources
+Lexicons and stopwords are compiled once into a frozen bundle; reloads build a new
+bundle and swap it in atomically, and other worker processes pick the change up
+through a shared reload stamp
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+try:
+    from .lexicon_engine import DEFAULT_LEXICON_DIR, CompiledLexicon
+except ImportError:
+    from lexicon_engine import DEFAULT_LEXICON_DIR, CompiledLexicon
+
+logger = logging.getLogger(__name__)
+
+RELOAD_STAMP = ".reload"
+
+
+def read_stopwords(path: str) -> FrozenSet[str]:
+    """Read one stopword per line, ignoring blank lines and # comments"""
+    if not os.path.exists(path):
+        return frozenset()
+    with open(path, encoding="utf-8") as f:
+        return frozenset(
+            line.strip() for line in f if line.strip() and not line.startswith("#")
+        )
+
+
+def resource_digest(path: str) -> str:
+    """Content hash of all resource files in a directory"""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if name.startswith(".") or not os.path.isfile(file_path):
+            continue
+        digest.update(name.encode("utf-8"))
+        with open(file_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:8]
+
+
+class LexiconBundle:
+    """一个版本的只读NLP资源（情感词典 + 停用词）"""
+
+    def __init__(self, version: str, lexicon: CompiledLexicon, stopwords: FrozenSet[str], path: str):
+        self.version = version
+        self.lexicon = lexicon
+        self.stopwords = stopwords
+        self.path = path
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_LEXICON_DIR) -> "LexiconBundle":
+        """
+        Load and compile every resource in a lexicon directory
+
+        The version is the contents of the VERSION file plus a short content hash,
+        so an edited file is never reported under the old version.
+        """
+        version_file = os.path.join(path, "VERSION")
+        declared = ""
+        if os.path.exists(version_file):
+            with open(version_file, encoding="utf-8") as f:
+                declared = f.read().strip()
+        digest = resource_digest(path)
+        version = f"{declared}+{digest}" if declared else digest
+
+        lexicon = CompiledLexicon.from_directory(path)
+        stopwords = read_stopwords(os.path.join(path, "stopwords.txt"))
+        return cls(version, lexicon, stopwords, path)
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "sentiment_words": len(self.lexicon.sentiment_words),
+            "stopwords": len(self.stopwords),
+            "loaded_at": self.loaded_at,
+        }
+
+
+class LexiconManager:
+    """持有当前资源版本，支持原子热更新"""
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 5.0):
+        """
+        Initialize manager and load the current resources
+
+        Args:
+            path: Lexicon directory (default: NLP_LEXICON_DIR or the bundled lexicons)
+            check_interval: Seconds between checks of the shared reload stamp
+        """
+        self.path = path or os.getenv("NLP_LEXICON_DIR", DEFAULT_LEXICON_DIR)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._bundle = LexiconBundle.load(self.path)
+        self._stamp = self._read_stamp()
+        self._next_check = time.time() + check_interval
+        logger.info(f"Lexicon resources loaded (version {self._bundle.version})")
+
+    def _stamp_path(self) -> str:
+        return os.path.join(self.path, RELOAD_STAMP)
+
+    def _read_stamp(self) -> Optional[float]:
+        try:
+            return os.stat(self._stamp_path()).st_mtime
+        except OSError:
+            return None
+
+    def get(self) -> LexiconBundle:
+        """
+        Current bundle
+
+        Callers should fetch it once per request and use that object throughout, so a
+        concurrent reload never mixes two versions within one result. A reload that
+        fails here is logged and the last good bundle keeps serving.
+        """
+        now = time.time()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            stamp = self._read_stamp()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                try:
+                    self.reload()
+                except Exception:
+                    # reload()已记录错误；分析请求不因磁盘上的坏文件而失败
+                    pass
+        return self._bundle
+
+    @property
+    def version(self) -> str:
+        return self._bundle.version
+
+    def reload(self, broadcast: bool = False) -> LexiconBundle:
+        """
+        Rebuild resources from disk and swap them in
+
+        A bundle that fails to load is discarded and the current one stays active.
+
+        Args:
+            broadcast: Touch the reload stamp so other worker processes reload too
+
+        Returns:
+            The active bundle after the reload
+        """
+        with self._lock:
+            try:
+                bundle = LexiconBundle.load(self.path)
+            except Exception as e:
+                logger.error(f"Lexicon reload failed, keeping version {self._bundle.version}: {e}")
+                raise
+
+            previous = self._bundle.version
+            self._bundle = bundle
+
+            if broadcast:
+                with open(self._stamp_path(), "w") as f:
+                    f.write(bundle.version)
+                self._stamp = self._read_stamp()
+
+        logger.info(f"Lexicon resources reloaded: {previous} -> {bundle.version}")
+        return bundle
+
+
+_manager: Optional[LexiconManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_lexicon_manager() -> LexiconManager:
+    """Get the process-wide lexicon manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = LexiconManager()
+        return _manager
@@ -3,31 +3,56 @@ Chinese sentiment analysis using BERT and keyword extraction using Jieba + TF-ID
 """
 
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import jieba
 from sklearn.feature_extraction.text import TfidfVectorizer
 import re
 
+try:
+    from .backends import LexiconBackend, SentimentBackend, create_backend
+    from .lexicon_manager import LexiconManager, get_lexicon_manager
+except ImportError:
+    # 作为顶层模块导入时（nlp_service把本目录加入sys.path）
+    from backends import LexiconBackend, SentimentBackend, create_backend
+    from lexicon_manager import LexiconManager, get_lexicon_manager
+
 logger = logging.getLogger(__name__)
 
 class SentimentAnalyzer:
-    """简化版情感分析器，使用基于规则的方法"""
+    """情感分析器，默认使用词典规则，可切换为Transformer后端"""
     
-    def __init__(self):
-        """初始化情感分析器"""
-        self.positive_words = set([
-            "好", "棒", "优秀", "喜欢", "满意", "赞", "不错", "推荐", "值得",
-            "完美", "精彩", "优质", "高兴", "开心", "快乐", "幸福", "感谢",
-            "支持", "爱", "美好", "漂亮", "帅", "酷", "厉害", "强", "牛"
-        ])
+    def __init__(
+        self,
+        lexicon_dir: Optional[str] = None,
+        lexicon_manager: Optional[LexiconManager] = None,
+        backend: Optional[SentimentBackend] = None
+    ):
+        """
+        初始化情感分析器
         
-        self.negative_words = set([
-            "差", "烂", "糟糕", "失望", "不满", "垃圾", "讨厌", "后悔", "坑",
-            "骗", "假", "劣质", "难用", "卡", "慢", "贵", "坏", "破", "臭",
-            "恶心", "难看", "丑", "烦", "气", "怒", "恨", "骂", "投诉"
-        ])
+        Args:
+            lexicon_dir: 词典目录（默认使用进程共享的词典资源）
+            lexicon_manager: 词典资源管理器，支持热更新
+            backend: 情感分析后端（默认按NLP_BACKEND环境变量创建）
+        """
+        if lexicon_manager is None:
+            lexicon_manager = LexiconManager(lexicon_dir) if lexicon_dir else get_lexicon_manager()
+        self.lexicon_manager = lexicon_manager
+        self.lexicon_backend = LexiconBackend(lexicon_manager)
+        if backend is None:
+            backend = create_backend(lexicon_manager=lexicon_manager)
+            if isinstance(backend, LexiconBackend):
+                backend = self.lexicon_backend
+        self.backend = backend
         
-        logger.info("SentimentAnalyzer initialized with rule-based method")
+        logger.info(
+            f"SentimentAnalyzer initialized with {backend.name} backend "
+            f"(lexicon version {lexicon_manager.version})"
+        )
+    
+    @property
+    def lexicon_version(self) -> str:
+        return self.lexicon_manager.version
     
     def analyze_sentiment(self, text: str) -> Dict:
         """
@@ -39,43 +64,27 @@ class SentimentAnalyzer:
         Returns:
             包含sentiment, score, confidence的字典
         """
-        try:
-            # 分词
-            words = list(jieba.cut(text))
-            
-            # 计算正负面词数量
-            positive_count = sum(1 for word in words if word in self.positive_words)
-            negative_count = sum(1 for word in words if word in self.negative_words)
-            
-            # 判断情感
-            if positive_count > negative_count:
-                sentiment = "positive"
-                score = 0.6 + (positive_count / (len(words) + 1)) * 0.4
-            elif negative_count > positive_count:
-                sentiment = "negative"
-                score = 0.4 - (negative_count / (len(words) + 1)) * 0.4
-            else:
-                sentiment = "neutral"
-                score = 0.5
-            
-            # 确保score在0-1范围内
-            score = max(0.0, min(1.0, score))
-            confidence = abs(score - 0.5) * 2  # 0.5表示不确定，越接近0或1越确定
-            
-            return {
-                "sentiment": sentiment,
-                "score": float(score),
-                "confidence": float(confidence)
-            }
+        return self.analyze_batch([text])[0]
+    
+    def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        批量分析文本情感
+        
+        Args:
+            texts: 中文文本列表
             
+        Returns:
+            与texts顺序一致的结果列表
+        """
+        try:
+            return self.backend.analyze_batch(texts)
         except Exception as e:
-            logger.error(f"Error analyzing sentiment: {str(e)}")
-            return {
-                "sentiment": "neutral",
-                "score": 0.5,
-                "confidence": 0.0,
-                "error": str(e)
-            }
+            if self.backend is self.lexicon_backend:
+                logger.error(f"Error analyzing sentiment: {str(e)}")
+                return [SentimentBackend.neutral_result(str(e)) for _ in texts]
+            # 模型推理失败时退回词典规则
+            logger.error(f"{self.backend.name} backend failed, using lexicon rules: {str(e)}")
+            return self.lexicon_backend.analyze_batch(texts)
     
     def extract_keywords(self, text: str, top_k: int = 10) -> List[Dict]:
         """
@@ -93,7 +102,7 @@ class SentimentAnalyzer:
             words = list(jieba.cut(text))
             
             # 过滤停用词和短词
-            stopwords = {"的", "了", "在", "是", "我", "有", "和", "就", "不", "人", "都", "一", "一个", "上", "也", "很", "到", "说", "要", "去", "你", "会", "着", "没有", "看", "好", "自己", "这"}
+            stopwords = self.lexicon_manager.get().stopwords
             filtered_words = [w for w in words if len(w) > 1 and w not in stopwords]
             
             if not filtered_words:
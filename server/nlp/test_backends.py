@@ -0,0 +1,98 @@
+"""
+Sentiment backend tests: truncation, length bucketing and cascade routing
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backends import CascadeBackend, SentimentBackend, length_buckets, truncate_ids
+
+
+def test_truncate_ids_policies():
+    ids = list(range(10))
+    assert truncate_ids(ids, 10) == ids
+    assert truncate_ids(ids, 4, "head") == [0, 1, 2, 3]
+    assert truncate_ids(ids, 4, "tail") == [6, 7, 8, 9]
+    # 默认保留开头1/4和结尾3/4
+    assert truncate_ids(ids, 4) == [0, 7, 8, 9]
+    assert truncate_ids(ids, 4, head_ratio=0.5) == [0, 1, 8, 9]
+
+
+def test_length_buckets_respect_size_and_token_limits():
+    lengths = [5, 100, 6, 7, 90, 5, 8]
+    batches = length_buckets(lengths, max_batch_size=3, max_batch_tokens=200)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) * max(lengths[i] for i in batch) <= 200
+    # 短文本不会和长文本分在同一批
+    assert [sorted(lengths[i] for i in batch) for batch in batches] == [[5, 5, 6], [7, 8], [90, 100]]
+
+
+def test_length_buckets_keep_overlong_text_alone():
+    assert length_buckets([500, 3], max_batch_size=8, max_batch_tokens=100) == [[1], [0]]
+    assert length_buckets([], max_batch_size=8, max_batch_tokens=100) == []
+
+
+class _FixedBackend(SentimentBackend):
+    """按文本返回预设置信度的后端，记录每次调用"""
+
+    def __init__(self, name, confidences=None, fail=False, extra=None):
+        self.name = name
+        self.confidences = confidences or {}
+        self.fail = fail
+        self.extra = extra or {}
+        self.calls = []
+
+    def analyze_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [
+            dict(
+                self.extra,
+                sentiment="positive",
+                score=0.9,
+                confidence=self.confidences.get(text, 0.9),
+                backend=self.name,
+            )
+            for text in texts
+        ]
+
+
+def test_cascade_escalates_low_confidence_texts_in_one_batch():
+    cheap = _FixedBackend("lexicon", {"a": 0.9, "b": 0.1, "c": 0.2}, extra={"lexicon_version": "v1", "aspects": {"x": 1.0}})
+    heavy = _FixedBackend("transformer")
+    cascade = CascadeBackend(cheap, heavy, threshold=0.4)
+
+    results = cascade.analyze_batch(["a", "b", "c"])
+    assert [r["backend"] for r in results] == ["lexicon", "transformer", "transformer"]
+    assert heavy.calls == [["b", "c"]]
+    # 升级后的结果保留词典阶段的置信度和方面归因
+    assert results[1]["cascade_confidence"] == 0.1
+    assert results[1]["lexicon_version"] == "v1"
+    assert results[1]["aspects"] == {"x": 1.0}
+
+    stats = cascade.stats()
+    assert (stats["texts"], stats["cheap_only"], stats["escalated"], stats["heavy_batches"]) == (3, 1, 2, 1)
+    assert abs(stats["escalation_rate"] - 2 / 3) < 1e-9
+
+
+def test_cascade_skips_heavy_stage_when_everything_is_confident():
+    heavy = _FixedBackend("transformer")
+    cascade = CascadeBackend(_FixedBackend("lexicon"), heavy)
+    cascade.analyze_batch(["a", "b"])
+    assert heavy.calls == []
+    assert cascade.stats()["heavy_batches"] == 0
+
+
+def test_cascade_keeps_cheap_results_when_heavy_stage_fails():
+    cascade = CascadeBackend(_FixedBackend("lexicon", {"a": 0.0}), _FixedBackend("transformer", fail=True))
+    results = cascade.analyze_batch(["a", "b"])
+    assert [r["backend"] for r in results] == ["lexicon", "lexicon"]
+
+    stats = cascade.stats()
+    assert (stats["heavy_failures"], stats["cheap_only"], stats["escalated"]) == (1, 2, 0)
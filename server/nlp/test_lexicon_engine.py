@@ -0,0 +1,82 @@
+"""
+Lexicon scorer tests: negation, intensifiers, contrast markers and aspect attribution
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from lexicon_engine import CompiledLexicon, LexiconScorer, aspects_json
+
+
+@pytest.fixture
+def scorer():
+    lexicon = CompiledLexicon(
+        sentiment={"好": 1.0, "差": -1.0, "满意": 1.0},
+        negators=["不"],
+        intensifiers={"很": 2.0},
+        contrast={"但是": (0.5, 1.5)},
+    )
+    return LexiconScorer(lexicon)
+
+
+def test_negation_and_intensifiers(scorer):
+    assert scorer.score_tokens(["好"]) == (1.0, 0.0, 1)
+    assert scorer.score_tokens(["不", "好"]) == (0.0, 0.8, 2)
+    assert scorer.score_tokens(["很", "好"]) == (2.0, 0.0, 2)
+    assert scorer.score_tokens(["不", "很", "好"]) == (0.0, 1.6, 3)
+
+
+def test_modifiers_do_not_cross_clause_boundaries(scorer):
+    assert scorer.score_tokens(["不", "，", "好"]) == (1.0, 0.0, 3)
+    assert scorer.score_tokens(["很", "。", "差"]) == (0.0, 1.0, 3)
+
+
+def test_contrast_weights_the_following_clause(scorer):
+    positive, negative, _ = scorer.score_tokens(["好", "但是", "差"])
+    assert (positive, negative) == (0.5, 1.5)
+    assert scorer.analyze_tokens(["好", "但是", "差"])["sentiment"] == "negative"
+
+
+def test_merged_tokens_score_like_their_parts(scorer):
+    # 分词器把修饰词和情感词合成一个词时结果不变
+    assert scorer.score_tokens(["不满意"])[:2] == scorer.score_tokens(["不", "满意"])[:2]
+    assert scorer.score_tokens(["很不满意"])[:2] == scorer.score_tokens(["很", "不", "满意"])[:2]
+
+
+def test_aspects_take_the_nearest_sentiment_in_their_clause(scorer):
+    aspects = {}
+    scorer.score_tokens(["服务", "很", "差", "，", "价格", "好"], aspects)
+    assert aspects == {"服务": -2.0, "价格": 1.0}
+
+    aspects = {}
+    scorer.score_tokens(["价格", "好", "但是", "服务", "差"], aspects)
+    assert aspects == {"价格": 0.5, "服务": -1.5}
+
+
+def test_aspects_outside_the_window_get_nothing():
+    lexicon = CompiledLexicon({"好": 1.0})
+    scorer = LexiconScorer(lexicon, aspect_window=2)
+    aspects = {}
+    scorer.score_tokens(["价格", "的", "的", "的", "好"], aspects)
+    assert aspects == {}
+
+
+def test_results_and_aspect_serialization(scorer):
+    assert scorer.analyze_tokens([]) == {"sentiment": "neutral", "score": 0.5, "confidence": 0.0}
+
+    result = scorer.analyze_tokens(["质量", "很", "好"], with_aspects=True)
+    assert result["sentiment"] == "positive"
+    assert 0.5 < result["score"] < 1
+    assert result["aspects"] == {"质量": 2.0}
+    assert aspects_json(result["aspects"]) is not None
+    assert aspects_json({}) is None
+
+
+def test_shipped_lexicon_loads():
+    scorer = LexiconScorer()
+    assert scorer.analyze_tokens(["很", "好"])["sentiment"] == "positive"
+    assert scorer.analyze_tokens(["不", "满意"])["sentiment"] == "negative"
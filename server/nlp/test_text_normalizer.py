@@ -0,0 +1,53 @@
+"""
+Text normalizer tests: character mapping, noise removal and the Weibo/Zhihu specifics
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from text_normalizer import TextNormalizer, normalize_text
+
+
+def test_fullwidth_and_traditional_characters_are_mapped():
+    assert normalize_text("ＡＢＣ１２３　测试") == "ABC123 测试"
+    assert normalize_text("這個產品質量還不錯") == "这个产品质量还不错"
+
+
+def test_urls_mentions_and_emoji_are_removed():
+    assert normalize_text("看这里 https://t.cn/A6abc 很好") == "看这里 很好"
+    assert normalize_text("//@张三: 说得对 @bob_1 同意") == "说得对 同意"
+    # 邮箱不是@提及
+    assert normalize_text("联系 me@example.com") == "联系 me@example.com"
+    # 表情符号去掉，微博表情文字默认保留
+    assert normalize_text("太好了😀👍[哈哈]") == "太好了 [哈哈]"
+
+
+def test_platform_markers_are_removed():
+    assert normalize_text("好评 展开全文c") == "好评"
+    assert normalize_text("今天开会了 L张三的微博视频") == "今天开会了"
+
+
+def test_video_marker_inside_the_text_is_kept():
+    assert normalize_text("我看了L张三的微博视频，很好") == "我看了L张三的微博视频,很好"
+
+
+def test_line_breaks_become_sentence_ends():
+    assert normalize_text("标题\n摘要内容") == "标题。摘要内容"
+    assert normalize_text("第一句。\n第二句") == "第一句。 第二句"
+    # 末尾换行不产生多余的句号
+    assert normalize_text("好\n") == "好"
+
+
+def test_whitespace_and_empty_input():
+    assert normalize_text("  多个   空格  ") == "多个 空格"
+    assert normalize_text("") == ""
+    assert normalize_text("😀 https://t.cn/x") == ""
+
+
+def test_optional_steps():
+    normalizer = TextNormalizer(emoticons=True, lowercase=True)
+    assert normalizer.normalize("Hello[哈哈]") == "hello"
+    assert TextNormalizer(urls=False).normalize("见 https://t.cn/x") == "见 https://t.cn/x"
+    assert normalizer.normalize_batch(["A", "B"]) == ["a", "b"]
@@ -0,0 +1,198 @@
+"""
+Text normalization shared by collectors and the NLP service
+Cleans raw platform text once at ingest (full-width/traditional characters, URLs,
+@mentions, emoji, platform UI markers) so hashing, dedupe and NLP see the same text
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# 常见繁体字到简体字的映射（未安装OpenCC时使用）
+_TRADITIONAL_PAIRS = (
+    "這这 個个 們们 來来 會会 說说 對对 時时 過过 還还 發发 問问 題题 與与 為为 從从 "
+    "後后 現现 點点 經经 頭头 實实 進进 學学 長长 開开 關关 國国 樣样 體体 動动 認认 "
+    "應应 將将 當当 無无 讓让 給给 邊边 購购 買买 賣卖 錢钱 貨货 質质 價价 條条 辦办 "
+    "車车 書书 記记 話话 語语 請请 覺觉 愛爱 電电 視视 網网 絡络 際际 聯联 業业 產产 "
+    "機机 裡里 裏里 麼么 嗎吗 沒没 讚赞 樂乐 歡欢 滿满 謝谢 優优 壞坏 難难 氣气 惡恶 "
+    "討讨 厭厌 騙骗 貴贵 爛烂 醜丑 煩烦 罵骂 訴诉 專专 務务 員员 區区 選选 舉举 總总 "
+    "統统 黨党 軍军 華华 灣湾 臺台 陸陆 歲岁 師师 蘋苹 場场 萬万 億亿 門门 兒儿 東东 "
+    "歷历 聽听 聲声 讀读 寫写 態态 變变 處处 確确 據据 義义 論论 權权 報报 導导 標标 "
+    "準准 較较 夠够 擊击 戰战 爭争 線线 級级 維维 護护 險险 雖虽 議议 術术 傳传 訊讯 "
+    "號号 錯错 誤误 強强 顯显 驗验 麗丽 幣币 銀银 廣广 園园 團团 熱热 親亲 裝装 測测 "
+    "試试 費费 資资 連连 結结 構构 達达 運运 輸输 贏赢 虧亏 漲涨 風风 紅红 綠绿 藍蓝 "
+    "黃黄 齊齐 雙双 極极 盡尽 嚴严 錄录 慮虑 擔担 憂忧 懷怀 簡简 單单 驚惊 "
+    "喪丧 湊凑 壓压 顧顾 圖图 畫画 轉转 載载 鐘钟 戲戏 劇剧 頻频 碼码 筆笔 腦脑"
+)
+
+# 微博/知乎页面上混入正文的界面文字
+_PLATFORM_MARKERS = (
+    r"O?网页链接",
+    r"展开全文c?",
+    r"收起全文d?",
+    r"阅读全文",
+    r"查看图片",
+    r"转发微博",
+    # 视频卡片的链接文字（L是链接图标）只出现在正文末尾；不锚定会吞掉正文中的"L…的微博视频"
+    r"L[^\s，。！？,.!?]{1,30}的微博视频(?=\s*$)",
+)
+
+_URL_PATTERN = r"(?:https?://|www\.)[A-Za-z0-9\-._~:/?#\[\]@!$&'()*+,;=%]+"
+# 转发链中的"//@用户名:"以及正文中的@提及；排除邮箱地址。
+# 微博昵称可含汉字，但与正文之间没有分隔符时无法判断边界，所以含汉字的昵称
+# 只在后面跟空白或冒号时移除；否则只移除Twitter/Reddit式的字母数字句柄
+_MENTION_PATTERN = (
+    r"(?://)?(?<![A-Za-z0-9._%+\-])@"
+    r"(?:[\w\-]{1,20}(?=[\s:：])|[A-Za-z0-9_\-]{1,30})[:：]?"
+)
+_EMOJI_PATTERN = "[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0E\uFE0F\u200D\u20E3]"
+# 微博表情文字，如[哈哈]、[doge]，本身带有情感，默认保留
+_EMOTICON_PATTERN = r"\[[\w\u4e00-\u9fff]{1,8}\]"
+
+# 换行处若没有句末标点，视为句子边界（知乎标题与摘要之间）
+_LINE_BREAK_RE = re.compile(r"(?<=[^\s。！？!?.…；;:：])[ \t]*[\r\n]+\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_ZERO_WIDTH = "\u200b\u200c\u200e\u200f\u2060\ufeff"
+
+
+def _build_width_table() -> Dict[int, int]:
+    """Full-width ASCII variants and the ideographic space to half-width"""
+    table = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+    table[0x3000] = 0x20
+    return table
+
+
+def _build_traditional_table() -> Dict[int, int]:
+    table = {}
+    for pair in _TRADITIONAL_PAIRS.split():
+        table[ord(pair[0])] = ord(pair[1])
+    return table
+
+
+class TextNormalizer:
+    """预编译的文本规范化流水线"""
+
+    def __init__(
+        self,
+        fullwidth: bool = True,
+        traditional: bool = True,
+        urls: bool = True,
+        mentions: bool = True,
+        emoji: bool = True,
+        emoticons: bool = False,
+        platform_markers: bool = True,
+        line_breaks: bool = True,
+        whitespace: bool = True,
+        lowercase: bool = False,
+    ):
+        """
+        Initialize normalizer, compiling the enabled steps
+
+        Character-level steps are merged into one translation table and pattern
+        removals into one alternation regex, so each text is scanned a constant
+        number of times regardless of how many steps are enabled.
+
+        Args:
+            fullwidth: Map full-width ASCII and ideographic spaces to half-width
+            traditional: Convert traditional to simplified characters (OpenCC if installed)
+            urls: Remove URLs
+            mentions: Remove @mentions and //@ repost chain markers
+            emoji: Remove emoji and zero-width joiners
+            emoticons: Remove bracketed Weibo emoticons such as [哈哈]
+            platform_markers: Remove UI text such as 展开全文 and 网页链接
+            line_breaks: Turn line breaks without end punctuation into sentence ends
+            whitespace: Collapse runs of whitespace and strip
+            lowercase: Lowercase Latin text
+        """
+        self.line_breaks = line_breaks
+        self.whitespace = whitespace
+        self.lowercase = lowercase
+
+        table: Dict[int, object] = {ord(c): None for c in _ZERO_WIDTH}
+        if fullwidth:
+            table.update(_build_width_table())
+
+        self._opencc = None
+        if traditional:
+            try:
+                import opencc
+                self._opencc = opencc.OpenCC("t2s")
+            except Exception:
+                table.update(_build_traditional_table())
+        self._table = table
+
+        patterns: List[str] = []
+        if urls:
+            patterns.append(_URL_PATTERN)
+        if mentions:
+            patterns.append(_MENTION_PATTERN)
+        if platform_markers:
+            patterns.extend(_PLATFORM_MARKERS)
+        if emoticons:
+            patterns.append(_EMOTICON_PATTERN)
+        if emoji:
+            patterns.append(_EMOJI_PATTERN + "+")
+        self._removal_re = re.compile("|".join(patterns)) if patterns else None
+
+    def normalize(self, text: str) -> str:
+        """
+        Normalize one text
+
+        Args:
+            text: Raw platform text
+
+        Returns:
+            Normalized text (may be empty if the text was only noise)
+        """
+        if not text:
+            return ""
+
+        if self._opencc is not None:
+            text = self._opencc.convert(text)
+        text = text.translate(self._table)
+
+        if self._removal_re is not None:
+            text = self._removal_re.sub(" ", text)
+        if self.line_breaks:
+            # 先去掉首尾空白，末尾的换行不是句子边界
+            text = _LINE_BREAK_RE.sub("。", text.strip())
+        if self.whitespace:
+            text = _WHITESPACE_RE.sub(" ", text).strip()
+        if self.lowercase:
+            text = text.lower()
+        return text
+
+    def normalize_batch(self, texts: Iterable[str]) -> List[str]:
+        return [self.normalize(text) for text in texts]
+
+    __call__ = normalize
+
+
+_default_normalizer = None
+
+
+def get_normalizer() -> TextNormalizer:
+    """Get the shared normalizer with default steps"""
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = TextNormalizer()
+    return _default_normalizer
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text with the default steps"""
+    return get_normalizer().normalize(text)
+
+
+if __name__ == "__main__":
+    samples = [
+        "这个产品真的很好用！！//@某某用户: 转发微博 http://t.cn/A6abcd 展开全文c",
+        "ＡＩ技術發展很快😀😀 @科技博主 你怎麼看？",
+        "如何评价新发布的手机\n外观设计一般，但是续航很强",
+    ]
+    normalizer = TextNormalizer()
+    for sample in samples:
+        print(repr(normalizer.normalize(sample)))
@@ -32,6 +32,7 @@ export const appRouter = router({
         keyword: z.string(),
         platforms: z.array(z.enum(["twitter", "reddit", "youtube"])),
         description: z.string().optional(),
+        priority: z.enum(["low", "normal", "high"]).optional(),
       }))
       .mutation(async ({ ctx, input }) => {
         try {
@@ -43,6 +44,7 @@ export const appRouter = router({
             platforms: JSON.stringify(input.platforms),
             description: input.description || "",
             status: "active",
+            priority: input.priority ?? "normal",
             createdAt: now,
             updatedAt: now,
           });
@@ -84,6 +86,7 @@ export const appRouter = router({
       .input(z.object({
         taskId: z.number(),
         status: z.enum(["active", "paused", "completed"]).optional(),
+        priority: z.enum(["low", "normal", "high"]).optional(),
       }))
       .mutation(async ({ ctx, input }) => {
         const task = await db.getMonitoringTaskById(input.taskId);
@@ -97,6 +100,9 @@ export const appRouter = router({
         if (input.status) {
           await db.updateMonitoringTask(input.taskId, { status: input.status });
         }
+        if (input.priority) {
+          await db.updateMonitoringTask(input.taskId, { priority: input.priority });
+        }
 
         return { success: true };
       }),
@@ -144,6 +144,74 @@ export const analysisRouter = router({
       }
     }),
 
+  /**
+   * 按方面词（关键词）统计情感
+   */
+  getAspectSentiment: protectedProcedure
+    .input(
+      z.object({
+        taskId: z.number(),
+        topK: z.number().default(30),
+      })
+    )
+    .query(async ({ ctx, input }) => {
+      const task = await db.getMonitoringTaskById(input.taskId);
+      if (!task || task.userId !== ctx.user.id) {
+        throw new TRPCError({
+          code: "NOT_FOUND",
+          message: "Task not found",
+        });
+      }
+
+      return await db.getAspectSentimentByTaskId(input.taskId, input.topK);
+    }),
+
+  /**
+   * 获取情感突发告警
+   */
+  getAlerts: protectedProcedure
+    .input(
+      z.object({
+        taskId: z.number(),
+        limit: z.number().default(100),
+        includeAcknowledged: z.boolean().default(false),
+      })
+    )
+    .query(async ({ ctx, input }) => {
+      const task = await db.getMonitoringTaskById(input.taskId);
+      if (!task || task.userId !== ctx.user.id) {
+        throw new TRPCError({
+          code: "NOT_FOUND",
+          message: "Task not found",
+        });
+      }
+
+      return await db.getSentimentAlertsByTaskId(input.taskId, input.limit, input.includeAcknowledged);
+    }),
+
+  /**
+   * 确认告警
+   */
+  acknowledgeAlert: protectedProcedure
+    .input(
+      z.object({
+        taskId: z.number(),
+        alertId: z.number(),
+      })
+    )
+    .mutation(async ({ ctx, input }) => {
+      const task = await db.getMonitoringTaskById(input.taskId);
+      if (!task || task.userId !== ctx.user.id) {
+        throw new TRPCError({
+          code: "NOT_FOUND",
+          message: "Task not found",
+        });
+      }
+
+      await db.acknowledgeSentimentAlert(input.taskId, input.alertId);
+      return { success: true };
+    }),
+
   /**
    * 获取分析进度
    */
@@ -6,13 +6,12 @@ import {
   updateMonitoringTask,
   getCrawlJobProgress,
   getCommentCountByTask,
+  enqueueCrawlJob,
+  getPlatformsWithoutWorkers,
 } from "../db";
-import { spawn } from "child_process";
-import path from "path";
-import { fileURLToPath } from "url";
 
-const __filename = fileURLToPath(import.meta.url);
-const __dirname = path.dirname(__filename);
+// 每个平台每次采集的条数
+const MAX_RESULTS_PER_PLATFORM = 20;
 
 export const collectorRouter = router({
   /**
@@ -48,14 +47,22 @@ export const collectorRouter = router({
       // 为每个平台启动爬虫
       const platforms = (typeof task.platforms === 'string' ? JSON.parse(task.platforms) : task.platforms) as string[];
 
+      // 放入crawl_jobs队列，由常驻采集worker（server/collectors/worker.py）领取执行
       for (const platform of platforms) {
-        // 启动爬虫进程
-        startCrawler(input.taskId, platform, task.keyword);
+        const jobId = await enqueueCrawlJob(input.taskId, platform, task.keyword, MAX_RESULTS_PER_PLATFORM);
+        console.log(`[Collector] Queued ${platform} job ${jobId} for task ${input.taskId}`);
+      }
+
+      // 没有在线worker时任务会一直排队，告知前端
+      const offlinePlatforms = await getPlatformsWithoutWorkers(platforms);
+      if (offlinePlatforms.length > 0) {
+        console.warn(`[Collector] No live worker for ${offlinePlatforms.join(",")}, task ${input.taskId} stays queued`);
       }
 
       return {
         success: true,
         message: "数据采集已启动",
+        offlinePlatforms,
       };
     }),
 
@@ -140,53 +147,3 @@ export const collectorRouter = router({
       };
     }),
 });
-
-/**
- * 启动爬虫进程
- */
-function startCrawler(
-  taskId: number,
-  platform: string,
-  keyword: string
-) {
-  // 使用模拟数据演示脚本（因为Twitter API限制）
-  // 使用绝对路径来定位脚本
-  // 当前工作目录是 /home/ubuntu/yuqing_dongchajia
-  const scriptPath = path.join(
-    process.cwd(),
-    "server",
-    "collectors",
-    "demo_with_mock_data.py"
-  );
-  console.log(`[Collector] Script path: ${scriptPath}`);
-
-  const pythonProcess = spawn("python3", [
-    scriptPath,
-    "--task-id",
-    taskId.toString(),
-    "--keyword",
-    keyword,
-    "--count",
-    "20",  // 每个平台20条数据
-  ]);
-
-  pythonProcess.stdout.on("data", (data) => {
-    console.log(`[${platform}] ${data.toString()}`);
-  });
-
-  pythonProcess.stderr.on("data", (data) => {
-    console.error(`[${platform}] Error: ${data.toString()}`);
-  });
-
-  pythonProcess.on("close", (code) => {
-    if (code === 0) {
-      console.log(`[${platform}] Process completed successfully`);
-    } else {
-      console.error(`[${platform}] Process exited with code ${code}`);
-    }
-  });
-
-  pythonProcess.on("error", (err) => {
-    console.error(`[${platform}] Failed to start process: ${err.message}`);
-  });
-}
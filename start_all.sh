@@ -13,7 +13,7 @@ RED='\033[0;31m'
 NC='\033[0m' # No Color
 
 # 检查并启动MySQL
-echo -e "\n${YELLOW}[1/3] 检查MySQL数据库...${NC}"
+echo -e "\n${YELLOW}[1/4] 检查MySQL数据库...${NC}"
 if sudo service mysql status > /dev/null 2>&1; then
     echo -e "${GREEN}✓ MySQL已运行${NC}"
 else
@@ -29,7 +29,7 @@ else
 fi
 
 # 启动NLP服务
-echo -e "\n${YELLOW}[2/3] 启动NLP服务...${NC}"
+echo -e "\n${YELLOW}[2/4] 启动NLP服务...${NC}"
 if pgrep -f "nlp_service.py" > /dev/null; then
     echo -e "${GREEN}✓ NLP服务已运行${NC}"
 else
@@ -45,8 +45,35 @@ else
     fi
 fi
 
+# 启动采集worker（Web应用只把采集任务写入crawl_jobs队列，由worker领取执行）
+echo -e "\n${YELLOW}[3/4] 启动采集worker...${NC}"
+cd /home/ubuntu/yuqing_dongchajia
+export $(cat .env | grep -v '^#' | xargs)
+if pgrep -f "collectors/worker.py" > /dev/null; then
+    echo -e "${GREEN}✓ 采集worker已运行${NC}"
+else
+    # 默认使用模拟数据（与之前的演示脚本一致）；COLLECTOR_MODE=live 时真实爬取
+    WORKER_ARGS="--mock"
+    if [ "$COLLECTOR_MODE" = "live" ]; then
+        WORKER_ARGS=""
+    fi
+    nohup python3 server/collectors/worker.py $WORKER_ARGS > collector_worker.log 2>&1 &
+    sleep 2
+    if pgrep -f "collectors/worker.py" > /dev/null; then
+        echo -e "${GREEN}✓ 采集worker启动成功${NC}"
+    else
+        echo -e "${RED}✗ 采集worker启动失败，请查看 collector_worker.log${NC}"
+    fi
+fi
+
+# 配置了采集预算时启动定时调度器，按预算周期性地放入采集任务
+if [ -n "$CRAWL_BUDGETS" ] && ! pgrep -f "collectors/scheduler.py" > /dev/null; then
+    nohup python3 server/collectors/scheduler.py > collector_scheduler.log 2>&1 &
+    echo -e "${GREEN}✓ 采集调度器已启动${NC}"
+fi
+
 # 启动Web应用
-echo -e "\n${YELLOW}[3/3] 启动Web应用...${NC}"
+echo -e "\n${YELLOW}[4/4] 启动Web应用...${NC}"
 cd /home/ubuntu/yuqing_dongchajia
 
 # 加载环境变量
@@ -69,4 +96,5 @@ echo -e "  NLP服务: ${GREEN}http://localhost:8000${NC}"
 echo ""
 echo -e "日志文件："
 echo -e "  NLP服务: ${YELLOW}nlp_service.log${NC}"
+echo -e "  采集worker: ${YELLOW}collector_worker.log${NC}"
 echo ""